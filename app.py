@@ -1,10 +1,38 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify, request
+from common.cache import map_cache
+from common.jobs import job_manager
+from common.mapio import import_map, get_map, map_summary
+from common.store import decomposition_store
 from line_sweep import line_sweep_bp
 from quadtree import quad_tree_bp
 from visibility import visibility_bp
 
 app = Flask(__name__)
 
+# Gemeinsamer Karten-/Zerlegungs-Cache: Obergrenzen über Config bzw. Umgebungsvariablen
+# (FLASK_MAP_CACHE_MAX_ENTRIES, FLASK_MAP_CACHE_MAX_BYTES) einstellbar
+app.config.setdefault("MAP_CACHE_MAX_ENTRIES", 64)
+app.config.setdefault("MAP_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+# Trace-Endpunkt (/line_sweep/graph_data_line_sweep_trace) auch ohne Debug-Modus freischalten
+app.config.setdefault("TRACE_ENDPOINT_ENABLED", False)
+# Worker-Prozesse für den Quadtree-Aufbau (1 = sequentiell)
+app.config.setdefault("QUADTREE_WORKERS", 1)
+# Höchstzahl an Start/Ziel-Paaren je Anfrage an die Batch-Endpunkte (/<planer>/batch_paths)
+app.config.setdefault("BATCH_MAX_QUERIES", 1000)
+# Obergrenze für Request-Bodies, insbesondere hochgeladene Karten (POST /maps)
+app.config.setdefault("MAX_CONTENT_LENGTH", 64 * 1024 * 1024)
+# Verzeichnis für vorberechnete Zerlegungen (common.store), von allen Worker-Prozessen per memmap
+# geteilt und über Neustarts hinweg erhalten; None schaltet den Store ab
+app.config.setdefault("DECOMPOSITION_STORE_DIR", None)
+# Hintergrund-Jobs (/line_sweep/jobs): Worker-Prozesse und Zahl aufbewahrter fertiger Jobs
+app.config.setdefault("JOB_WORKERS", 2)
+app.config.setdefault("JOB_MAX_FINISHED", 256)
+app.config.from_prefixed_env()
+map_cache.configure(max_entries=app.config["MAP_CACHE_MAX_ENTRIES"],
+                    max_bytes=app.config["MAP_CACHE_MAX_BYTES"])
+decomposition_store.configure(app.config["DECOMPOSITION_STORE_DIR"])
+job_manager.configure(workers=app.config["JOB_WORKERS"], max_finished=app.config["JOB_MAX_FINISHED"])
+
 # Registriere den Line Sweep Blueprint mit dem URL-Prefix /line_sweep
 app.register_blueprint(line_sweep_bp, url_prefix='/line_sweep')
 
@@ -18,5 +46,40 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(dict(map_cache.stats(), store=decomposition_store.stats()))
+
+
+@app.route('/maps', methods=['POST'])
+def upload_map():
+    """
+    Hinderniskarte hochladen: GeoJSON (FeatureCollection/Feature/Geometrie) als Body, Binär-WKB
+    oder Hex-WKB (eine Geometrie je Zeile) als Body oder als Datei im Formularfeld "file".
+    Optional format=geojson|wkb|wkb_hex sowie width/height als Query-Parameter.
+    Die Antwort enthält die map_id, mit der alle Planer-Endpunkte statt der Zufallskarte
+    diese Karte verwenden (?map_id=... bzw. "map_id" im Batch-Body).
+    """
+    upload = request.files.get("file")
+    payload = upload.read() if upload is not None else request.get_data()
+    try:
+        width = request.args.get("width")
+        height = request.args.get("height")
+        entry = import_map(payload, fmt=request.args.get("format"),
+                           width=None if width is None else int(width),
+                           height=None if height is None else int(height))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(map_summary(entry)), 201
+
+
+@app.route('/maps/<map_id>')
+def map_info(map_id):
+    try:
+        return jsonify(map_summary(get_map(map_id)))
+    except KeyError:
+        return jsonify({"error": f"Unbekannte map_id: {map_id}"}), 404
+
+
 if __name__ == '__main__':
     app.run(debug=True)
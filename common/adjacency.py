@@ -0,0 +1,112 @@
+import bisect
+import math
+
+from shapely.geometry import Polygon
+
+from .csr import CSRGraph
+
+
+def _cell_bounds(cell):
+    """(x_left, x_right, y_top, y_bottom) einer Zelle; y_top ist dabei die kleinere y-Koordinate."""
+    if all(k in cell for k in ["x_left", "x_right", "y_top", "y_bottom"]):
+        return cell["x_left"], cell["x_right"], cell["y_top"], cell["y_bottom"]
+    if "bounds" in cell:
+        left, top, right, bottom = cell["bounds"]
+    else:
+        left, top, right, bottom = Polygon(cell["polygon"]).bounds
+    return left, right, top, bottom
+
+
+def _touching_pairs(near, far, lo, hi, tol):
+    """
+    Indexpaare (i, j), i < j, deren Ränder sich berühren: |far[a] - near[b]| < tol und
+    die Intervalle (lo, hi) überlappen offen. Für die horizontale Adjazenz ist near der linke,
+    far der rechte Rand und (lo, hi) das y-Intervall; vertikal entsprechend vertauscht.
+
+    Die Zellen werden nach ihrem near-Rand gruppiert und je Gruppe nach lo sortiert;
+    eine Zelle sucht nur in den Gruppen innerhalb von tol und dort per binärer Suche
+    die überlappenden Intervalle.
+    """
+    groups = {}
+    for b in range(len(near)):
+        groups.setdefault(near[b], []).append(b)
+    keys = sorted(groups)
+    for key in keys:
+        members = sorted(groups[key], key=lambda b: lo[b])
+        his = [hi[b] for b in members]
+        # Nicht überlappende Intervalle (Normalfall) haben auch sortierte Obergrenzen
+        monotone = all(his[k] <= his[k + 1] for k in range(len(his) - 1))
+        groups[key] = (members, [lo[b] for b in members], his, monotone)
+
+    pairs = set()
+    for a in range(len(far)):
+        first = bisect.bisect_right(keys, far[a] - tol)
+        last = bisect.bisect_left(keys, far[a] + tol)
+        for key in keys[first:last]:
+            if abs(far[a] - key) >= tol:
+                continue
+            members, los, his, monotone = groups[key]
+            # Kandidaten mit lo[b] < hi[a] bilden ein Präfix, davon überlappen die mit hi[b] > lo[a]
+            end = bisect.bisect_left(los, hi[a])
+            start = bisect.bisect_right(his, lo[a], 0, end) if monotone else 0
+            for k in range(start, end):
+                b = members[k]
+                if his[k] > lo[a] and a != b:
+                    pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+
+def build_graph_from_grid(cells, tol=1e-2, output="lists"):
+    """
+    Adjazenzgraph einer Zellzerlegung (Quadtree-Zellen oder Faces der vertikalen Zerlegung).
+    Zwei Zellen sind benachbart, wenn sich ihre Ränder bis auf tol berühren und die
+    gemeinsame Kante echte Länge hat. Statt aller Zellpaare werden nur Zellen an derselben
+    Randkoordinate mit überlappenden Intervallen verglichen: O(n log n + k).
+
+    Knoten enthalten den Polygon-Schwerpunkt, Kanten den Abstand der Bounding-Box-Mittelpunkte;
+    die Kanten sind nach Zellindex-Paar sortiert, horizontale vor vertikalen.
+
+    output="lists" liefert (nodes, links) für die JSON-Ausgabe, output="csr" direkt einen
+    CSRGraph über die Zellnummern mit den Bounding-Box-Mittelpunkten als Koordinaten.
+    """
+    if output not in ("lists", "csr"):
+        raise ValueError(f"Unbekanntes Ausgabeformat für den Zellgraphen: {output}")
+    nodes = []
+    left, right, top, bottom = [], [], [], []
+    for cell in cells:
+        # Versuche, Grenzen direkt zu verwenden, ansonsten aus Bounds
+        x_left, x_right, y_top, y_bottom = _cell_bounds(cell)
+        left.append(x_left)
+        right.append(x_right)
+        top.append(y_top)
+        bottom.append(y_bottom)
+        if output == "csr":
+            continue
+        centroid = Polygon(cell["polygon"]).centroid
+        nodes.append({
+            "id": cell["number"],
+            "centroid": (centroid.x, centroid.y)
+        })
+
+    # Horizontale Adjazenz (gemeinsame vertikale Kante), dann vertikale Adjazenz
+    candidates = [(i, j, 0) for i, j in _touching_pairs(left, right, top, bottom, tol)]
+    candidates += [(i, j, 1) for i, j in _touching_pairs(top, bottom, left, right, tol)]
+    candidates.sort()
+
+    if output == "csr":
+        numbers = [cell["number"] for cell in cells]
+        centers = [((left[i] + right[i]) / 2, (top[i] + bottom[i]) / 2) for i in range(len(cells))]
+        edges = ((numbers[i], numbers[j], math.hypot(centers[j][0] - centers[i][0], centers[j][1] - centers[i][1]))
+                 for i, j, _ in candidates)
+        return CSRGraph.from_edges(numbers, edges, dict(zip(numbers, centers)).__getitem__)
+
+    links = []
+    for i, j, _ in candidates:
+        centroid_a = ((left[i] + right[i]) / 2, (top[i] + bottom[i]) / 2)
+        centroid_b = ((left[j] + right[j]) / 2, (top[j] + bottom[j]) / 2)
+        links.append({
+            "source": cells[i]["number"],
+            "target": cells[j]["number"],
+            "weight": math.hypot(centroid_b[0] - centroid_a[0], centroid_b[1] - centroid_a[1])
+        })
+    return nodes, links
@@ -0,0 +1,35 @@
+from .search import check_method
+
+
+def json_flag(data, key, default):
+    """Wahrheitswert aus einem JSON-Body; nur echte JSON-Booleans, sonst ValueError."""
+    value = data.get(key, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"'{key}' muss true oder false sein, nicht {value!r}")
+    return value
+
+
+def parse_batch_request(data, max_queries):
+    """
+    Prüft den JSON-Body eines Batch-Endpunkts und liefert (queries, search, share):
+    queries als Liste ((sx, sy), (gx, gy)) aus [[sx, sy, gx, gy], ...], search als Suchverfahren
+    (Standard "astar") und share (Standard True) für gemeinsame Dijkstra-Bäume je Start.
+    Ungültige Eingaben lösen ValueError aus.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("JSON-Objekt erwartet")
+    raw = data.get("queries")
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("'queries' muss eine nichtleere Liste [[sx, sy, gx, gy], ...] sein")
+    if len(raw) > max_queries:
+        raise ValueError(f"Zu viele Anfragen: {len(raw)} (höchstens {max_queries})")
+    queries = []
+    for k, query in enumerate(raw):
+        if not isinstance(query, (list, tuple)) or len(query) != 4:
+            raise ValueError(f"Anfrage {k}: [sx, sy, gx, gy] erwartet")
+        sx, sy, gx, gy = (float(v) for v in query)
+        queries.append(((sx, sy), (gx, gy)))
+
+    search = data.get("search", "astar")
+    check_method(search)
+    return queries, search, json_flag(data, "share", True)
@@ -0,0 +1,145 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def estimate_size(obj, _seen=None):
+    """
+    Grobe Abschätzung des Speicherbedarfs eines Objekts in Bytes.
+    Container werden rekursiv durchlaufen, NumPy-Arrays über nbytes gezählt;
+    Graphen und Geometrien werden über ihre Knoten-/Kanten- bzw. Koordinatenzahl geschätzt.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # Per memmap eingeblendete Arrays (common.store) liegen im Page Cache, nicht im Heap
+        base = obj
+        while base is not None:
+            if isinstance(base, np.memmap):
+                return 112
+            base = getattr(base, "base", None)
+        return obj.nbytes + 112
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+    if hasattr(obj, "number_of_edges") and hasattr(obj, "number_of_nodes"):
+        # networkx-Graph: dict-of-dicts, grob 250 Bytes pro Knoten und 350 pro Kante
+        return 250 * obj.number_of_nodes() + 350 * obj.number_of_edges()
+    if hasattr(obj, "geom_type") and hasattr(obj, "bounds"):
+        # Shapely-Geometrie
+        try:
+            import shapely
+            return 100 + 16 * int(shapely.get_num_coordinates(obj))
+        except Exception:
+            return 100
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, _seen)
+    elif hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), _seen)
+    elif hasattr(obj, "__slots__"):
+        for name in obj.__slots__:
+            if hasattr(obj, name):
+                size += estimate_size(getattr(obj, name), _seen)
+    return size
+
+
+class LRUCache:
+    """
+    Threadsicherer LRU-Cache mit Obergrenze für Anzahl Einträge und (geschätzte) Bytes.
+    Wird von allen Blueprints geteilt, um Karten und vorverarbeitete Strukturen
+    (Zerlegungen, Graphen) über Anfragen hinweg wiederzuverwenden.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=512 * 1024 * 1024, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_entries=None, max_bytes=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = int(max_entries)
+            if max_bytes is not None:
+                self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size=None):
+        if size is None:
+            size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                # Zu groß für den Cache – nicht speichern
+                return value
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+        return value
+
+    def get_or_create(self, key, factory):
+        """Liefert den gecachten Wert oder erzeugt ihn mit factory() und legt ihn ab."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        # Aufbau außerhalb des Locks, damit andere Anfragen nicht blockiert werden
+        return self.put(key, factory())
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Gemeinsamer Cache für Karten und vorverarbeitete Strukturen aller Planer
+map_cache = LRUCache()
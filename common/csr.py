@@ -0,0 +1,230 @@
+import heapq
+import math
+
+import numpy as np
+
+from .search import bidirectional_astar, check_method
+
+
+class CSRGraph:
+    """
+    Ungerichteter, gewichteter Graph im CSR-Format (compressed sparse row): die Nachbarn von
+    Knoten i stehen in indices[indptr[i]:indptr[i + 1]], die Kantengewichte an denselben
+    Stellen in weights. Knoten sind intern fortlaufende Ganzzahlen; keys bildet sie auf die
+    Knoten der Planer ab (Zellnummern bzw. Koordinaten-Tupel), coords enthält die Position
+    jedes Knotens für die A*-Heuristik.
+
+    Gegenüber einem networkx-Graphen (dict-of-dicts mit Attribut-Dict je Kante) kostet eine
+    Kante hier 12 Bytes je Richtung.
+    """
+
+    def __init__(self, indptr, indices, weights, coords, keys=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.keys = list(range(len(self.coords))) if keys is None else list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_edges(cls, nodes, edges, position):
+        """
+        Graph aus Knotenschlüsseln und Kanten (u, v, gewicht) über diese Schlüssel. Knoten, die
+        nur in den Kanten vorkommen, werden in der Reihenfolge ihres Auftretens angehängt (wie
+        bei networkx). position(key) liefert die Koordinaten eines Knotens.
+        """
+        keys = list(nodes)
+        index = {key: i for i, key in enumerate(keys)}
+        sources, targets, weights = [], [], []
+        for u, v, w in edges:
+            for key in (u, v):
+                if key not in index:
+                    index[key] = len(keys)
+                    keys.append(key)
+            sources.append(index[u])
+            targets.append(index[v])
+            weights.append(w)
+
+        n = len(keys)
+        # Beide Richtungen jeder Kante, nach (Quelle, Ziel) sortiert
+        src = np.array(sources + targets, dtype=np.int64)
+        dst = np.array(targets + sources, dtype=np.int64)
+        w = np.array(weights + weights, dtype=np.float64)
+        order = np.lexsort((dst, src))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        coords = [position(key) for key in keys]
+        return cls(indptr, dst[order], w[order], coords if coords else np.zeros((0, 2)), keys)
+
+    @classmethod
+    def from_links(cls, nodes, links, position):
+        """Graph aus den Knoten- und Kantenlisten der Zellgraphen ({"id": ...}, {"source", "target", "weight"})."""
+        return cls.from_edges([n["id"] for n in nodes],
+                              ((l["source"], l["target"], l["weight"]) for l in links), position)
+
+    @classmethod
+    def from_networkx(cls, G, position, weight="weight"):
+        return cls.from_edges(G.nodes(), ((u, v, data[weight]) for u, v, data in G.edges(data=True)), position)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def edges(self):
+        """Kanten (u, v, gewicht) über die Schlüssel, jede Kante einmal (u vor v in Knotenreihenfolge)."""
+        src = np.repeat(np.arange(len(self.keys)), np.diff(self.indptr))
+        mask = src < self.indices
+        keys = self.keys
+        return [(keys[i], keys[j], w) for i, j, w in
+                zip(src[mask].tolist(), self.indices[mask].tolist(), self.weights[mask].tolist())]
+
+    def neighbors(self, i):
+        """Nachbarn [(j, gewicht), ...] des Knotens mit Index i."""
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return list(zip(self.indices[lo:hi].tolist(), self.weights[lo:hi].tolist()))
+
+    def adjacent(self, key):
+        """Nachbarn [(schlüssel, gewicht), ...] eines Knotens über seinen Schlüssel."""
+        i = self.index.get(key)
+        if i is None:
+            return []
+        return [(self.keys[j], w) for j, w in self.neighbors(i)]
+
+    def has_edge(self, u, v):
+        i, j = self.index.get(u), self.index.get(v)
+        if i is None or j is None:
+            return False
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        # Die Nachbarn jeder Zeile sind aufsteigend sortiert
+        k = lo + np.searchsorted(self.indices[lo:hi], j)
+        return bool(k < hi and self.indices[k] == j)
+
+    def position(self, i):
+        return tuple(self.coords[i].tolist())
+
+    def _astar(self, source, target, heuristic):
+        """
+        A* bzw. Dijkstra (heuristic=False) auf den Indizes mit Listen statt Dicts für Abstände
+        und Vorgänger. Die Heuristik wird einmal vektorisiert für alle Knoten berechnet.
+        """
+        n = len(self.keys)
+        if heuristic:
+            goal = self.coords[target]
+            h = np.hypot(self.coords[:, 0] - goal[0], self.coords[:, 1] - goal[1]).tolist()
+        else:
+            h = [0.0] * n
+        indptr = self.indptr.tolist()
+        indices, weights = self.indices, self.weights
+        dist = [math.inf] * n
+        prev = [-1] * n
+        closed = bytearray(n)
+        expanded = 0
+
+        dist[source] = 0.0
+        heap = [(h[source], source)]
+        while heap:
+            _, u = heapq.heappop(heap)
+            if closed[u]:
+                continue
+            if u == target:
+                path = [u]
+                while prev[u] >= 0:
+                    u = prev[u]
+                    path.append(u)
+                return path[::-1], expanded
+            closed[u] = 1
+            expanded += 1
+            d = dist[u]
+            lo, hi = indptr[u], indptr[u + 1]
+            for v, w in zip(indices[lo:hi].tolist(), weights[lo:hi].tolist()):
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd + h[v], v))
+        return None, expanded
+
+    def _tree(self, source, targets):
+        """Dijkstra von source, bis alle targets abgeschlossen sind; liefert (dist, prev) als Listen."""
+        n = len(self.keys)
+        indptr = self.indptr.tolist()
+        indices, weights = self.indices, self.weights
+        dist = [math.inf] * n
+        prev = [-1] * n
+        closed = bytearray(n)
+        remaining = set(targets)
+
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, u = heapq.heappop(heap)
+            if closed[u]:
+                continue
+            closed[u] = 1
+            remaining.discard(u)
+            lo, hi = indptr[u], indptr[u + 1]
+            for v, w in zip(indices[lo:hi].tolist(), weights[lo:hi].tolist()):
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, prev
+
+    def path_cost(self, path):
+        """Summe der Kantengewichte entlang eines Pfads (Schlüsselliste)."""
+        cost = 0.0
+        for u, v in zip(path, path[1:]):
+            i, j = self.index[u], self.index[v]
+            lo, hi = self.indptr[i], self.indptr[i + 1]
+            cost += float(self.weights[lo + np.searchsorted(self.indices[lo:hi], j)])
+        return cost
+
+    def shortest_paths(self, pairs, method="astar", share=True):
+        """
+        Viele Anfragen auf demselben Graphen: pairs ist eine Liste (quelle, ziel) von Schlüsseln,
+        Ergebnis je Anfrage (Pfad oder None, Kosten oder None). Mit share=True werden Anfragen
+        mit gleicher Quelle gemeinsam über einen Dijkstra-Baum beantwortet, der endet, sobald
+        alle ihre Ziele erreicht sind; einzelne Anfragen laufen mit method wie shortest_path.
+        """
+        check_method(method)
+        results = [(None, None)] * len(pairs)
+        groups = {}
+        for q, (source, target) in enumerate(pairs):
+            if source in self.index and target in self.index:
+                groups.setdefault(source, []).append(q)
+
+        for source, queries in groups.items():
+            if not share or len(queries) == 1:
+                for q in queries:
+                    path, _ = self.shortest_path(source, pairs[q][1], method=method)
+                    results[q] = (path, None if path is None else self.path_cost(path))
+                continue
+            s = self.index[source]
+            dist, prev = self._tree(s, {self.index[pairs[q][1]] for q in queries})
+            for q in queries:
+                t = self.index[pairs[q][1]]
+                if dist[t] == math.inf:
+                    continue
+                path = [t]
+                while prev[path[-1]] >= 0:
+                    path.append(prev[path[-1]])
+                results[q] = ([self.keys[i] for i in reversed(path)], dist[t])
+        return results
+
+    def shortest_path(self, source, target, method="astar"):
+        """
+        Kürzester Pfad zwischen zwei Knotenschlüsseln mit "astar" (euklidische Heuristik über
+        coords), "dijkstra" oder "bidirectional". Liefert (Pfad als Schlüsselliste oder None,
+        Anzahl expandierter Knoten) wie common.search.shortest_path.
+        """
+        check_method(method)
+        s, t = self.index.get(source), self.index.get(target)
+        if s is None or t is None:
+            return None, 0
+        if method == "bidirectional":
+            path, expanded = bidirectional_astar(self.neighbors, s, t, self.position)
+        else:
+            path, expanded = self._astar(s, t, heuristic=method == "astar")
+        if path is None:
+            return None, expanded
+        return [self.keys[i] for i in path], expanded
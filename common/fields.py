@@ -0,0 +1,23 @@
+def select_fields(args, sections, path_sections):
+    """
+    Welche Abschnitte einer Antwort berechnet und serialisiert werden:
+    fields=a,b,...  genau diese Abschnitte (aus sections),
+    mode=path       nur die Pfad-Abschnitte (path_sections),
+    mode=full       alle Abschnitte (Standard).
+    Kleine Metadaten (Start, Ziel, Seed, Suchstatistik) gehören immer zur Antwort.
+    Unbekannte Abschnitte oder Modi lösen ValueError aus.
+    """
+    fields = args.get("fields")
+    if fields:
+        chosen = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = chosen - set(sections)
+        if unknown:
+            raise ValueError(f"Unbekannte Felder: {', '.join(sorted(unknown))} "
+                             f"(verfügbar: {', '.join(sections)})")
+        return chosen
+    mode = args.get("mode", "full")
+    if mode == "path":
+        return set(path_sections)
+    if mode == "full":
+        return set(sections)
+    raise ValueError(f"Unbekannter Modus: {mode!r} (erwartet: full, path)")
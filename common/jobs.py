@@ -0,0 +1,147 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Zustände eines Jobs; "done" und "failed" sind endgültig
+STATUSES = ("queued", "running", "done", "failed")
+
+# Fortschrittskanal im Worker-Prozess (über den Initializer des Pools gesetzt)
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _run_job(job_id, fn, task):
+    """Läuft im Worker-Prozess: fn(task, report) mit report(phase) als Rückkanal zum Job-Manager."""
+    def report(phase):
+        _progress_queue.put((job_id, phase))
+
+    report(None)
+    return fn(task, report)
+
+
+class JobManager:
+    """
+    Hintergrund-Jobs auf einem lokalen Prozess-Pool, ohne externe Queue. Jeder Job bekommt eine
+    ID; Worker melden ihre aktuelle Phase über eine multiprocessing.Queue, die ein Thread im
+    Hauptprozess in die Job-Tabelle überträgt. Die Tabelle liegt im Speicher des annehmenden
+    Prozesses und behält höchstens max_finished abgeschlossene Jobs (älteste zuerst verworfen).
+    """
+
+    def __init__(self, workers=2, max_finished=256):
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._executor = None
+        self._queue = None
+        self.configure(workers, max_finished)
+
+    def configure(self, workers=None, max_finished=None):
+        with self._lock:
+            if workers is not None:
+                self.workers = max(1, int(workers))
+            if max_finished is not None:
+                self.max_finished = max(1, int(max_finished))
+
+    def _pool(self):
+        """Pool und Fortschrittskanal, beim ersten Job angelegt."""
+        if self._executor is None:
+            self._queue = multiprocessing.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._queue,))
+            threading.Thread(target=self._listen, args=(self._queue,), daemon=True).start()
+        return self._executor
+
+    def _listen(self, queue):
+        while True:
+            job_id, phase = queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] not in ("queued", "running"):
+                    continue
+                if job["status"] == "queued":
+                    job["status"] = "running"
+                    job["started"] = time.time()
+                if phase is not None:
+                    job["phase"] = phase
+                    if phase in job["phases"]:
+                        job["phases_done"] = job["phases"].index(phase)
+
+    def submit(self, fn, task, phases=()):
+        """
+        Startet fn(task, report) im Pool und liefert die Job-ID. fn muss auf Modulebene definiert
+        sein (picklebar) und ein JSON-fähiges Ergebnis liefern; phases sind die Phasen, die fn
+        der Reihe nach mit report(phase) meldet (Phasen dürfen übersprungen werden).
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "phase": None,
+                "phases": list(phases),
+                "phases_done": 0,
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+            }
+            future = self._pool().submit(_run_job, job_id, fn, task)
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id, future):
+        error = future.exception()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished"] = time.time()
+            if job["started"] is None:
+                job["started"] = job["finished"]
+            if error is None:
+                job["status"] = "done"
+                job["result"] = future.result()
+                job["phases_done"] = len(job["phases"])
+            else:
+                job["status"] = "failed"
+                job["error"] = f"{type(error).__name__}: {error}"
+            self._forget_finished()
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        """Status ohne Ergebnis: Phase, Fortschritt (erledigte Phasen / alle) und Zeiten; KeyError, wenn unbekannt."""
+        with self._lock:
+            job = self._jobs[job_id]
+            now = time.time()
+            status = {key: job[key] for key in ("id", "status", "phase", "phases", "error")}
+            status["progress"] = job["phases_done"] / len(job["phases"]) if job["phases"] else float(job["status"] == "done")
+            status["queued_seconds"] = (job["started"] or now) - job["submitted"]
+            status["running_seconds"] = (job["finished"] or now) - job["started"] if job["started"] else 0.0
+            return status
+
+    def result(self, job_id):
+        """Ergebnis eines abgeschlossenen Jobs (None, solange er läuft); KeyError, wenn unbekannt."""
+        with self._lock:
+            return self._jobs[job_id]["result"]
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in STATUSES}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return dict(counts, workers=self.workers)
+
+
+# Gemeinsamer Job-Manager (Größe über app.config JOB_WORKERS / JOB_MAX_FINISHED)
+job_manager = JobManager()
@@ -0,0 +1,141 @@
+import math
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+
+def random_polygons(rng, count, width, height, max_radius, max_vertices, vertex_radius="jitter"):
+    """
+    count zufällige konvexe Polygone auf einmal: Mittelpunkt in [r, width - r] x [r, height - r],
+    3 bis max_vertices Eckpunkte unter zufälligen Winkeln, davon die konvexe Hülle.
+
+    vertex_radius="jitter":  ein Grundradius in [r/2, r] je Polygon, je Eckpunkt um ±20 % variiert
+    vertex_radius="uniform": jeder Eckpunkt unabhängig mit Radius in [r/2, r]
+
+    Liefert (Polygone, Mittelpunkte (count, 2), Umkreisradien (count,)); der Umkreisradius um den
+    Mittelpunkt dient beim Überlappungstest als Vorfilter.
+    """
+    cx = rng.uniform(max_radius, width - max_radius, count)
+    cy = rng.uniform(max_radius, height - max_radius, count)
+    n = rng.integers(3, max_vertices, count, endpoint=True)
+    angles = rng.uniform(0, 2 * math.pi, (count, max_vertices))
+    if vertex_radius == "jitter":
+        radii = rng.uniform(max_radius / 2, max_radius, count)[:, None] * rng.uniform(0.8, 1.2, (count, max_vertices))
+    elif vertex_radius == "uniform":
+        radii = rng.uniform(max_radius / 2, max_radius, (count, max_vertices))
+    else:
+        raise ValueError(f"Unbekannte Radiusverteilung: {vertex_radius}")
+
+    # Nur die ersten n[k] Eckpunkte eines Kandidaten zählen
+    valid = np.arange(max_vertices)[None, :] < n[:, None]
+    xs = cx[:, None] + radii * np.cos(angles)
+    ys = cy[:, None] + radii * np.sin(angles)
+    owner = np.nonzero(valid)[0]
+    points = shapely.multipoints(np.stack([xs[valid], ys[valid]], axis=1), indices=owner)
+    hulls = shapely.convex_hull(points)
+    bounding = np.where(valid, radii, 0.0).max(axis=1)
+    return hulls, np.stack([cx, cy], axis=1), bounding
+
+
+def _circle_pairs(centers_a, radii_a, centers_b, radii_b, cell_size):
+    """
+    Alle Paare (i, j), deren Umkreise sich überlappen (Abstand <= r_a[i] + r_b[j]). Die Kreise aus b
+    werden nach Gitterzelle sortiert; jeder Kreis aus a sucht per searchsorted nur in den 3 x 3
+    Nachbarzellen. Bei cell_size >= 2 · größter Radius werden damit alle Überlappungen gefunden.
+    """
+    if not len(centers_a) or not len(centers_b):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cells_a = np.floor(centers_a / cell_size).astype(np.int64)
+    cells_b = np.floor(centers_b / cell_size).astype(np.int64)
+    low = np.minimum(cells_a.min(axis=0), cells_b.min(axis=0)) - 1
+    span = np.maximum(cells_a.max(axis=0), cells_b.max(axis=0)) - low + 2
+    keys_b = (cells_b[:, 0] - low[0]) * span[1] + (cells_b[:, 1] - low[1])
+    order = np.argsort(keys_b, kind="stable")
+    sorted_keys = keys_b[order]
+
+    firsts, seconds = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keys = (cells_a[:, 0] + dx - low[0]) * span[1] + (cells_a[:, 1] + dy - low[1])
+            lo = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Für jedes a alle b in seinem Bereich [lo, lo + count)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            firsts.append(np.repeat(np.arange(len(centers_a)), counts))
+            seconds.append(order[np.repeat(lo, counts) + offsets])
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    i, j = np.concatenate(firsts), np.concatenate(seconds)
+    d = np.hypot(*(centers_a[i] - centers_b[j]).T)
+    keep = d <= radii_a[i] + radii_b[j]
+    return i[keep], j[keep]
+
+
+def generate_map(width, height, num_obstacles, max_radius, max_vertices, seed=None, rng=None,
+                 reject_overlaps=True, vertex_radius="jitter", max_attempts=None, min_batch=32):
+    """
+    Zufällige Karte mit num_obstacles konvexen Hindernissen und der Arbeitsflächenumrandung.
+
+    Kandidaten werden blockweise in NumPy erzeugt (je Block ein Viertel mehr als noch fehlen,
+    mindestens min_batch) und der Reihe nach angenommen. Mit reject_overlaps wird ein Kandidat verworfen, wenn er
+    ein zuvor angenommenes Hindernis schneidet. Für den ganzen Block werden dazu erst über ein
+    Gitter die Paare mit überlappenden Umkreisen bestimmt und nur diese exakt (Shapely, vektorisiert)
+    geprüft – gegen die bisherigen Hindernisse und gegen frühere Kandidaten desselben Blocks.
+    Höchstens max_attempts Kandidaten (Standard: max(1000, 20 · num_obstacles)); auf vollen Karten
+    können es daher weniger Hindernisse werden.
+
+    Zufall kommt ausschließlich aus rng bzw. einem lokalen numpy.random.Generator aus seed –
+    bei gleichem seed entsteht Bit für Bit dieselbe Karte, unabhängig vom globalen random-Zustand.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if max_attempts is None:
+        max_attempts = max(1000, 20 * num_obstacles)
+    boundary = Polygon([(0, 0), (width, 0), (width, height), (0, height)])
+
+    obstacles = []
+    centers = np.zeros((0, 2))
+    radii = np.zeros(0)
+    # Umkreisradius höchstens 1.2 · max_radius (Jitter)
+    cell_size = max(2 * 1.2 * max_radius, 1e-9)
+    attempts = 0
+    while len(obstacles) < num_obstacles and attempts < max_attempts:
+        missing = num_obstacles - len(obstacles)
+        count = min(max(min_batch, missing + missing // 4), max_attempts - attempts)
+        polygons, batch_centers, batch_radii = random_polygons(
+            rng, count, width, height, max_radius, max_vertices, vertex_radius)
+        attempts += count
+        if not reject_overlaps:
+            obstacles.extend(polygons[:num_obstacles - len(obstacles)].tolist())
+            continue
+
+        # Konflikte mit bereits angenommenen Hindernissen
+        i, j = _circle_pairs(batch_centers, batch_radii, centers, radii, cell_size)
+        hit = shapely.intersects(polygons[i], np.array(obstacles, dtype=object)[j]) if len(i) else np.zeros(0, bool)
+        blocked = np.zeros(count, dtype=bool)
+        blocked[i[hit]] = True
+
+        # Konflikte innerhalb des Blocks: je Kandidat die früheren, die ihn schneiden
+        i, j = _circle_pairs(batch_centers, batch_radii, batch_centers, batch_radii, cell_size)
+        later = (j < i) & ~blocked[i] & ~blocked[j]
+        i, j = i[later], j[later]
+        hit = shapely.intersects(polygons[i], polygons[j]) if len(i) else np.zeros(0, bool)
+        earlier = {}
+        for a, b in zip(i[hit].tolist(), j[hit].tolist()):
+            earlier.setdefault(a, []).append(b)
+
+        accepted = np.zeros(count, dtype=bool)
+        for k in np.nonzero(~blocked)[0].tolist():
+            if len(obstacles) >= num_obstacles:
+                break
+            if any(accepted[b] for b in earlier.get(k, ())):
+                continue
+            accepted[k] = True
+            obstacles.append(polygons[k])
+        centers = np.concatenate([centers, batch_centers[accepted]])
+        radii = np.concatenate([radii, batch_radii[accepted]])
+    return boundary, obstacles
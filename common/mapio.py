@@ -0,0 +1,252 @@
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import Polygon
+
+from . import store
+from .cache import map_cache
+from .mapgen import generate_map
+
+FORMATS = ("geojson", "wkb", "wkb_hex")
+
+# Typ-IDs der Sammelgeometrien (MultiPoint, MultiLineString, MultiPolygon, GeometryCollection)
+_COLLECTION_TYPES = (4, 5, 6, 7)
+_POLYGON_TYPE = 3
+
+
+def detect_format(payload):
+    """Format einer Hinderniseingabe: dict oder Text mit "{" → geojson, Binärdaten → wkb, sonst wkb_hex."""
+    if isinstance(payload, dict):
+        return "geojson"
+    if isinstance(payload, (bytes, bytearray)):
+        if payload[:1] in (b"\x00", b"\x01"):
+            return "wkb"
+        payload = bytes(payload).decode("utf-8", errors="replace")
+    return "geojson" if payload.lstrip()[:1] in ("{", "[") else "wkb_hex"
+
+
+def parse_geometries(payload, fmt=None):
+    """
+    Liest Geometrien in einem Durchgang ein und liefert sie als flaches Array (Sammelgeometrien
+    aufgelöst, Reihenfolge erhalten):
+    geojson:  FeatureCollection, Feature oder Geometrie (als dict, Text oder Bytes)
+    wkb:      eine Geometrie als Binär-WKB (typischerweise MultiPolygon oder GeometryCollection)
+    wkb_hex:  eine Geometrie je Zeile als Hex-WKB, alle Zeilen mit einem shapely.from_wkb-Aufruf
+    Nicht lesbare Eingaben lösen ValueError aus.
+    """
+    fmt = fmt or detect_format(payload)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Kartenformat: {fmt!r} (erwartet: {', '.join(FORMATS)})")
+    try:
+        if fmt == "geojson":
+            if isinstance(payload, dict):
+                payload = json.dumps(payload)
+            geoms = np.array([shapely.from_geojson(payload)], dtype=object)
+        elif fmt == "wkb":
+            geoms = np.array([shapely.from_wkb(bytes(payload))], dtype=object)
+        else:
+            if isinstance(payload, (bytes, bytearray)):
+                payload = bytes(payload).decode("ascii")
+            lines = [line.strip() for line in payload.splitlines() if line.strip()]
+            geoms = shapely.from_wkb(np.array(lines, dtype=object))
+    except (shapely.errors.GEOSException, ValueError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Karte nicht lesbar ({fmt}): {e}") from None
+
+    while len(geoms) and np.isin(shapely.get_type_id(geoms), _COLLECTION_TYPES).any():
+        geoms = shapely.get_parts(geoms)
+    return geoms
+
+
+def validate_obstacles(geoms, width=None, height=None):
+    """
+    Prüft und normalisiert eingelesene Hindernisse und liefert (width, height, obstacles).
+
+    - nur Polygone (auch nicht konvexe und solche mit Löchern), leere werden übergangen
+    - jedes Polygon muss gültig sein (sonst ValueError mit Begründung von GEOS)
+    - alle Hindernisse müssen echt innerhalb von (0, width) x (0, height) liegen; ohne Angabe wird
+      die kleinste ganzzahlige Arbeitsfläche gewählt, die das erfüllt
+    - sich schneidende oder berührende Hindernisse werden vereinigt, da die Zerlegungen
+      disjunkte Hindernisse voraussetzen
+    - Koordinaten werden auf 2D reduziert und mit shapely.normalize in eine kanonische Form
+      gebracht (Startpunkt und Umlaufsinn), die Hindernisse nach ihrem WKB sortiert – gleiche
+      Karten ergeben so unabhängig von Reihenfolge und Format denselben Hash
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    geoms = geoms[~shapely.is_missing(geoms)]
+    geoms = geoms[~shapely.is_empty(geoms)]
+    types = shapely.get_type_id(geoms)
+    wrong = np.nonzero(types != _POLYGON_TYPE)[0]
+    if len(wrong):
+        raise ValueError(f"Nur Polygone als Hindernisse erlaubt, Element {int(wrong[0])} ist "
+                         f"{geoms[wrong[0]].geom_type}")
+    if not len(geoms):
+        raise ValueError("Die Karte enthält keine Hindernisse")
+    geoms = shapely.force_2d(geoms)
+    invalid = np.nonzero(~shapely.is_valid(geoms))[0]
+    if len(invalid):
+        k = int(invalid[0])
+        raise ValueError(f"{len(invalid)} ungültige Polygone, z.B. Element {k}: {shapely.is_valid_reason(geoms[k])}")
+
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms).tolist()
+    if width is None:
+        width = math.floor(maxx) + 1
+    if height is None:
+        height = math.floor(maxy) + 1
+    if minx <= 0 or miny <= 0 or maxx >= width or maxy >= height:
+        raise ValueError(f"Hindernisse (Ausdehnung {minx:g}, {miny:g} bis {maxx:g}, {maxy:g}) liegen nicht "
+                         f"echt innerhalb der Arbeitsfläche 0, 0 bis {width:g}, {height:g}")
+
+    # Überlappende Gruppen vereinigen (Paare aus dem STRtree, dann Zusammenhangskomponenten)
+    left, right = STRtree(geoms).query(geoms, predicate="intersects")
+    pairs = left < right
+    if pairs.any():
+        parent = list(range(len(geoms)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in zip(left[pairs].tolist(), right[pairs].tolist()):
+            parent[find(i)] = find(j)
+        groups = {}
+        for i in range(len(geoms)):
+            groups.setdefault(find(i), []).append(i)
+        merged = []
+        for members in sorted(groups.values()):
+            if len(members) == 1:
+                merged.append(geoms[members[0]])
+            else:
+                merged.extend(shapely.get_parts(shapely.union_all(geoms[members])).tolist())
+        geoms = np.array(merged, dtype=object)
+
+    geoms = shapely.normalize(geoms)
+    blobs = shapely.to_wkb(geoms, byte_order=1, output_dimension=2).tolist()
+    order = sorted(range(len(geoms)), key=blobs.__getitem__)
+    return width, height, geoms[order].tolist()
+
+
+def content_hash(width, height, obstacles):
+    """SHA-256 über Arbeitsfläche und WKB der (normalisierten) Hindernisse."""
+    digest = hashlib.sha256(f"{width!r}x{height!r}".encode())
+    for blob in shapely.to_wkb(np.array(obstacles, dtype=object), byte_order=1, output_dimension=2).tolist():
+        digest.update(blob)
+    return digest.hexdigest()
+
+
+def register_map(obstacles, width, height):
+    """
+    Legt eine eingelesene Karte im gemeinsamen Cache ab und liefert ihren Eintrag. Die map_id
+    ist der Anfang des Inhalts-Hashs: dieselbe Karte erneut hochzuladen ergibt dieselbe ID und
+    trifft alle bereits gecachten Zerlegungen.
+    """
+    map_id = content_hash(width, height, obstacles)[:16]
+    entry = map_cache.get(("upload", map_id))
+    if entry is None:
+        entry = store.put(("upload", map_id), _map_entry(map_id, width, height, obstacles), _encode_map)
+    return entry
+
+
+def _map_entry(map_id, width, height, obstacles):
+    return {
+        "map_id": map_id,
+        "width": width,
+        "height": height,
+        "boundary": Polygon([(0, 0), (width, 0), (width, height), (0, height)]),
+        "obstacles": obstacles,
+    }
+
+
+def _encode_map(entry):
+    return store.pack_geometries(entry["obstacles"], "obstacles_"), {"width": entry["width"], "height": entry["height"]}
+
+
+def import_map(payload, fmt=None, width=None, height=None):
+    """Einlesen, Prüfen und Registrieren in einem Schritt (siehe parse_geometries, validate_obstacles)."""
+    width, height, obstacles = validate_obstacles(parse_geometries(payload, fmt), width, height)
+    return register_map(obstacles, width, height)
+
+
+def load_map_file(path, fmt=None, width=None, height=None):
+    """Karte aus einer Datei (.geojson/.json, .wkb, .hex); ohne fmt entscheidet die Endung bzw. der Inhalt."""
+    if fmt is None:
+        fmt = {".geojson": "geojson", ".json": "geojson", ".wkb": "wkb", ".hex": "wkb_hex"}.get(
+            os.path.splitext(path)[1].lower())
+    with open(path, "rb") as f:
+        payload = f.read()
+    return import_map(payload, fmt, width, height)
+
+
+def obstacle_rings(obstacles):
+    """
+    Hindernisse für JSON-Antworten: (Außenringe, Löcher), jeweils Punktlisten ohne Schlusspunkt;
+    Löcher als Liste von Ringen je Hindernis (leer bei Hindernissen ohne Löcher).
+    """
+    return ([list(obs.exterior.coords)[:-1] for obs in obstacles],
+            [[list(ring.coords)[:-1] for ring in obs.interiors] for obs in obstacles])
+
+
+def map_summary(entry):
+    """Kurzbeschreibung einer registrierten Karte für JSON-Antworten."""
+    obstacles = entry["obstacles"]
+    return {
+        "map_id": entry["map_id"],
+        "width": entry["width"],
+        "height": entry["height"],
+        "num_obstacles": len(obstacles),
+        "num_holes": sum(len(obs.interiors) for obs in obstacles),
+        "num_vertices": int(shapely.get_num_coordinates(np.array(obstacles, dtype=object)).sum()),
+    }
+
+
+def get_map(map_id):
+    """
+    Eintrag einer hochgeladenen Karte; aus dem Cache verdrängte Karten werden aus dem
+    Zerlegungs-Store (common.store) nachgeladen, sofern eingeschaltet. KeyError, wenn sie unbekannt ist.
+    """
+    entry = map_cache.get(("upload", map_id))
+    if entry is None:
+        stored = store.decomposition_store.load(("upload", map_id))
+        if stored is None:
+            raise KeyError(map_id)
+        arrays, meta = stored
+        entry = map_cache.put(("upload", map_id), _map_entry(
+            map_id, meta["width"], meta["height"], store.unpack_geometries(arrays, "obstacles_")))
+    return entry
+
+
+def map_source(params, width, height, num_obstacles, max_vertices, obstacle_size, seed):
+    """
+    Kartenquelle einer Anfrage als hashbares Tupel, Grundlage aller Cache-Schlüssel der Planer:
+    ("upload", width, height, map_id), wenn params eine map_id enthält (Größe aus der hochgeladenen
+    Karte), sonst ("random", width, height, num_obstacles, max_vertices, obstacle_size, seed).
+    Eine unbekannte map_id löst KeyError aus.
+    """
+    map_id = params.get("map_id")
+    if map_id:
+        entry = get_map(str(map_id))
+        return ("upload", entry["width"], entry["height"], entry["map_id"])
+    return ("random", width, height, num_obstacles, max_vertices, obstacle_size, seed)
+
+
+def cached_map(namespace, source, generate=generate_map):
+    """
+    (boundary, obstacles) zu einer Kartenquelle: hochgeladene Karten direkt aus ihrem Eintrag,
+    Zufallskarten mit generate(width, height, num_obstacles, obstacle_size, max_vertices, seed=...)
+    erzeugt und je namespace gecacht.
+    """
+    if source[0] == "upload":
+        entry = get_map(source[3])
+        return entry["boundary"], entry["obstacles"]
+    _, width, height, num_obstacles, max_vertices, obstacle_size, seed = source
+
+    def build():
+        return generate(width, height, num_obstacles, obstacle_size, max_vertices, seed=seed)
+
+    return map_cache.get_or_create((namespace, "map") + source[1:], build)
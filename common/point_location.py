@@ -0,0 +1,85 @@
+import bisect
+
+
+def _open_ring(polygon):
+    """Eckpunkte als Liste von (x, y)-Tupeln ohne wiederholten Schlusspunkt."""
+    ring = [(float(p[0]), float(p[1])) for p in polygon]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    return ring
+
+
+def _y_at(a, b, x):
+    """y-Koordinate der (nicht vertikalen) Strecke a-b an der Stelle x."""
+    return a[1] + (b[1] - a[1]) * (x - a[0]) / (b[0] - a[0])
+
+
+class PointLocator:
+    """
+    Punktlokalisierung über einer Zerlegung in sich nicht überlappende Polygone
+    (Faces der vertikalen Zerlegung, Quadtree-Zellen, ...) mit der Slab-Methode.
+
+    Die x-Koordinaten aller Eckpunkte teilen die Ebene in vertikale Streifen (Slabs).
+    Innerhalb eines Slabs zerfällt jedes Polygon in Trapeze aus Boden- und Deckenkante,
+    die nach ihrer Höhe sortiert gespeichert werden. Eine Anfrage besteht aus zwei
+    binären Suchen: Slab über x, Trapez über y.
+    """
+
+    def __init__(self, polygons, ids=None):
+        ids = list(range(len(polygons))) if ids is None else list(ids)
+        rings = [_open_ring(polygon) for polygon in polygons]
+        self.xs = sorted({p[0] for ring in rings for p in ring})
+        # Je Slab: Liste von (Boden, Decke, id); Kanten als (y links, y rechts) am Slab-Rand
+        self.slabs = [[] for _ in range(max(0, len(self.xs) - 1))]
+
+        for face_id, ring in zip(ids, rings):
+            crossing = {}
+            for k in range(len(ring)):
+                a, b = ring[k], ring[(k + 1) % len(ring)]
+                if a[0] == b[0]:
+                    continue
+                if a[0] > b[0]:
+                    a, b = b, a
+                lo = bisect.bisect_left(self.xs, a[0])
+                hi = bisect.bisect_left(self.xs, b[0])
+                for s in range(lo, hi):
+                    crossing.setdefault(s, []).append(
+                        (_y_at(a, b, self.xs[s]), _y_at(a, b, self.xs[s + 1])))
+            # Von unten nach oben abwechselnd Boden- und Deckenkante eines Trapezes
+            for s, edges in crossing.items():
+                edges.sort(key=lambda e: e[0] + e[1])
+                for k in range(0, len(edges) - 1, 2):
+                    self.slabs[s].append((edges[k], edges[k + 1], face_id))
+
+        for slab in self.slabs:
+            slab.sort(key=lambda trapezoid: trapezoid[0][0] + trapezoid[0][1])
+
+    def locate(self, point):
+        """id des Polygons, das point enthält, oder None (Hindernis bzw. außerhalb)."""
+        x, y = float(point[0]), float(point[1])
+        s = bisect.bisect_right(self.xs, x) - 1
+        if s == len(self.slabs) and x == self.xs[-1]:
+            s -= 1  # Punkt auf dem rechten Rand gehört zum letzten Slab
+        if s < 0 or s >= len(self.slabs):
+            return None
+
+        x_left, x_right = self.xs[s], self.xs[s + 1]
+        t = (x - x_left) / (x_right - x_left)
+        slab = self.slabs[s]
+
+        # Oberstes Trapez, dessen Boden bei x nicht über dem Punkt liegt
+        lo, hi = 0, len(slab)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            floor = slab[mid][0]
+            if floor[0] + (floor[1] - floor[0]) * t <= y:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == 0:
+            return None
+
+        floor, ceiling, face_id = slab[lo - 1]
+        if y <= ceiling[0] + (ceiling[1] - ceiling[0]) * t:
+            return face_id
+        return None
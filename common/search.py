@@ -0,0 +1,160 @@
+import heapq
+import math
+
+# Suchverfahren für die Pfadplanung auf den Graphen der drei Planer
+METHODS = ("astar", "dijkstra", "bidirectional")
+
+
+def check_method(method):
+    """ValueError, wenn method kein bekanntes Suchverfahren ist."""
+    if method not in METHODS:
+        raise ValueError(f"Unbekanntes Suchverfahren: {method!r} (erwartet: {', '.join(METHODS)})")
+
+
+def _reconstruct(prev, node):
+    path = [node]
+    while node in prev:
+        node = prev[node]
+        path.append(node)
+    return path
+
+
+def astar(neighbors, source, target, position=None):
+    """
+    A* von source nach target. position(v) liefert die Koordinaten eines Knotens für die
+    euklidische Heuristik; sie ist zulässig und konsistent, solange jedes Kantengewicht
+    mindestens dem Abstand seiner Endpunkte entspricht. Ohne position: Dijkstra.
+    Liefert (Pfad oder None, Anzahl expandierter Knoten).
+    """
+    if position is None:
+        def h(v):
+            return 0.0
+    else:
+        goal = position(target)
+
+        def h(v):
+            return math.dist(position(v), goal)
+
+    dist = {source: 0.0}
+    prev = {}
+    closed = set()
+    heap = [(h(source), 0, source)]
+    counter = 1
+    while heap:
+        _, _, u = heapq.heappop(heap)
+        if u in closed:
+            continue
+        if u == target:
+            return _reconstruct(prev, u)[::-1], len(closed)
+        closed.add(u)
+        d = dist[u]
+        for v, w in neighbors(u):
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                prev[v] = u
+                heapq.heappush(heap, (nd + h(v), counter, v))
+                counter += 1
+    return None, len(closed)
+
+
+def shortest_path_tree(neighbors, source, targets=None):
+    """
+    Dijkstra von source aus; mit targets endet die Suche, sobald alle Ziele abgeschlossen sind.
+    Liefert (dist, prev) als Dicts – Pfade zu mehreren Zielen derselben Quelle lassen sich
+    daraus mit path_to ablesen, ohne je Ziel neu zu suchen.
+    """
+    remaining = set(targets) if targets is not None else None
+    dist = {source: 0.0}
+    prev = {}
+    closed = set()
+    heap = [(0.0, 0, source)]
+    counter = 1
+    while heap:
+        d, _, u = heapq.heappop(heap)
+        if u in closed:
+            continue
+        closed.add(u)
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        for v, w in neighbors(u):
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                prev[v] = u
+                heapq.heappush(heap, (nd, counter, v))
+                counter += 1
+    return dist, prev
+
+
+def path_to(prev, target):
+    """Pfad von der Wurzel eines Kürzeste-Wege-Baums (prev) bis target."""
+    return _reconstruct(prev, target)[::-1]
+
+
+def bidirectional_astar(neighbors, source, target, position):
+    """
+    Bidirektionaler A* mit ausgeglichenen Potentialen p(v) = (h_t(v) - h_s(v)) / 2 für die
+    Vorwärts- und -p(v) für die Rückwärtssuche (ungerichteter Graph). Beide Suchen sehen
+    dadurch dieselben nichtnegativen reduzierten Kosten; abgebrochen wird, sobald die
+    Summe der kleinsten Schlüssel beider Seiten die beste bekannte Pfadlänge erreicht.
+    Liefert (Pfad oder None, Anzahl expandierter Knoten beider Seiten).
+    """
+    if source == target:
+        return [source], 0
+    p_source, p_target = position(source), position(target)
+
+    def potential(v):
+        p = position(v)
+        return (math.dist(p, p_target) - math.dist(p, p_source)) / 2
+
+    sign = (1, -1)
+    dist = ({source: 0.0}, {target: 0.0})
+    prev = ({}, {})
+    closed = (set(), set())
+    heaps = ([(potential(source), 0, source)], [(-potential(target), 0, target)])
+    counter = 1
+    best, meet = math.inf, None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        _, _, u = heapq.heappop(heaps[side])
+        if u in closed[side]:
+            continue
+        closed[side].add(u)
+        d = dist[side][u]
+        for v, w in neighbors(u):
+            nd = d + w
+            if nd < dist[side].get(v, math.inf):
+                dist[side][v] = nd
+                prev[side][v] = u
+                heapq.heappush(heaps[side], (nd + sign[side] * potential(v), counter, v))
+                counter += 1
+            if v in dist[1 - side] and dist[side][v] + dist[1 - side][v] < best:
+                best = dist[side][v] + dist[1 - side][v]
+                meet = v
+
+    expanded = len(closed[0]) + len(closed[1])
+    if meet is None:
+        return None, expanded
+    forward = _reconstruct(prev[0], meet)[::-1]
+    backward = _reconstruct(prev[1], meet)
+    return forward + backward[1:], expanded
+
+
+def shortest_path(neighbors, source, target, position=None, method="astar"):
+    """
+    Kürzester Pfad mit dem gewählten Verfahren ("astar", "dijkstra" oder "bidirectional").
+    Liefert (Pfad oder None, Anzahl expandierter Knoten).
+    """
+    if method == "dijkstra":
+        return astar(neighbors, source, target)
+    if method == "astar":
+        return astar(neighbors, source, target, position)
+    if method == "bidirectional":
+        return bidirectional_astar(neighbors, source, target, position)
+    raise ValueError(f"Unbekanntes Suchverfahren: {method!r} (erwartet: {', '.join(METHODS)})")
@@ -0,0 +1,81 @@
+import heapq
+
+import numpy as np
+
+
+class KDTree:
+    """
+    Statischer 2D-KD-Baum über Knotenkoordinaten für Nächster-Nachbar-Anfragen (Start/Ziel auf
+    den Graphen einrasten). Geteilt wird jeweils entlang der längeren Ausdehnung am Median,
+    bis höchstens leaf_size Punkte übrig sind; die Punkte der Blätter liegen zusammenhängend
+    in points[order], sodass ein Blatt mit einem NumPy-Aufruf ausgewertet wird.
+    Einmal pro gecachtem Graphen aufgebaut, kostet eine Anfrage O(log n) statt O(n).
+    """
+
+    def __init__(self, points, leaf_size=16):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.leaf_size = max(1, leaf_size)
+        self.order = np.arange(len(self.points))
+        # Knoten (start, end, achse, teilungswert, links, rechts); Blätter haben achse -1
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+        self.leaf_points = self.points[self.order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, start, end):
+        node = len(self.nodes)
+        self.nodes.append(None)
+        if end - start <= self.leaf_size:
+            self.nodes[node] = (start, end, -1, 0.0, -1, -1)
+            return node
+        idx = self.order[start:end]
+        pts = self.points[idx]
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        mid = (end - start) // 2
+        # Links liegen alle Werte <= split, rechts alle >= split
+        self.order[start:end] = idx[np.argpartition(pts[:, axis], mid)]
+        split = float(self.points[self.order[start + mid], axis])
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self.nodes[node] = (start, end, axis, split, left, right)
+        return node
+
+    def k_nearest(self, point, k=1):
+        """
+        Indizes (in points) der k nächsten Punkte, aufsteigend nach Abstand; bei gleichem
+        Abstand gewinnt der kleinere Index.
+        """
+        if not self.nodes or k <= 0:
+            return []
+        p = (float(point[0]), float(point[1]))
+        # Max-Heap der bisher besten k als (-abstand², -index)
+        best = []
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound > -best[0][0]:
+                continue
+            start, end, axis, split, left, right = self.nodes[node]
+            if axis < 0:
+                diff = self.leaf_points[start:end] - p
+                d2 = (diff[:, 0] * diff[:, 0] + diff[:, 1] * diff[:, 1]).tolist()
+                for i, d in zip(self.order[start:end].tolist(), d2):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, -i))
+                    elif (d, i) < (-best[0][0], -best[0][1]):
+                        heapq.heapreplace(best, (-d, -i))
+                continue
+            delta = p[axis] - split
+            near, far = (left, right) if delta <= 0 else (right, left)
+            # Der nähere Teilbaum wird zuerst besucht (zuletzt auf den Stapel gelegt)
+            stack.append((far, max(bound, delta * delta)))
+            stack.append((near, bound))
+        return [-i for _, i in sorted(best, key=lambda e: (-e[0], -e[1]))]
+
+    def nearest(self, point):
+        """Index des nächsten Punkts (None bei leerem Baum)."""
+        result = self.k_nearest(point, 1)
+        return result[0] if result else None
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+import shapely
+
+from .cache import map_cache
+
+# Dateiformat: MAGIC, Länge des JSON-Kopfs (uint64, little endian), JSON-Kopf, dann die Rohdaten
+# aller Arrays, jeweils auf _ALIGN Bytes ausgerichtet. Der Kopf enthält je Array dtype, shape und
+# Offset sowie beliebige JSON-Metadaten.
+MAGIC = b"PLSTORE1"
+_ALIGN = 64
+# Fließt in Dateinamen und Kopf ein; erhöhen, wenn sich Kodierung oder Kartengenerator ändern,
+# damit alte Dateien nicht mehr gefunden werden
+STORE_VERSION = 1
+SUFFIX = ".plst"
+
+
+def write_arrays(path, arrays, meta=None):
+    """
+    Schreibt benannte NumPy-Arrays (keine Objekt-Arrays) und JSON-Metadaten in eine Datei.
+    Geschrieben wird in eine temporäre Datei im selben Verzeichnis, die dann per os.replace
+    umbenannt wird: parallel lesende Prozesse sehen nie eine halb geschriebene Datei.
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise ValueError(f"Objekt-Array {name!r} kann nicht gespeichert werden")
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset += a.nbytes
+    header = json.dumps({"meta": meta or {}, "arrays": layout}).encode()
+    # Datenbereich beginnt ebenfalls ausgerichtet
+    start = -(-(len(MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+    header += b" " * (start - len(MAGIC) - 8 - len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, a in arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(a.tobytes())
+            f.truncate(start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_arrays(path):
+    """
+    Öffnet eine mit write_arrays geschriebene Datei per np.memmap (nur lesend) und liefert
+    (arrays, meta). Die Arrays sind Sichten auf die eingeblendeten Seiten: nichts wird kopiert,
+    und alle Prozesse, die dieselbe Datei öffnen, teilen sich deren Seiten im Page Cache.
+    Ungültige Dateien lösen ValueError aus.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Keine Store-Datei: {path}")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    start = len(MAGIC) + 8 + length
+    size = os.path.getsize(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        lo = start + spec["offset"]
+        hi = lo + count * dtype.itemsize
+        if hi > size:
+            raise ValueError(f"Store-Datei abgeschnitten: {path}")
+        arrays[name] = mapped[lo:hi].view(dtype).reshape(spec["shape"])
+    return arrays, header["meta"]
+
+
+# ----- Kodierung gemeinsamer Strukturen als flache Arrays -----
+
+def pack_csr(graph, prefix=""):
+    """
+    Arrays eines CSRGraph. Schlüssel, die den Koordinaten entsprechen (Koordinaten-Tupel),
+    werden nicht gespeichert; ganzzahlige Schlüssel als eigenes Array.
+    """
+    arrays = {prefix + "indptr": graph.indptr, prefix + "indices": graph.indices,
+              prefix + "weights": graph.weights, prefix + "coords": graph.coords}
+    if graph.keys and not isinstance(graph.keys[0], tuple):
+        arrays[prefix + "keys"] = np.asarray(graph.keys, dtype=np.int64)
+    return arrays
+
+
+def unpack_csr(arrays, prefix=""):
+    """Gegenstück zu pack_csr; die Arrays werden ohne Kopie übernommen."""
+    from .csr import CSRGraph
+
+    coords = arrays[prefix + "coords"]
+    keys = arrays.get(prefix + "keys")
+    keys = [tuple(p) for p in coords.tolist()] if keys is None else keys.tolist()
+    return CSRGraph(arrays[prefix + "indptr"], arrays[prefix + "indices"], arrays[prefix + "weights"],
+                    coords, keys)
+
+
+def pack_ragged(rows, prefix, dtype=np.float64, width=2):
+    """Liste von Punktlisten als (N, width)-Array plus Offsets (len(rows) + 1)."""
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(r) for r in rows], out=offsets[1:])
+    flat = np.array([p for r in rows for p in r], dtype=dtype).reshape(-1, width)
+    return {prefix + "values": flat, prefix + "offsets": offsets}
+
+
+def unpack_ragged(arrays, prefix):
+    """Gegenstück zu pack_ragged: Liste von Listen aus Tupeln."""
+    values = [tuple(p) for p in arrays[prefix + "values"].tolist()]
+    offsets = arrays[prefix + "offsets"].tolist()
+    return [values[lo:hi] for lo, hi in zip(offsets, offsets[1:])]
+
+
+def pack_geometries(geoms, prefix):
+    """Shapely-Geometrien als WKB, aneinandergehängt in einem uint8-Array plus Offsets."""
+    blobs = shapely.to_wkb(np.array(geoms, dtype=object), byte_order=1).tolist() if len(geoms) else []
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return {prefix + "wkb": np.frombuffer(b"".join(blobs), dtype=np.uint8), prefix + "offsets": offsets}
+
+
+def unpack_geometries(arrays, prefix):
+    data = arrays[prefix + "wkb"].tobytes()
+    offsets = arrays[prefix + "offsets"].tolist()
+    blobs = np.array([data[lo:hi] for lo, hi in zip(offsets, offsets[1:])], dtype=object)
+    return shapely.from_wkb(blobs).tolist() if len(blobs) else []
+
+
+class DecompositionStore:
+    """
+    Zweite Ebene unter map_cache: vorberechnete Zerlegungen und Graphen als Dateien im Format
+    von write_arrays, eine Datei je Cache-Schlüssel. Worker-Prozesse, die mit demselben
+    Verzeichnis starten, laden fertige Einträge per memmap statt sie neu zu berechnen.
+    Ohne Verzeichnis (Standard) ist der Store abgeschaltet.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+        self.configure(directory)
+
+    def configure(self, directory=None):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory or None
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def _tag(self, key):
+        return f"v{STORE_VERSION}:{key!r}"
+
+    def path(self, key):
+        """Dateiname aus dem Hash des Schlüssels (Schlüssel sind Tupel aus Zahlen und Strings)."""
+        digest = hashlib.sha256(self._tag(key).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, digest + SUFFIX)
+
+    def load(self, key):
+        """(arrays, meta) zum Schlüssel oder None, wenn nicht vorhanden bzw. nicht lesbar."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            arrays, meta = read_arrays(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.errors += 1
+            return None
+        if meta.get("key") != self._tag(key):
+            return None
+        with self._lock:
+            self.loads += 1
+        return arrays, meta.get("data", {})
+
+    def save(self, key, arrays, meta=None):
+        if not self.enabled:
+            return
+        try:
+            write_arrays(self.path(key), arrays, {"key": self._tag(key), "data": meta or {}})
+        except OSError:
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.saves += 1
+
+    def stats(self):
+        with self._lock:
+            return {"directory": self.directory, "loads": self.loads, "saves": self.saves, "errors": self.errors}
+
+
+# Gemeinsamer Store aller Planer (über app.config DECOMPOSITION_STORE_DIR eingeschaltet)
+decomposition_store = DecompositionStore()
+
+
+def get_or_create(key, build, encode, decode):
+    """
+    Wie map_cache.get_or_create, mit dem Store als zweiter Ebene: fehlt der Eintrag im Cache,
+    wird er mit decode(arrays, meta) aus der Datei geladen oder mit build() erzeugt und als
+    encode(value) -> (arrays, meta) gespeichert.
+    """
+    def factory():
+        stored = decomposition_store.load(key)
+        if stored is not None:
+            try:
+                return decode(*stored)
+            except (KeyError, ValueError, IndexError):
+                pass
+        value = build()
+        if decomposition_store.enabled:
+            decomposition_store.save(key, *encode(value))
+        return value
+
+    return map_cache.get_or_create(key, factory)
+
+
+def put(key, value, encode):
+    """Wie map_cache.put; bei eingeschaltetem Store wird der Eintrag auch gespeichert, falls noch nicht vorhanden."""
+    if decomposition_store.enabled and not os.path.exists(decomposition_store.path(key)):
+        decomposition_store.save(key, *encode(value))
+    return map_cache.put(key, value)
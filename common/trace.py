@@ -0,0 +1,62 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Aktiver Trace-Puffer des aktuellen Requests/Threads (None = keine Aufzeichnung)
+_active_buffer = ContextVar("trace_buffer", default=None)
+
+
+class TraceBuffer:
+    """Strukturierter Puffer für Trace-Ereignisse; begrenzt auf max_events Einträge."""
+
+    def __init__(self, max_events=10000):
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+
+    def append(self, event):
+        if len(self.events) < self.max_events:
+            self.events.append(event)
+        else:
+            self.dropped += 1
+
+    def to_dict(self):
+        return {"events": self.events, "dropped": self.dropped}
+
+
+class Tracer:
+    """
+    Schritt-Trace für die Planer-Algorithmen. Solange weder DEBUG-Logging für den Logger
+    aktiv ist noch ein Puffer per capture_trace() aufzeichnet, kostet ein Aufruf nur die
+    Prüfung von enabled: Nachrichten werden erst bei Bedarf formatiert (%-Argumente),
+    aufwendige Zusatzdaten sollten hinter `if trace.enabled:` berechnet werden.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    @property
+    def enabled(self):
+        return _active_buffer.get() is not None or self.logger.isEnabledFor(logging.DEBUG)
+
+    def __call__(self, step, msg, *args, **data):
+        buffer = _active_buffer.get()
+        if buffer is None and not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        message = msg % args if args else msg
+        if buffer is not None:
+            event = {"step": step, "message": message}
+            event.update(data)
+            buffer.append(event)
+        self.logger.debug("[%s] %s", step, message)
+
+
+@contextmanager
+def capture_trace(max_events=10000):
+    """Zeichnet alle Trace-Ereignisse innerhalb des with-Blocks in einem TraceBuffer auf."""
+    buffer = TraceBuffer(max_events)
+    token = _active_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _active_buffer.reset(token)
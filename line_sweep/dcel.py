@@ -0,0 +1,84 @@
+import math
+
+
+class DCEL:
+    """
+    Doppelt verkettete Kantenliste (Half-Edge-Struktur) eines geradlinig eingebetteten,
+    planaren Graphen mit Koordinaten-Tupeln als Knoten (z.B. der Map-Graph der Zerlegung).
+
+    Jede Kante u-v wird als zwei Halbkanten u->v und v->u gespeichert; die Fläche einer
+    Halbkante liegt links von ihr. Die ausgehenden Halbkanten eines Knotens werden einmal
+    nach Winkel sortiert, daraus ergibt sich next[] direkt (die im Uhrzeigersinn auf die
+    Gegenkante folgende Halbkante). Alle Faces werden danach in einem O(E)-Durchlauf
+    aufgezählt, die Face-Zuordnung einer Kante ist ein Dictionary-Zugriff.
+    """
+
+    def __init__(self, G):
+        self.origin = []
+        self.twin = []
+        self.index = {}
+        for u, v in G.edges():
+            if u == v:
+                continue
+            i = len(self.origin)
+            self.origin += [u, v]
+            self.twin += [i + 1, i]
+            self.index[(u, v)] = i
+            self.index[(v, u)] = i + 1
+
+        # Ausgehende Halbkanten je Knoten gegen den Uhrzeigersinn sortieren
+        outgoing = {}
+        for i, u in enumerate(self.origin):
+            outgoing.setdefault(u, []).append(i)
+        self.next = [-1] * len(self.origin)
+        for u, edges in outgoing.items():
+            edges.sort(key=lambda i: self._angle(i))
+            for k, e in enumerate(edges):
+                # Ankunft über twin[e]: weiter mit der im Uhrzeigersinn folgenden Halbkante
+                self.next[self.twin[e]] = edges[k - 1]
+
+        # Faces als Zyklen der next-Zeiger
+        self.face = [-1] * len(self.origin)
+        self.cycles = []
+        for i in range(len(self.origin)):
+            if self.face[i] != -1:
+                continue
+            face_id = len(self.cycles)
+            cycle = []
+            j = i
+            while self.face[j] == -1:
+                self.face[j] = face_id
+                cycle.append(j)
+                j = self.next[j]
+            self.cycles.append(cycle)
+
+    def _angle(self, i):
+        u, v = self.origin[i], self.target(i)
+        return math.atan2(v[1] - u[1], v[0] - u[0])
+
+    def target(self, i):
+        return self.origin[self.twin[i]]
+
+    def face_of(self, u, v):
+        """Face links der gerichteten Kante u->v."""
+        return self.face[self.index[(u, v)]]
+
+    def face_vertices(self, face_id, start=None):
+        """
+        Eckpunkte eines Faces gegen den Uhrzeigersinn (Face links), geschlossen
+        (erster Punkt am Ende wiederholt). Mit start = (u, v) beginnt der Umlauf bei u->v.
+        """
+        cycle = self.cycles[face_id]
+        if start is not None:
+            k = cycle.index(self.index[start])
+            cycle = cycle[k:] + cycle[:k]
+        points = [self.origin[i] for i in cycle]
+        return points + [points[0]]
+
+    def signed_area(self, face_id):
+        """Orientierte Fläche (Shoelace); positiv für beschränkte Faces, negativ für das äußere."""
+        area = 0.0
+        for i in self.cycles[face_id]:
+            (x1, y1), (x2, y2) = self.origin[i], self.target(i)
+            area += x1 * y2 - x2 * y1
+        return area / 2
@@ -1,14 +1,25 @@
 import random
 
-import networkx as nx
-from flask import render_template, jsonify, request
-from shapely import Polygon, Point
+import numpy as np
+from flask import render_template, jsonify, request, current_app, abort, url_for
+from shapely import Polygon
 
+from common.adjacency import build_graph_from_grid
+from common import store
+from common.batch import parse_batch_request
+from common.cache import map_cache
+from common.csr import CSRGraph
+from common.fields import select_fields
+from common.jobs import job_manager
+from common.mapio import map_source, cached_map, get_map, obstacle_rings
+from common.point_location import PointLocator
+from common.search import check_method
+from common.spatial import KDTree
+from common.trace import capture_trace
 from . import line_sweep_bp
 from .utils import (
-    generate_map,
-    compute_vertical_lines, build_map_graph, find_nearest_node,
-    compute_custom_faces_from_graph, print_graph_debug_info, build_graph_from_grid,
+    compute_vertical_lines, build_map_graph,
+    compute_custom_faces_from_graph, snap_to_map_node,
 )
 
 
@@ -17,81 +28,390 @@ def index():
     return render_template('line_sweep.html')
 
 
+def _cached_map(source):
+    return cached_map("line_sweep", source)
+
+
+def _no_progress(phase):
+    pass
+
+
+def _build_map_graph(width, height, obstacles, progress=_no_progress):
+    progress("vertical_lines")
+    v_lines = compute_vertical_lines(width, height, obstacles)
+    progress("map_graph")
+    return build_map_graph(width, height, obstacles, v_lines)
+
+
+def _map_graph_entry(G_map):
+    map_graph = CSRGraph.from_networkx(G_map, position=lambda p: p)
+    return {
+        # Map-Graph für die Ausgabe nur serialisiert, für die Pfadsuche als CSR-Graph
+        "map_graph_data": {
+            "nodes": [{"point": n} for n in G_map.nodes()],
+            "edges": [{"source": u, "target": v} for u, v in G_map.edges()]
+        },
+        "map_graph": map_graph,
+        # KD-Baum über die Map-Knoten für den Map-Pfad (Start/Ziel einrasten)
+        "map_index": KDTree(map_graph.coords),
+    }
+
+
+def _encode_map_graph(entry):
+    """Map-Graph als Arrays für common.store; die Kanten der Ausgabe als Knotenindex-Paare."""
+    index = entry["map_graph"].index
+    pairs = np.array([(index[e["source"]], index[e["target"]]) for e in entry["map_graph_data"]["edges"]],
+                     dtype=np.int32).reshape(-1, 2)
+    return dict(store.pack_csr(entry["map_graph"]), edge_pairs=pairs), {}
+
+
+def _decode_map_graph(arrays, meta):
+    map_graph = store.unpack_csr(arrays)
+    keys = map_graph.keys
+    return {
+        "map_graph_data": {
+            "nodes": [{"point": key} for key in keys],
+            "edges": [{"source": keys[i], "target": keys[j]} for i, j in arrays["edge_pairs"].tolist()]
+        },
+        "map_graph": map_graph,
+        "map_index": KDTree(map_graph.coords),
+    }
+
+
+def _cached_map_graph(source, progress=_no_progress):
+    """
+    Map-Graph der vertikalen Zerlegung je Kartenquelle (siehe common.mapio.map_source), ohne Faces.
+    progress(phase) meldet die Phasen des Aufbaus (siehe JOB_PHASES), nur wenn tatsächlich gebaut wird.
+    """
+    def build():
+        boundary, obstacles = _cached_map(source)
+        return _map_graph_entry(_build_map_graph(source[1], source[2], obstacles, progress))
+
+    key = ("line_sweep", "map_graph") + source
+    return store.get_or_create(key, build, _encode_map_graph, _decode_map_graph)
+
+
+def _encode_faces(entry):
+    """Faces, Face-Graph (Listen und CSR) als Arrays für common.store; der PointLocator wird beim Laden neu aufgebaut."""
+    nodes, links = entry["face_nodes"], entry["face_links"]
+    arrays = store.pack_ragged(entry["faces"], "faces_")
+    arrays.update(store.pack_csr(entry["face_graph"], "graph_"))
+    arrays.update({
+        "node_ids": np.array([n["id"] for n in nodes], dtype=np.int64),
+        "node_centroids": np.array([n["centroid"] for n in nodes], dtype=np.float64).reshape(-1, 2),
+        "link_ends": np.array([(l["source"], l["target"]) for l in links], dtype=np.int64).reshape(-1, 2),
+        "link_weights": np.array([l["weight"] for l in links], dtype=np.float64),
+    })
+    return arrays, {}
+
+
+def _decode_faces(arrays, meta):
+    faces = store.unpack_ragged(arrays, "faces_")
+    return {
+        "faces": faces,
+        "locator": PointLocator(faces),
+        "face_nodes": [{"id": i, "centroid": tuple(c)} for i, c in
+                       zip(arrays["node_ids"].tolist(), arrays["node_centroids"].tolist())],
+        "face_links": [{"source": u, "target": v, "weight": w} for (u, v), w in
+                       zip(arrays["link_ends"].tolist(), arrays["link_weights"].tolist())],
+        "face_graph": store.unpack_csr(arrays, "graph_"),
+    }
+
+
+def _cached_faces(source, progress=_no_progress):
+    """
+    Faces, Punktlokalisierung und Face-Graph je Kartenquelle. Der dafür aufgebaute
+    Map-Graph wird, falls noch nicht vorhanden, gleich mit gecacht.
+    """
+    def build():
+        boundary, obstacles = _cached_map(source)
+        G_map = _build_map_graph(source[1], source[2], obstacles, progress)
+        map_key = ("line_sweep", "map_graph") + source
+        if map_key not in map_cache:
+            store.put(map_key, _map_graph_entry(G_map), _encode_map_graph)
+
+        # Faces berechnen
+        progress("faces")
+        faces = compute_custom_faces_from_graph(G_map, vertical_tol=1e-6)
+
+        # Face-Graph erstellen
+        progress("face_graph")
+        face_cells = [{
+            "number": i,
+            "polygon": face,
+            "bounds": Polygon(face).bounds
+        } for i, face in enumerate(faces)]
+        face_nodes, face_links = build_graph_from_grid(face_cells)
+        # Bounding-Box-Mitten der Faces: darauf beruhen die Kantengewichte des Face-Graphen,
+        # daher sind sie (anders als die Schwerpunkte) als A*-Heuristik zulässig
+        face_centers = {cell["number"]: ((cell["bounds"][0] + cell["bounds"][2]) / 2,
+                                         (cell["bounds"][1] + cell["bounds"][3]) / 2)
+                        for cell in face_cells}
+
+        return {
+            "faces": faces,
+            "locator": PointLocator(faces),
+            "face_nodes": face_nodes,
+            "face_links": face_links,
+            "face_graph": CSRGraph.from_links(face_nodes, face_links, position=face_centers.__getitem__),
+        }
+
+    key = ("line_sweep", "faces") + source
+    return store.get_or_create(key, build, _encode_faces, _decode_faces)
+
+
+# Abschnitte der Antwort von graph_data_line_sweep_random, wählbar über fields= bzw. mode=path
+RESPONSE_SECTIONS = ("obstacles", "map_graph", "faces", "face_graph", "face_path", "map_path")
+PATH_SECTIONS = ("face_path", "map_path")
+
+
+# Phasen eines Line-Sweep-Jobs in ihrer Reihenfolge; bereits gecachte Stufen werden übersprungen
+JOB_PHASES = ("generate", "vertical_lines", "map_graph", "faces", "face_graph", "search")
+
+
+def _parse_params(params):
+    """
+    Parameter von graph_data_line_sweep_random bzw. eines Jobs aus params (Query-Argumente oder
+    JSON-Body): (source, start, goal, search, fields, seed). Ungültige Werte lösen ValueError aus,
+    eine unbekannte map_id KeyError.
+    """
+    width = int(params.get("width", 600))
+    height = int(params.get("height", 600))
+    num_obstacles = int(params.get("num_obstacles", 3))
+    max_vertices = int(params.get("max_vertices", 6))
+    obstacle_size = float(params.get("obstacle_size", 100))
+    seed = params.get("seed", str(random.randint(0, 1000000)))
+    # Pfadsuche: "astar" (euklidische Heuristik), "dijkstra" oder "bidirectional"
+    search = params.get("search", "astar")
+    check_method(search)
+    fields = select_fields(params, RESPONSE_SECTIONS, PATH_SECTIONS)
+    # map_id=...: hochgeladene Karte (POST /maps) statt Zufallskarte
+    source = map_source(params, width, height, num_obstacles, max_vertices, obstacle_size, int(seed))
+    start = (float(params.get("start_x", 50)), float(params.get("start_y", 300)))
+    goal = (float(params.get("goal_x", 550)), float(params.get("goal_y", 300)))
+    return source, start, goal, search, fields, seed
+
+
+def _line_sweep_response(source, start, goal, search, fields, seed, progress=_no_progress):
+    """Antwort von graph_data_line_sweep_random; progress(phase) meldet die Phasen aus JOB_PHASES."""
+    response = {}
+    expanded = {}
+
+    # 2.-5. Karte, Faces mit Face-Graph und Map-Graph (gecacht je Kartenquelle). Die Faces zuerst:
+    # deren Aufbau legt den Map-Graph gleich mit ab
+    progress("generate")
+    boundary, obstacles = _cached_map(source)
+    if "obstacles" in fields:
+        response["obstacles"], response["obstacle_holes"] = obstacle_rings(obstacles)
+    face_stage = map_stage = None
+    if fields & {"faces", "face_graph", "face_path"}:
+        face_stage = _cached_faces(source, progress)
+        if "faces" in fields:
+            response["faces"] = [list(face) for face in face_stage["faces"]]
+        if "face_graph" in fields:
+            response["face_graph"] = {
+                "nodes": face_stage["face_nodes"],
+                "edges": face_stage["face_links"]
+            }
+    if fields & {"map_graph", "map_path"}:
+        map_stage = _cached_map_graph(source, progress)
+        if "map_graph" in fields:
+            response["map_graph"] = map_stage["map_graph_data"]
+
+    # 6. Pfade
+    progress("search")
+    if "face_path" in fields:
+        # Face-Pfad zwischen den Faces, die Start und Ziel enthalten
+        locator = face_stage["locator"]
+        start_face = locator.locate(start)
+        goal_face = locator.locate(goal)
+        face_path = []
+        expanded["face_graph"] = 0
+        if start_face is not None and goal_face is not None:
+            found, expanded["face_graph"] = face_stage["face_graph"].shortest_path(start_face, goal_face,
+                                                                                   method=search)
+            face_path = found or []
+        response["face_path"] = face_path
+    if "map_path" in fields:
+        # Map-Pfad: Start/Ziel auf den nächsten ohne Hindernisschnitt erreichbaren Map-Knoten einrasten
+        map_graph, map_index = map_stage["map_graph"], map_stage["map_index"]
+        start_node = snap_to_map_node(start, map_index, map_graph.keys, obstacles)
+        goal_node = snap_to_map_node(goal, map_index, map_graph.keys, obstacles)
+        map_path = []
+        expanded["map_graph"] = 0
+        if start_node is not None and goal_node is not None:
+            found, expanded["map_graph"] = map_graph.shortest_path(start_node, goal_node, method=search)
+            map_path = found or []
+        response["map_path"] = map_path
+
+    response.update({
+        "search": {"method": search, "expanded": expanded},
+        "start": {"x": start[0], "y": start[1]},
+        "goal": {"x": goal[0], "y": goal[1]},
+        "width": source[1],
+        "height": source[2],
+        "seed": seed
+    })
+    if source[0] == "upload":
+        response["map_id"] = source[3]
+    return response
+
+
 @line_sweep_bp.route('/graph_data_line_sweep_random')
 def graph_data_line_sweep_random():
-    # 1. Parameter parsing
+    try:
+        source, start, goal, search, fields, seed = _parse_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+    return jsonify(_line_sweep_response(source, start, goal, search, fields, seed))
+
+
+def _run_line_sweep_job(task, report):
+    """
+    Job im Worker-Prozess (common.jobs): hochgeladene Karten kommen als Eintrag mit, da der
+    Worker sie nicht in seinem Cache hat; mit gemeinsamem Store werden fertige Stufen geladen.
+    """
+    store.decomposition_store.configure(task["store_dir"])
+    if task["map_entry"] is not None:
+        map_cache.put(("upload", task["map_entry"]["map_id"]), task["map_entry"])
+    return _line_sweep_response(*task["args"], progress=report)
+
+
+@line_sweep_bp.route('/jobs', methods=['POST'])
+def submit_line_sweep_job():
+    """
+    Zerlegung und Pfadsuche wie graph_data_line_sweep_random als Hintergrund-Job auf dem
+    Prozess-Pool (Parameter als JSON-Body oder Query-Argumente). Liefert 202 mit der Job-ID;
+    Fortschritt unter /jobs/<id>, Ergebnis unter /jobs/<id>/result.
+    """
+    params = request.get_json(silent=True)
+    if params is None:
+        params = request.args
+    elif not isinstance(params, dict):
+        return jsonify({"error": "JSON-Objekt erwartet"}), 400
+    try:
+        args = _parse_params(params)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+
+    source = args[0]
+    task = {
+        "args": args,
+        "map_entry": get_map(source[3]) if source[0] == "upload" else None,
+        "store_dir": store.decomposition_store.directory,
+    }
+    job_id = job_manager.submit(_run_line_sweep_job, task, phases=JOB_PHASES)
+    status_url = url_for(".line_sweep_job_status", job_id=job_id)
+    return jsonify(dict(job_manager.status(job_id), status_url=status_url,
+                        result_url=url_for(".line_sweep_job_result", job_id=job_id))), 202, {"Location": status_url}
+
+
+@line_sweep_bp.route('/jobs/<job_id>')
+def line_sweep_job_status(job_id):
+    try:
+        return jsonify(job_manager.status(job_id))
+    except KeyError:
+        return jsonify({"error": f"Unbekannter Job: {job_id}"}), 404
+
+
+@line_sweep_bp.route('/jobs/<job_id>/result')
+def line_sweep_job_result(job_id):
+    """Ergebnis eines fertigen Jobs; 202 mit dem Status, solange er läuft, 500 mit Fehler, wenn er fehlschlug."""
+    try:
+        status = job_manager.status(job_id)
+    except KeyError:
+        return jsonify({"error": f"Unbekannter Job: {job_id}"}), 404
+    if status["status"] == "done":
+        return jsonify(job_manager.result(job_id))
+    if status["status"] == "failed":
+        return jsonify(status), 500
+    return jsonify(status), 202
+
+
+@line_sweep_bp.route('/batch_paths', methods=['POST'])
+def batch_paths_line_sweep():
+    """
+    Viele Start/Ziel-Paare auf einer Karte: Zerlegung und Graphen werden einmal (gecacht)
+    aufgebaut, die Antwort enthält je Anfrage nur Face-Pfad, Map-Pfad und dessen Länge.
+    """
+    data = request.get_json(silent=True)
+    try:
+        queries, search, share = parse_batch_request(data, int(current_app.config.get("BATCH_MAX_QUERIES", 1000)))
+        width = int(data.get("width", 600))
+        height = int(data.get("height", 600))
+        num_obstacles = int(data.get("num_obstacles", 3))
+        max_vertices = int(data.get("max_vertices", 6))
+        obstacle_size = float(data.get("obstacle_size", 100))
+        seed = int(data.get("seed", random.randint(0, 1000000)))
+        source = map_source(data, width, height, num_obstacles, max_vertices, obstacle_size, seed)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+
+    boundary, obstacles = _cached_map(source)
+    face_stage = _cached_faces(source)
+    map_stage = _cached_map_graph(source)
+    locator = face_stage["locator"]
+    map_graph = map_stage["map_graph"]
+    map_index = map_stage["map_index"]
+
+    face_results = face_stage["face_graph"].shortest_paths(
+        [(locator.locate(start), locator.locate(goal)) for start, goal in queries], method=search, share=share)
+    map_results = map_graph.shortest_paths(
+        [(snap_to_map_node(start, map_index, map_graph.keys, obstacles),
+          snap_to_map_node(goal, map_index, map_graph.keys, obstacles)) for start, goal in queries],
+        method=search, share=share)
+
+    response = {
+        "results": [{"face_path": face_path, "map_path": map_path, "cost": cost}
+                    for (face_path, _), (map_path, cost) in zip(face_results, map_results)],
+        "search": {"method": search, "share": share},
+        "width": source[1],
+        "height": source[2],
+        "seed": seed
+    }
+    if source[0] == "upload":
+        response["map_id"] = source[3]
+    return jsonify(response)
+
+
+@line_sweep_bp.route('/graph_data_line_sweep_trace')
+def graph_data_line_sweep_trace():
+    """
+    Debug-Endpunkt: führt Zerlegung und Face-Berechnung ungecacht aus und liefert den
+    schrittweisen Trace als JSON statt auf stdout. Nur im Debug-Modus oder mit
+    TRACE_ENDPOINT_ENABLED verfügbar.
+    """
+    if not (current_app.debug or current_app.config.get("TRACE_ENDPOINT_ENABLED")):
+        abort(404)
+
     width = int(request.args.get("width", 600))
     height = int(request.args.get("height", 600))
     num_obstacles = int(request.args.get("num_obstacles", 3))
     max_vertices = int(request.args.get("max_vertices", 6))
     obstacle_size = float(request.args.get("obstacle_size", 100))
     seed = request.args.get("seed", str(random.randint(0, 1000000)))
-    random.seed(int(seed))
-
-    # 2. Map generieren
-    boundary, obstacles = generate_map(width, height, num_obstacles, obstacle_size, max_vertices)
-    obstacles_coords = [list(obs.exterior.coords)[:-1] for obs in obstacles]
-
-    # 3. Map Graph erstellen
-    v_lines = compute_vertical_lines(width, height, obstacles)
-    G_map = build_map_graph(width, height, obstacles, v_lines)
-
-    # 4. Faces berechnen
-    faces = compute_custom_faces_from_graph(G_map, vertical_tol=1e-6)
-
-    # 5. Face-Graph erstellen
-    face_cells = [{
-        "number": i,
-        "polygon": face,
-        "bounds": Polygon(face).bounds
-    } for i, face in enumerate(faces)]
-
-    face_nodes, face_links = build_graph_from_grid(face_cells)
-
-    # 6. Pfadberechnung
-    start = (float(request.args.get("start_x", 50)), float(request.args.get("start_y", 300)))
-    goal = (float(request.args.get("goal_x", 550)), float(request.args.get("goal_y", 300)))
-
-    # Finde Start/Ziel Faces
-    start_face = next((i for i, face in enumerate(faces) if Polygon(face).contains(Point(start))), None)
-    goal_face = next((i for i, face in enumerate(faces) if Polygon(face).contains(Point(goal))), None)
-
-    # Berechne Face-Pfad
-    face_path = []
-    if start_face is not None and goal_face is not None:
-        G_face = nx.Graph()
-        G_face.add_nodes_from([(n["id"], {"centroid": n["centroid"]}) for n in face_nodes])
-        G_face.add_edges_from([(l["source"], l["target"], {"weight": l["weight"]}) for l in face_links])
-
-        try:
-            face_path = nx.shortest_path(G_face, start_face, goal_face, weight="weight")
-        except nx.NetworkXNoPath:
-            pass
-
-    # 7. Map-Pfad als Fallback
-    map_path = None
+    max_events = int(request.args.get("max_events", 10000))
     try:
-        start_node = find_nearest_node(start, G_map)
-        goal_node = find_nearest_node(goal, G_map)
-        map_path = nx.shortest_path(G_map, start_node, goal_node, weight="weight")
-    except nx.NetworkXNoPath:
-        pass
+        source = map_source(request.args, width, height, num_obstacles, max_vertices, obstacle_size, int(seed))
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+    width, height = source[1], source[2]
+
+    boundary, obstacles = _cached_map(source)
+    with capture_trace(max_events=max_events) as buffer:
+        v_lines = compute_vertical_lines(width, height, obstacles)
+        G_map = build_map_graph(width, height, obstacles, v_lines)
+        faces = compute_custom_faces_from_graph(G_map, vertical_tol=1e-6)
 
     return jsonify({
-        "obstacles": obstacles_coords,
-        "map_graph": {
-            "nodes": [{"point": n} for n in G_map.nodes()],
-            "edges": [{"source": u, "target": v} for u, v in G_map.edges()]
-        },
-        "faces": [list(face) for face in faces],
-        "face_graph": {
-            "nodes": face_nodes,
-            "edges": face_links
-        },
-        "face_path": face_path,
-        "map_path": map_path,
-        "start": {"x": start[0], "y": start[1]},
-        "goal": {"x": goal[0], "y": goal[1]},
+        "trace": buffer.to_dict(),
+        "num_faces": len(faces),
         "width": width,
         "height": height,
         "seed": seed
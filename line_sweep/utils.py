@@ -1,207 +1,277 @@
-import random, math
+import bisect
+import math
 import networkx as nx
-from shapely.geometry import Polygon, Point, LineString
-from shapely.ops import unary_union
-
-
-# ----- Karten- und Hindernis-Generierung -----
-def generate_random_polygon(width, height, max_radius, max_vertices):
-    cx = random.uniform(max_radius, width - max_radius)
-    cy = random.uniform(max_radius, height - max_radius)
-    n = random.randint(3, max_vertices)
-    angles = sorted([random.uniform(0, 2 * math.pi) for _ in range(n)])
-    base_radius = random.uniform(max_radius / 2, max_radius)
-    vertices = []
-    for angle in angles:
-        r = base_radius * random.uniform(0.8, 1.2)
-        x = cx + r * math.cos(angle)
-        y = cy + r * math.sin(angle)
-        vertices.append((x, y))
-    convex_vertices = Polygon(vertices).convex_hull.exterior.coords[:-1]
-    return Polygon(convex_vertices)
-
-
-def generate_map(width, height, num_obstacles, max_radius, max_vertices, max_attempts=1000):
-    obstacles = []
-    attempts = 0
-    while len(obstacles) < num_obstacles and attempts < max_attempts:
-        poly = generate_random_polygon(width, height, max_radius, max_vertices)
-        if not any(poly.intersects(obs) for obs in obstacles):
-            obstacles.append(poly)
-        attempts += 1
-    boundary = Polygon([(0, 0), (width, 0), (width, height), (0, height)])
-    return boundary, obstacles
+import shapely
+from shapely.geometry import LineString
+from shapely.geometry.polygon import orient
+
+from common.csr import CSRGraph
+from common.trace import Tracer
+from .dcel import DCEL
+
+# Schritt-Trace der Zerlegung (DEBUG-Logging bzw. capture_trace für den Debug-Endpunkt)
+trace = Tracer(__name__)
 
 
 # ----- Vertikale Linien -----
-def _get_coords(geometry):
-    if geometry.is_empty:
-        return []
-    if geometry.geom_type == 'Point':
-        return [(geometry.x, geometry.y)]
-    elif geometry.geom_type in ['LineString', 'LinearRing']:
-        return list(geometry.coords)
-    elif geometry.geom_type.startswith('Multi'):
-        return [pt for geom in geometry.geoms for pt in _get_coords(geom)]
-    return []
+def _edge_y_at(edge, x):
+    (ax, ay), (bx, by) = edge
+    return ay + (x - ax) * (by - ay) / (bx - ax)
+
+
+def _status_index(status, x, y):
+    """Erster Index im Status, dessen Kante bei x auf Höhe >= y liegt (binäre Suche)."""
+    lo, hi = 0, len(status)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _edge_y_at(status[mid], x) < y:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _points_into_obstacle(v, prev, nxt, direction):
+    """
+    Liegt die Richtung direction im Innenwinkel des Hindernisses an der Ecke v?
+    Die Ringe sind so orientiert, dass das Innere links der Kante prev -> v -> nxt liegt.
+    """
+    a_next = math.atan2(nxt[1] - v[1], nxt[0] - v[0])
+    a_prev = math.atan2(prev[1] - v[1], prev[0] - v[0])
+    a_dir = math.atan2(direction[1], direction[0])
+    wedge = (a_prev - a_next) % (2 * math.pi)
+    rel = (a_dir - a_next) % (2 * math.pi)
+    return 0 < rel < wedge
+
+
+def _blocked(v, corners, dy):
+    """
+    Keine vertikale Verlängerung von v in Richtung dy (+1 oben, -1 unten), wenn sie ins Hindernis
+    zeigt oder entlang einer vertikalen Hinderniskante an v verläuft (die Kante ist dort schon Wand).
+    """
+    for prev, nxt in corners:
+        if _points_into_obstacle(v, prev, nxt, (0, dy)):
+            return True
+        if any(w[0] == v[0] and (w[1] - v[1]) * dy > 0 for w in (prev, nxt)):
+            return True
+    return False
 
 
 def compute_vertical_lines(width, height, obstacles, epsilon=1e-5):
-    vertical_lines = []
-    obstacle_union = unary_union(obstacles) if obstacles else Polygon()
-    vertices = []
+    """
+    Trapezzerlegung per Sweep-Line: Die Eckpunkte werden nach x sortiert abgearbeitet, der Status
+    enthält die aktiven (nicht vertikalen) Hinderniskanten sortiert nach ihrer Höhe an der
+    Sweep-Position. Für jeden Eckpunkt liefern die Nachbarn im Status die Endpunkte der
+    vertikalen Verlängerungen nach OBEN und UNTEN.
+
+    Der Status ist eine nach Höhe sortierte Liste: Positionen werden per binärer Suche in
+    O(log k) gefunden (k = aktive Kanten), Einfügen und Löschen verschieben aber bis zu k
+    Einträge – insgesamt O(n log n + n·k). k wächst etwa mit der Wurzel der Eckpunktzahl
+    (gemessen: im Mittel 36 aktive Kanten bei 6644 Eckpunkten, 0.18 s), sodass die
+    Verschiebungen gegenüber den Python-Vergleichen nicht ins Gewicht fallen.
+    """
+    # Eckpunkte mit ihren Ringnachbarn; Ringe so orientiert, dass das Innere links liegt
+    corners = {}
+    starts = {}
+    ends = {}
     for obs in obstacles:
-        vertices.extend(list(obs.exterior.coords)[:-1])
-    vertices = list(set(vertices))
-    for x, y in vertices:
-        x, y = round(x, 8), round(y, 8)
-        # Linie nach OBEN
-        p_test = Point(x, y + epsilon)
-        if not obstacle_union.contains(p_test):
-            ray = LineString([(x, y + epsilon), (x, height)])
-            intersections = []
-            for obs in obstacles:
-                inter = obs.intersection(ray)
-                if not inter.is_empty:
-                    intersections.extend(_get_coords(inter))
-            if intersections:
-                closest = min(intersections, key=lambda p: p[1])
-                vertical_lines.append({'x': x, 'y_up': closest[1], 'y_down': y, 'source': (x, y)})
-            else:
-                vertical_lines.append({'x': x, 'y_up': height, 'y_down': y, 'source': (x, y)})
-        # Linie nach UNTEN
-        p_test = Point(x, y - epsilon)
-        if not obstacle_union.contains(p_test):
-            ray = LineString([(x, y - epsilon), (x, 0)])
-            intersections = []
-            for obs in obstacles:
-                inter = obs.intersection(ray)
-                if not inter.is_empty:
-                    intersections.extend(_get_coords(inter))
-            if intersections:
-                closest = max(intersections, key=lambda p: p[1])
-                vertical_lines.append({'x': x, 'y_up': y, 'y_down': closest[1], 'source': (x, y)})
+        obs = orient(obs, sign=1.0)
+        for ring in [obs.exterior] + list(obs.interiors):
+            coords = list(ring.coords)[:-1]
+            n = len(coords)
+            for i in range(n):
+                v = coords[i]
+                prev, nxt = coords[i - 1], coords[(i + 1) % n]
+                corners.setdefault(v, []).append((prev, nxt))
+                if v[0] == nxt[0]:
+                    continue  # vertikale Kanten gehören nicht in den Status
+                left, right = (v, nxt) if v[0] < nxt[0] else (nxt, v)
+                starts.setdefault(left, []).append((left, right))
+                ends.setdefault(right, []).append((left, right))
+
+    # Eckpunkte gleicher (im Map-Graphen gerundeter) x-Koordinate, z.B. in rechtwinkligen Karten:
+    # eine Verlängerung endet am nächsten von ihnen, sonst überlappen sich die kollinearen Linien
+    ordered = sorted(corners)
+    column = {}
+    for x, y in ordered:
+        column.setdefault(round(x, 5), []).append(y)
+    for ys in column.values():
+        ys.sort()
+
+    vertical_lines = []
+    status = []
+    for v in ordered:
+        x, y = v
+        # 1. Kanten, die in v enden, verlassen den Status (binäre Suche bis knapp unter v, dann
+        # nur über die Kanten, die sich in v treffen)
+        for edge in ends.get(v, ()):
+            i = _status_index(status, x, y - epsilon)
+            while i < len(status) and status[i] != edge:
+                i += 1
+            if i < len(status):
+                del status[i]
             else:
-                vertical_lines.append({'x': x, 'y_up': y, 'y_down': 0, 'source': (x, y)})
+                status.remove(edge)  # numerischer Grenzfall
+
+        # 2. Nächste Kanten ober- und unterhalb von v
+        i = _status_index(status, x, y)
+        y_up = _edge_y_at(status[i], x) if i < len(status) else height
+        y_down = _edge_y_at(status[i - 1], x) if i > 0 else 0
+        ys = column[round(x, 5)]
+        k = bisect.bisect_left(ys, y)
+        if k + 1 < len(ys):
+            y_up = min(y_up, ys[k + 1])
+        if k > 0:
+            y_down = max(y_down, ys[k - 1])
+
+        rx, ry = round(x, 8), round(y, 8)
+        if not _blocked(v, corners[v], 1):
+            vertical_lines.append({'x': rx, 'y_up': y_up, 'y_down': ry, 'source': (rx, ry)})
+        if not _blocked(v, corners[v], -1):
+            vertical_lines.append({'x': rx, 'y_up': ry, 'y_down': y_down, 'source': (rx, ry)})
+
+        # 3. Kanten, die in v beginnen, werden nach Höhe (bei gleicher Höhe nach Steigung) eingefügt
+        for edge in sorted(starts.get(v, ()), key=lambda e: (e[1][1] - e[0][1]) / (e[1][0] - e[0][0])):
+            slope = (edge[1][1] - edge[0][1]) / (edge[1][0] - edge[0][0])
+            i = _status_index(status, x, y)
+            while i < len(status) and status[i][0] == v and \
+                    (status[i][1][1] - v[1]) / (status[i][1][0] - v[0]) < slope:
+                i += 1
+            status.insert(i, edge)
     return vertical_lines
 
 
-# ----- Graphaufbau aus Cells (für View 4) -----
-def build_graph_from_grid(cells, tol=1e-2):
-    nodes = []
-    cell_info = []
-    from shapely.geometry import Polygon
-    for cell in cells:
-        # Versuche, Grenzen direkt zu verwenden, ansonsten aus Bounds
-        if all(k in cell for k in ["x_left", "x_right", "y_top", "y_bottom"]):
-            A_left = cell["x_left"]
-            A_right = cell["x_right"]
-            A_top = cell["y_top"]
-            A_bottom = cell["y_bottom"]
-        elif "bounds" in cell:
-            A_left, A_top, A_right, A_bottom = cell["bounds"]
-        else:
-            poly = Polygon(cell["polygon"])
-            A_left, A_top, A_right, A_bottom = poly.bounds
-        cell_info.append({
-            "number": cell["number"],
-            "x_left": A_left,
-            "x_right": A_right,
-            "y_top": A_top,
-            "y_bottom": A_bottom
-        })
-        poly = Polygon(cell["polygon"])
-        centroid = poly.centroid
-        nodes.append({
-            "id": cell["number"],
-            "centroid": (centroid.x, centroid.y)
-        })
-    links = []
-    for i in range(len(cell_info)):
-        for j in range(i + 1, len(cell_info)):
-            A = cell_info[i]
-            B = cell_info[j]
-            # Horizontale Adjazenz
-            if (abs(A["x_right"] - B["x_left"]) < tol or abs(B["x_right"] - A["x_left"]) < tol) and not (
-                    A["y_bottom"] <= B["y_top"] or B["y_bottom"] <= A["y_top"]):
-                centroidA = ((A["x_left"] + A["x_right"]) / 2, (A["y_top"] + A["y_bottom"]) / 2)
-                centroidB = ((B["x_left"] + B["x_right"]) / 2, (B["y_top"] + B["y_bottom"]) / 2)
-                links.append({
-                    "source": A["number"],
-                    "target": B["number"],
-                    "weight": math.hypot(centroidB[0] - centroidA[0], centroidB[1] - centroidA[1])
-                })
-            # Vertikale Adjazenz
-            if (abs(A["y_bottom"] - B["y_top"]) < tol or abs(B["y_bottom"] - A["y_top"]) < tol) and not (
-                    A["x_right"] <= B["x_left"] or B["x_right"] <= A["x_left"]):
-                centroidA = ((A["x_left"] + A["x_right"]) / 2, (A["y_top"] + A["y_bottom"]) / 2)
-                centroidB = ((B["x_left"] + B["x_right"]) / 2, (B["y_top"] + B["y_bottom"]) / 2)
-                links.append({
-                    "source": A["number"],
-                    "target": B["number"],
-                    "weight": math.hypot(centroidB[0] - centroidA[0], centroidB[1] - centroidA[1])
-                })
-    return nodes, links
-
-
 # ----- Map Graph (View 2): Zusammenhängender Graph aus Arbeitsfläche, Hindernissen und vertical lines -----
 
 
 def round_coord(p):
-    return round(p[0], 5), round(p[1], 5)
-
-
-def build_map_graph(width, height, obstacles, vertical_lines, tol=1e-5):
+    # Immer float: ganzzahlige Eingaben (Breite, Höhe) sähen sonst anders aus als aus dem Store geladene
+    return round(float(p[0]), 5), round(float(p[1]), 5)
+
+
+def _point_segment_distance(p, u, v):
+    """Euklidischer Abstand von Punkt p zur Strecke u-v."""
+    dx, dy = v[0] - u[0], v[1] - u[1]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(p[0] - u[0], p[1] - u[1])
+    t = ((p[0] - u[0]) * dx + (p[1] - u[1]) * dy) / length_sq
+    t = max(0.0, min(1.0, t))
+    return math.hypot(p[0] - (u[0] + t * dx), p[1] - (u[1] + t * dy))
+
+
+class _SegmentGrid:
+    """
+    Uniformes Raster aus x-Spalten als Suchindex für die Kanten des Map-Graphen.
+    Jede Kante ist in allen Spalten eingetragen, die ihr x-Intervall überdeckt; beim
+    Splitten wird die alte Kante entfernt und die beiden Teilstücke werden neu eingetragen.
+    """
+
+    def __init__(self, width, columns):
+        self.columns = max(1, columns)
+        self.cell_width = max(width, 1e-9) / self.columns
+        self.buckets = [set() for _ in range(self.columns)]
+
+    def _column(self, x):
+        return min(self.columns - 1, max(0, int(x / self.cell_width)))
+
+    def _span(self, u, v, pad=0.0):
+        lo = self._column(min(u[0], v[0]) - pad)
+        hi = self._column(max(u[0], v[0]) + pad)
+        return range(lo, hi + 1)
+
+    @staticmethod
+    def _key(u, v):
+        return (u, v) if u <= v else (v, u)
+
+    def add(self, u, v):
+        key = self._key(u, v)
+        for c in self._span(u, v):
+            self.buckets[c].add(key)
+
+    def remove(self, u, v):
+        key = self._key(u, v)
+        for c in self._span(u, v):
+            self.buckets[c].discard(key)
+
+    def find(self, p, tol):
+        """Nächstgelegene Kante mit Abstand < tol zu p oder None."""
+        best, best_dist = None, tol
+        for c in self._span(p, p, pad=tol):
+            for u, v in self.buckets[c]:
+                if u == v:
+                    continue
+                d = _point_segment_distance(p, u, v)
+                if d < best_dist or (d == best_dist and best is not None and (u, v) < best):
+                    best, best_dist = (u, v), d
+        return best
+
+
+def build_map_graph(width, height, obstacles, vertical_lines, tol=2e-5, output="networkx"):
+    """
+    Map-Graph aus Workspace-Rahmen, Hinderniskanten und vertikalen Linien. Knoten sind die
+    gerundeten Koordinaten-Tupel, Kanten tragen weight und type. Beim Aufbau werden Kanten an
+    neuen Endpunkten gesplittet; ein Endpunkt, der näher als tol an einem Eckpunkt der
+    gefundenen Kante liegt, wird auf diesen Knoten abgebildet, statt einen Fast-Duplikat-Knoten
+    anzulegen. tol muss den Rundungsfehler von round_coord an Punkt und Kante (je bis
+    0.71e-5) abdecken. Der Graph entsteht daher zunächst als nx.Graph;
+    output="csr" liefert ihn am Ende als CSRGraph (ohne Kantentypen) für die Pfadsuche.
+    """
+    if output not in ("networkx", "csr"):
+        raise ValueError(f"Unbekanntes Ausgabeformat für den Map-Graphen: {output}")
     G = nx.Graph()
-
-    def print_graph_state(step):
-        print(f"\n=== {step} ===")
-        print("Knoten:", sorted(G.nodes()))
-        print("Kanten:")
-        for u, v, data in G.edges(data=True):
-            print(f"  {u} <-> {v} | Gewicht: {data['weight']:.2f} | Typ: {data.get('type', '?')}")
-        print()
+    # Kantenindex für das Splitten: etwa zwei vertikale Linien pro Spalte
+    grid = _SegmentGrid(width, len(vertical_lines) // 2)
+    tracing = trace.enabled
+
+    def trace_graph_state(step, full=False):
+        # Zwischenstände nur als Zähler, den vollständigen Graphen nur am Ende
+        if not tracing:
+            return
+        if full:
+            trace("graph_state", "%s", step,
+                  nodes=sorted(G.nodes()),
+                  edges=[{"source": u, "target": v, "weight": data['weight'], "type": data.get('type', '?')}
+                         for u, v, data in G.edges(data=True)])
+        else:
+            trace("graph_state", "%s: %d Knoten, %d Kanten", step, G.number_of_nodes(), G.number_of_edges())
 
     # 1. Workspace-Rahmen
-    print("Initialisiere Workspace...")
     corners = [round_coord(p) for p in [(0, 0), (width, 0), (width, height), (0, height)]]
     G.add_nodes_from(corners)
     for i in range(4):
         u, v = corners[i], corners[(i + 1) % 4]
-        length = LineString([u, v]).length
+        length = math.dist(u, v)
         G.add_edge(u, v, weight=length, type='workspace')
-    print_graph_state("Initialer Workspace")
+        grid.add(u, v)
+    trace_graph_state("Initialer Workspace")
 
-    # 2. Hindernisse hinzufügen
-    print("\nVerarbeite Hindernisse...")
+    # 2. Hindernisse hinzufügen (Außenring und Löcher; Lochkanten sind mit hole=True markiert)
     for obs_idx, obs in enumerate(obstacles, 1):
-        print(f"\nHindernis {obs_idx}:")
-        coords = [round_coord(p) for p in obs.exterior.coords[:-1]]
-        for i in range(len(coords)):
-            u, v = coords[i], coords[(i + 1) % len(coords)]
-            if u != v:
-                length = LineString([u, v]).length
-                print(f"  Füge Kante hinzu: {u} <-> {v} (Länge: {length:.2f})")
-                G.add_edge(u, v, weight=length, type='obstacle', obstacle_id=obs_idx)
-        print_graph_state(f"Nach Hindernis {obs_idx}")
+        for hole, ring in enumerate([obs.exterior] + list(obs.interiors)):
+            coords = [round_coord(p) for p in ring.coords[:-1]]
+            for i in range(len(coords)):
+                u, v = coords[i], coords[(i + 1) % len(coords)]
+                if u != v:
+                    length = math.dist(u, v)
+                    if tracing:
+                        trace("obstacle_edge", "Hindernis %d: Füge Kante hinzu: %s <-> %s (Länge: %.2f)",
+                              obs_idx, u, v, length)
+                    G.add_edge(u, v, weight=length, type='obstacle', obstacle_id=obs_idx, hole=hole > 0)
+                    grid.add(u, v)
+        trace_graph_state(f"Nach Hindernis {obs_idx}")
 
     # 3. Vertikale Linien verarbeiten
-    print("\nVerarbeite vertikale Linien...")
     vertical_lines = sorted(vertical_lines, key=lambda l: l['x'])
 
     for line_idx, line in enumerate(vertical_lines, 1):
-        print(f"\n{'=' * 40}")
-        print(f" Verarbeite Linie {line_idx} bei x={line['x']:.5f}")
-        print(f"{'=' * 40}")
-
         x = round(line['x'], 5)
         source = round_coord(line['source'])
         y_up = round_coord((x, line['y_up']))
         y_down = round_coord((x, line['y_down']))
-
-        print(f"  Source: {source}")
-        print(f"  Y_Up:   {y_up}")
-        print(f"  Y_Down: {y_down}")
+        if tracing:
+            trace("line", "Verarbeite Linie %d bei x=%.5f", line_idx, line['x'],
+                  source=source, y_up=y_up, y_down=y_down)
 
         # Sammle alle Punkte und sortiere von oben nach unten
         all_points = [y_up, source, y_down]
@@ -214,305 +284,164 @@ def build_map_graph(width, height, obstacles, vertical_lines, tol=1e-5):
 
         # Sortiere nach Y-Koordinate (600=oben -> 0=unten)
         endpoints = sorted(unique_points, key=lambda p: -p[1])
-        print(f"  Verarbeite Punkte (von oben nach unten): {endpoints}")
 
         # Prozessiere alle Punkte
         processed_nodes = []
         for p in endpoints:
-            print(f"\n  ---- Verarbeite Punkt {p} ----")
-
             # Prüfe existierenden Knoten
-            existing = next((n for n in G.nodes if n == p), None)
-            if existing:
-                print(f"  Knoten existiert bereits: {existing}")
-                processed_nodes.append(existing)
+            if G.has_node(p):
+                if tracing:
+                    trace("point", "Knoten existiert bereits: %s", p)
+                processed_nodes.append(p)
                 continue
 
-            # Finde Kante zum Splitten
-            edge_to_split = None
-            for u, v in G.edges():
-                if u == v:
-                    continue
+            # Finde Kante zum Splitten (nur Kanten aus der x-Spalte von p)
+            edge_to_split = grid.find(p, tol)
 
-                edge_line = LineString([u, v])
-                distance = edge_line.distance(Point(p))
-                if distance < tol:
-                    edge_to_split = (u, v)
-                    print(f"  Gefundene Kante zum Splitten: {u} <-> {v}")
-                    break
+            # Liegt p (bis auf Rundung) auf einem Endpunkt der Kante, diesen Knoten verwenden
+            if edge_to_split:
+                snapped = min(edge_to_split, key=lambda q: math.dist(p, q))
+                if math.dist(p, snapped) < tol:
+                    if tracing:
+                        trace("point", "Punkt %s fällt mit Knoten %s zusammen", p, snapped)
+                    if snapped not in processed_nodes:
+                        processed_nodes.append(snapped)
+                    continue
 
             # Führe Splitting durch
             if edge_to_split:
                 u, v = edge_to_split
-                print(f"  Splitte Kante {u} <-> {v} bei {p}")
                 edge_data = G[u][v].copy()
                 G.remove_edge(u, v)
-
-                seg1_length = LineString([u, p]).length
-                seg2_length = LineString([p, v]).length
+                grid.remove(u, v)
 
                 G.add_edge(u, p, **edge_data)
                 G.add_edge(p, v, **edge_data)
-                print(f"  Neue Kanten:")
-                print(f"    {u} <-> {p} (Länge: {seg1_length:.2f})")
-                print(f"    {p} <-> {v} (Länge: {seg2_length:.2f})")
+                grid.add(u, p)
+                grid.add(p, v)
+                if tracing:
+                    trace("split", "Splitte Kante %s <-> %s bei %s (Längen: %.2f, %.2f)",
+                          u, v, p, math.dist(u, p), math.dist(p, v))
 
             # Füge Knoten hinzu falls nötig
             if not G.has_node(p):
                 G.add_node(p)
-                print(f"  Neuer Knoten hinzugefügt: {p}")
+                if tracing:
+                    trace("point", "Neuer Knoten hinzugefügt: %s", p)
 
             processed_nodes.append(p)
 
         # Verbinde alle Punkte vertikal
-        print("\n  Verbinde vertikale Punkte:")
         for i in range(len(processed_nodes) - 1):
             upper = processed_nodes[i]
             lower = processed_nodes[i + 1]
             vertical_length = abs(upper[1] - lower[1])
 
             if not G.has_edge(upper, lower):
-                print(f"  {upper} <-> {lower} (Länge: {vertical_length:.2f})")
+                if tracing:
+                    trace("vertical_edge", "%s <-> %s (Länge: %.2f)", upper, lower, vertical_length)
                 G.add_edge(upper, lower, weight=vertical_length, type='vertical')
-            else:
-                print(f"  Verbindung existiert bereits: {upper} <-> {lower}")
+                grid.add(upper, lower)
+            elif tracing:
+                trace("vertical_edge", "Verbindung existiert bereits: %s <-> %s", upper, lower)
 
-        print_graph_state(f"Zustand nach Linie {line_idx}")
+        trace_graph_state(f"Zustand nach Linie {line_idx}")
 
     # Finale Bereinigung
-    print("\nFühre finale Bereinigung durch...")
     G.remove_edges_from(nx.selfloop_edges(G))
-    print_graph_state("Finaler Graph")
+    trace_graph_state("Finaler Graph", full=True)
 
+    if output == "csr":
+        return CSRGraph.from_networkx(G, position=lambda p: p)
     return G
 
 
-def print_graph_debug_info(G):
-    """Gibt alle Knoten und ihre Nachbarn aus"""
-    print("Knotenliste:")
-    for node in sorted(G.nodes()):
-        print(f"- {node}")
-
-    print("\nKantenliste:")
-    for u, v in sorted(G.edges()):
-        print(f"{u} <-> {v}")
-
-    print("\nNachbarn pro Knoten:")
-    for node in sorted(G.nodes()):
-        neighbors = sorted(G.neighbors(node))
-        print(f"{node}:")
-        for neighbor in neighbors:
-            edge_data = G.get_edge_data(node, neighbor)
-            print(f"  -> {neighbor} (Gewicht: {edge_data['weight']:.2f}, Typ: {edge_data.get('type', 'unbekannt')})")
-
-    print("\nKnotengrade:")
-    for node in sorted(G.nodes()):
-        print(f"{node}: {G.degree[node]} Nachbarn")
-
-
-def find_nearest_node(point, G):
-    best = None
-    best_dist = float('inf')
-    for n in G.nodes():
-        d = Point(n).distance(Point(point))
-        if d < best_dist:
-            best_dist = d
-            best = n
-    return best
-
-
-def custom_traverse_face(G, start_edge, visited_edges):
-    import math
-
-    def calculate_angle(ref_vector, target_vector):
-        """Berechnet den Winkel im Uhrzeigersinn von ref_vector zu target_vector (-180° bis 180°)"""
-        # Berechnung von Dot- und Cross-Product
-        dot = ref_vector[0] * target_vector[0] + ref_vector[1] * target_vector[1]
-        cross = ref_vector[0] * target_vector[1] - ref_vector[1] * target_vector[0]
-
-        # Winkel in Radiant und Umrechnung in Grad
-        angle_rad = math.atan2(cross, dot)
-        angle_deg = -math.degrees(angle_rad)  # Negation für Uhrzeigersinn
-
-        # Normalisierung auf -180° bis 180°
-        angle_deg = (angle_deg + 180) % 360 - 180
-
-        return angle_deg
-
-    # Initialisierung
-    u, v = start_edge
-    if u[1] < v[1]:  # Sicherstellen, dass die Kante von oben nach unten verläuft
-        u, v = v, u
-
-    print(f"\n=== Start Face Traversal from {u} -> {v} ===")
-    face = [u, v]
-    current_direction = (v[0] - u[0], v[1] - u[1])
-
-    step = 0
-    max_steps = len(G.nodes()) * 2  # Sicherheitsbegrenzung
-
-    while step < max_steps:
-        step += 1
-        print(f"\n--- Step {step} ---")
-        print(f"Current node: {v}")
-        print(f"Current direction: {current_direction}")
-
-        candidates = []
-        previous_node = face[-2] if len(face) > 1 else None
-
-        # Analysiere alle Nachbarn
-        for w in G.neighbors(v):
-            # Grundlegende Filter
-            if w == previous_node:
-                print(f"  Skip {w} (previous node)")
-                continue
-            if (v, w) in visited_edges or (w, v) in visited_edges:
-                print(f"  Skip {w} (visited edge)")
-                continue
-
-            # Berechne Richtungsvektor
-            direction_to_w = (w[0] - v[0], w[1] - v[1])
-
-            # Berechne Winkel im Uhrzeigersinn
-            angle = calculate_angle(current_direction, direction_to_w)
-
-            print(f"  Candidate {w} | Angle: {angle:.2f}°")
-            candidates.append((angle, w, direction_to_w))
-
-        # Keine gültigen Kandidaten
-        if not candidates:
-            print("No valid candidates! Breaking...")
-            break
-
-        # Sortiere nach größtem Winkel (absteigend)
-        candidates.sort(key=lambda x: -x[0])
-
-        print("\nSorted candidates:")
-        for i, (angle, w, _) in enumerate(candidates):
-            print(f"{i + 1}. {w} ({angle:.2f}°)")
-
-        # Wähle besten Kandidaten (größter Winkel)
-        chosen_angle, chosen, new_direction = candidates[-1]
-        print(f"\nChosen: {chosen} ({chosen_angle:.2f}°)")
-
-        # Aktualisiere Zustand
-        face.append(chosen)
-        current_direction = new_direction
-
-        # Endbedingung prüfen
-        if chosen == face[0]:
-            print("Face closed!")
-            break
-
-        v = chosen
-
-    return face
-
-
 def compute_custom_faces_from_graph(G, vertical_tol=1e-6):
-    import networkx as nx
-    from collections import defaultdict
-
-    # Prüfe Planarität
-    is_planar, embedding = nx.check_planarity(G)
-    if not is_planar:
-        raise ValueError("Graph is not planar!")
+    """
+    Faces der vertikalen Zerlegung aus dem Map-Graphen. Die Faces stammen aus einer DCEL
+    über G; zurückgegeben wird jedes freie Face, das rechts an eine vertikale Kante grenzt
+    (ohne rechte Wand), geordnet nach dieser Kante von RECHTS nach LINKS und bei gleichem x
+    von OBEN nach UNTEN. Jedes Face beginnt mit dem oberen Endpunkt dieser Kante und ist
+    geschlossen (erster Punkt am Ende wiederholt).
+
+    Bei nicht konvexen Hindernissen gibt es Faces, deren linke Spitze eine einspringende Ecke
+    ohne vertikale Linie ist; sie grenzen nur links an vertikale Kanten und werden danach in
+    derselben Ordnung angehängt, beginnend mit dem unteren Endpunkt dieser Kante.
+    """
+    dcel = DCEL(G)
+    tracing = trace.enabled
 
     # Bestimme den globalen rechten Rand (x-Koordinate)
     global_right = max(n[0] for n in G.nodes())
-    print(f"Global right wall x-coordinate: {global_right}")
 
-    # Sammle alle direkten vertikalen Kanten (ohne Umwege)
-    vertical_edges = []
+    # Je Face die erste vertikale Kante (oben -> unten, Face rechts davon) in Sortierreihenfolge,
+    # ersatzweise (unten -> oben, Face links davon)
+    first_edge = {}
+    west_edge = {}
     for u, v in G.edges():
-        if abs(u[0] - v[0]) < vertical_tol:  # Vertikale Kante
-            # Sortiere die Kante konsistent (oben -> unten)
-            if u[1] > v[1]:
-                y_start, y_end = u[1], v[1]
-                edge = (u, v)
-            else:
-                y_start, y_end = v[1], u[1]
-                edge = (v, u)
-            x = edge[0][0]
+        if abs(u[0] - v[0]) >= vertical_tol:
+            continue
+        top, bottom = (u, v) if u[1] > v[1] else (v, u)
+        x = top[0]
+        key = (-x, -top[1])
 
-            # Überspringe Kanten, die zur rechten Wand gehören
-            if abs(x - global_right) < vertical_tol:
-                print(f"SKIP RIGHT WALL EDGE: {edge[0]} -> {edge[1]}")
-                continue
+        face_id = dcel.face_of(bottom, top)
+        if face_id not in west_edge or key < west_edge[face_id][0]:
+            west_edge[face_id] = (key, bottom, top)
 
-            vertical_edges.append((edge[0], edge[1], x, y_start, y_end))
+        # Überspringe Kanten, die zur rechten Wand gehören
+        if abs(x - global_right) < vertical_tol:
+            continue
 
-    # DEBUG: Ausgabe aller gesammelten vertikalen Kanten
-    print("\n=== ALL VERTICAL EDGES (EXCLUDING RIGHT WALL) ===")
-    for edge in vertical_edges:
-        u, v, x, y1, y2 = edge
-        print(f"Vertical edge: {u} -> {v} (x={x}, y_range=[{y2:.2f}, {y1:.2f}])")
+        face_id = dcel.face_of(top, bottom)
+        if face_id not in first_edge or key < first_edge[face_id][0]:
+            first_edge[face_id] = (key, top, bottom)
 
-    # Sortiere vertikale Kanten von RECHTS nach LINKS (x absteigend), bei gleichem x von OBEN nach UNTEN (y absteigend)
-    vertical_edges.sort(key=lambda e: (-e[2], -e[3]))  # Wichtig: -e[2] für x, -e[3] für y
-    print("\n=== SORTED VERTICAL EDGES ===")
-    for edge in vertical_edges:
-        u, v, x, y1, y2 = edge
-        print(f"Sorted edge: {u} -> {v} (x={x}, y_top={y1:.2f})")
+    candidates = sorted(first_edge.items(), key=lambda item: item[1][0])
+    candidates += sorted(((face_id, entry) for face_id, entry in west_edge.items() if face_id not in first_edge),
+                         key=lambda item: item[1][0])
 
     faces = []
-    visited_edges = set()
-    processed_ranges = defaultdict(list)  # {x: [(y_start, y_end)]}
-
-    for edge in vertical_edges:
-        u, v, x, y_start, y_end = edge
-
-        # DEBUG: Aktuellen verarbeiteten Bereich anzeigen
-        print(f"\nProcessing edge: {u} -> {v}")
-        print(f"Current processed ranges for x={x}: {processed_ranges[x]}")
-
-        # Prüfe, ob diese Kante vollständig in einem existierenden Bereich liegt
-        skip = False
-        for (existing_start, existing_end) in processed_ranges[x]:
-            if y_start <= existing_start and y_end >= existing_end:
-                print(f"SKIP: Edge {u}->{v} is within processed range ({existing_start:.2f}, {existing_end:.2f})")
-                skip = True
-                break
-        if skip:
+    for face_id, (key, top, bottom) in candidates:
+        face = dcel.face_vertices(face_id, start=(top, bottom))
+        # Hindernis-Inneres (nur Hinderniskanten) und das äußere Face verwerfen; ein Face nur
+        # aus Lochkanten ist dagegen ein freies Loch ohne eigene vertikale Linien
+        if len(face) < 4 or dcel.signed_area(face_id) <= 0:
             continue
-
-        # Prüfe, ob die Kante bereits in einem Face enthalten ist
-        edge_in_face = False
-        for face in faces:
-            for i in range(len(face) - 1):
-                p, q = face[i], face[i + 1]
-                if (p == u and q == v) or (p == v and q == u):
-                    edge_in_face = True
-                    break
-            if edge_in_face:
-                break
-        if edge_in_face:
-            print(f"SKIP: Edge {u}->{v} already in face")
-            continue
-
-        # Traversiere das Face
-        print(f"\nSTARTING FACE TRAVERSAL for {u} -> {v}")
-        face = custom_traverse_face(G, (u, v), visited_edges)
-        if len(face) < 3:
-            print("Invalid face (less than 3 nodes)")
+        edges = [G[p][q] for p, q in zip(face, face[1:])]
+        if all(e.get('type') == 'obstacle' for e in edges) and not all(e.get('hole') for e in edges):
             continue
-        if face[0] != face[-1]:
-            face.append(face[0])
-        print(f"Found face: {face}")
+        if tracing:
+            trace("face_found", "Found face %d from %s -> %s", len(faces), top, bottom, face=face)
         faces.append(face)
 
-        # Füge den verarbeiteten Bereich hinzu
-        processed_ranges[x].append((y_start, y_end))
-        # Sortiere Bereiche für effiziente Prüfung
-        processed_ranges[x].sort(reverse=True)
-        print(f"Updated processed ranges for x={x}: {processed_ranges[x]}")
+    return faces
 
-        # Markiere alle Kanten des Faces (außer vertikale der aktuellen Linie)
-        for i in range(len(face) - 1):
-            p, q = face[i], face[i + 1]
-            if abs(p[0] - q[0]) < vertical_tol and abs(p[0] - x) < vertical_tol:
-                continue
-            visited_edges.add((p, q))
-            visited_edges.add((q, p))
 
-    return faces
+def snap_to_map_node(point, index, node_ids, obstacles=(), k=8):
+    """
+    Map-Knoten, an dem ein Map-Pfad bei point beginnt: der nächste Knoten aus dem KD-Baum index,
+    dessen Verbindung zu point kein Hindernis-Inneres durchquert (Verläufe entlang des Randes
+    sind erlaubt, die Knoten liegen selbst auf Hinderniskanten). Wie bei snap_to_free_cell wird
+    k verdoppelt, bis alle Knoten geprüft sind; liegt point im Inneren eines Hindernisses oder
+    ist kein Knoten sichtbar, ist das Ergebnis None. node_ids bildet die Indizes von index auf
+    die Knoten ab.
+    """
+    if not len(obstacles):
+        candidates = index.k_nearest(point, 1)
+        return node_ids[candidates[0]] if candidates else None
+    if shapely.contains_xy(obstacles, point[0], point[1]).any():
+        return None
+    checked = 0
+    while checked < len(index):
+        candidates = index.k_nearest(point, k)
+        for i in candidates[checked:]:
+            target = index.points[i].tolist()
+            if target == list(point):
+                return node_ids[i]
+            sight = LineString([point, target])
+            if not shapely.relate_pattern(sight, obstacles, "T********").any():
+                return node_ids[i]
+        checked = len(candidates)
+        k *= 2
+    return None
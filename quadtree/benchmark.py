@@ -0,0 +1,80 @@
+"""
+Benchmark für den parallelen Quadtree-Aufbau: baut denselben großen Baum sequentiell und mit
+steigender Zahl von Worker-Prozessen und gibt Laufzeit und Speedup aus.
+
+    python -m quadtree.benchmark --size 4000 --obstacles 200 --max-depth 11
+    python -m quadtree.benchmark --map lageplan.geojson --max-depth 11
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common.mapgen import generate_map
+from common.mapio import load_map_file
+from .linear import LinearQuadtree
+
+
+def _time_build(size, obstacles, max_depth, min_size, workers, split_depth, repeat):
+    best = float("inf")
+    leaves = 0
+    if workers > 1:
+        # Pool vorab starten, damit nur der Aufbau gemessen wird
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(abs, range(workers)))
+            for _ in range(repeat):
+                start = time.perf_counter()
+                tree = LinearQuadtree(size, size, max_depth, min_size).build(
+                    obstacles, split_depth=split_depth, executor=pool)
+                best = min(best, time.perf_counter() - start)
+                leaves = len(tree)
+    else:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tree = LinearQuadtree(size, size, max_depth, min_size).build(obstacles)
+            best = min(best, time.perf_counter() - start)
+            leaves = len(tree)
+    return best, leaves
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--obstacles", type=int, default=200)
+    parser.add_argument("--obstacle-size", type=float, default=150)
+    parser.add_argument("--max-vertices", type=int, default=8)
+    parser.add_argument("--max-depth", type=int, default=11)
+    parser.add_argument("--min-size", type=float, default=0.5)
+    parser.add_argument("--split-depth", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--map", help="Hinderniskarte (GeoJSON/WKB) statt Zufallskarte; "
+                                      "--size ist dann die größere Seite ihrer Arbeitsfläche")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="Zu messende Worker-Zahlen (Standard: 1, 2, 4, ... bis zur Kernzahl)")
+    args = parser.parse_args()
+
+    if args.map:
+        entry = load_map_file(args.map)
+        obstacles = entry["obstacles"]
+        args.size = max(entry["width"], entry["height"])
+    else:
+        _, obstacles = generate_map(args.size, args.size, args.obstacles, args.obstacle_size, args.max_vertices,
+                                    seed=args.seed)
+
+    cores = os.cpu_count() or 1
+    counts = args.workers or sorted({1, *[2 ** k for k in range(1, cores.bit_length())], cores})
+    print(f"{len(obstacles)} Hindernisse, {args.size}x{args.size}, max_depth={args.max_depth}, "
+          f"{cores} Kerne")
+    print(f"{'Worker':>6} {'Zeit [s]':>10} {'Speedup':>8} {'Blätter':>10}")
+
+    baseline = None
+    for workers in counts:
+        seconds, leaves = _time_build(args.size, obstacles, args.max_depth, args.min_size,
+                                      workers, args.split_depth, args.repeat)
+        baseline = baseline or seconds
+        print(f"{workers:>6} {seconds:>10.3f} {baseline / seconds:>8.2f} {leaves:>10}")
+
+
+if __name__ == "__main__":
+    main()
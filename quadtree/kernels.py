@@ -0,0 +1,97 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry.polygon import orient
+
+# Zustände einer Zelle gegenüber den Hindernissen
+FREE = 0
+MIXED = 1
+FULL = 2
+
+
+def _is_convex(polygon):
+    return not polygon.interiors and abs(polygon.convex_hull.area - polygon.area) <= 1e-9 * max(polygon.area, 1.0)
+
+
+def pack_convex_polygons(polygons):
+    """
+    Konvexe Polygone als gepolsterte Arrays für den SAT-Test: Eckpunkte gegen den
+    Uhrzeigersinn (P, V, 2), äußere Kantennormalen (P, V, 2), Offsets n·a (P, V) und eine
+    Maske gültiger Kanten (P, V). Kürzere Polygone werden mit ihrem ersten Punkt aufgefüllt.
+    """
+    rings = [np.asarray(orient(p, 1.0).exterior.coords[:-1], dtype=float) for p in polygons]
+    size = max((len(r) for r in rings), default=0)
+    vertices = np.zeros((len(rings), size, 2))
+    valid = np.zeros((len(rings), size), dtype=bool)
+    for k, ring in enumerate(rings):
+        vertices[k, :len(ring)] = ring
+        vertices[k, len(ring):] = ring[0]
+        valid[k, :len(ring)] = True
+    # Die letzte echte Kante endet im ersten aufgefüllten Punkt (= erster Eckpunkt),
+    # aufgefüllte Kanten haben Länge 0 und werden über valid ausgeblendet
+    edges = np.roll(vertices, -1, axis=1) - vertices
+    normals = np.stack([edges[..., 1], -edges[..., 0]], axis=-1)
+    valid &= np.any(normals != 0, axis=-1)
+    offsets = np.einsum("pvk,pvk->pv", normals, vertices)
+    return {"normals": normals, "offsets": offsets, "valid": valid}
+
+
+def _sat_states(cx, cy, hw, hh, packed, poly_idx):
+    """Zustand je (Zelle, Polygon)-Paar: FREE (getrennt), FULL (Zelle im Polygon) oder MIXED."""
+    normals = packed["normals"][poly_idx]
+    offsets = packed["offsets"][poly_idx]
+    valid = packed["valid"][poly_idx]
+    center = normals[..., 0] * cx[:, None] + normals[..., 1] * cy[:, None]
+    radius = np.abs(normals[..., 0]) * hw[:, None] + np.abs(normals[..., 1]) * hh[:, None]
+    separated = np.any((center - radius > offsets) & valid, axis=1)
+    inside = np.all((center + radius <= offsets) | ~valid, axis=1)
+    return np.where(separated, FREE, np.where(inside, FULL, MIXED)).astype(np.int8)
+
+
+class ObstructionKernel:
+    """
+    Batch-Klassifikation achsenparalleler Zellen gegen alle Hindernisse: frei, voll bedeckt
+    oder gemischt. Zuerst liefert ein STRtree die Paare mit überlappenden Bounding-Boxen
+    (AABB-Ausschluss), dann entscheidet für konvexe Hindernisse ein Separating-Axis-Test in
+    NumPy. Nicht-konvexe Hindernisse werden über die Shapely-Prädikate klassifiziert.
+    """
+
+    def __init__(self, obstacles, max_elements=1_000_000):
+        self.max_elements = max_elements
+        obstacles = list(obstacles)
+        convex = [_is_convex(p) for p in obstacles]
+        self.convex = [p for p, c in zip(obstacles, convex) if c]
+        self.other = [p for p, c in zip(obstacles, convex) if not c]
+        self.convex_tree = STRtree(self.convex) if self.convex else None
+        self.other_tree = STRtree(self.other) if self.other else None
+        self.packed = pack_convex_polygons(self.convex) if self.convex else None
+        self.obstacle_tree = STRtree(obstacles) if obstacles else None
+
+    def candidates(self, x1, y1, x2, y2):
+        """Indizes der Hindernisse, deren Bounding-Box die Zelle berührt."""
+        if self.obstacle_tree is None:
+            return []
+        return sorted(self.obstacle_tree.query(shapely.box(x1, y1, x2, y2)).tolist())
+
+    def classify(self, x1, y1, x2, y2):
+        """Zustand (FREE / MIXED / FULL) je Zelle als int8-Array."""
+        states = np.full(len(x1), FREE, dtype=np.int8)
+        if not len(x1):
+            return states
+        boxes = shapely.box(x1, y1, x2, y2)
+
+        if self.convex_tree is not None:
+            cell_idx, poly_idx = self.convex_tree.query(boxes)
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            hw, hh = (x2 - x1) / 2, (y2 - y1) / 2
+            chunk = max(1, self.max_elements // max(1, self.packed["valid"].shape[1]))
+            for lo in range(0, len(cell_idx), chunk):
+                c, p = cell_idx[lo:lo + chunk], poly_idx[lo:lo + chunk]
+                np.maximum.at(states, c, _sat_states(cx[c], cy[c], hw[c], hh[c], self.packed, p))
+
+        if self.other_tree is not None:
+            hits = self.other_tree.query(boxes, predicate="intersects")
+            np.maximum.at(states, hits[0], MIXED)
+            inside = self.other_tree.query(boxes, predicate="within")
+            states[inside[0]] = FULL
+        return states
@@ -0,0 +1,363 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common.csr import CSRGraph
+from .kernels import ObstructionKernel, FREE, MIXED
+
+# Schiebeweiten und Bitmasken zum Verschränken zweier 32-Bit-Indizes zu einem 64-Bit-Morton-Code
+_SPREAD = [
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+]
+_COMPACT = [
+    (1, 0x3333333333333333),
+    (2, 0x0F0F0F0F0F0F0F0F),
+    (4, 0x00FF00FF00FF00FF),
+    (8, 0x0000FFFF0000FFFF),
+    (16, 0x00000000FFFFFFFF),
+]
+
+
+# Größte zulässige Baumtiefe: Codes auf der feinsten Ebene belegen 2 * max_depth Bits eines
+# uint64, und morton_encode nimmt Zellindizes mit höchstens 32 Bits
+MAX_DEPTH = 31
+
+
+def _spread_bits(v):
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in _SPREAD:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _compact_bits(v):
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0x5555555555555555)
+    for shift, mask in _COMPACT:
+        v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _inherit_pairs(split, leaf_idx, child_base, inner, outer):
+    """
+    Ein Ebenenschritt der Nachbarschaft (Samet): geteilte Zellen vererben ihre Nachbarn an die
+    Kinder auf der jeweiligen Seite. inner sind Paare (unten, oben, Achse) zwischen Zellen der
+    Ebene, outer Paare (Zelle, Blatt, Achse, Zelle liegt unten) zu früheren Blättern. Liefert
+    die fertigen Blattpaare (i, j, Achse) und inner/outer für die Kinder-Ebene.
+    """
+    a, b, axis = inner.T
+    low, other = np.left_shift(1, axis), np.left_shift(1, 1 - axis)
+    sa, sb = split[a], split[b]
+    done = [np.stack([leaf_idx[a], leaf_idx[b], axis], axis=1)[~sa & ~sb]]
+    next_inner, next_outer = [], []
+    for o in (0, 1):
+        # Beide geteilt (gleich groß): Kinder paarweise über die gemeinsame Seite
+        both = sa & sb
+        next_inner.append(np.stack([child_base[a] + low + o * other, child_base[b] + o * other, axis],
+                                   axis=1)[both])
+        only_a = sa & ~sb
+        next_outer.append(np.stack([child_base[a] + low + o * other, leaf_idx[b], axis, np.ones_like(a)],
+                                   axis=1)[only_a])
+        only_b = sb & ~sa
+        next_outer.append(np.stack([child_base[b] + o * other, leaf_idx[a], axis, np.zeros_like(b)],
+                                   axis=1)[only_b])
+
+    f, leaf, axis, below = outer.T
+    low, other = np.left_shift(1, axis), np.left_shift(1, 1 - axis)
+    done.append(np.stack([leaf_idx[f], leaf, axis], axis=1)[~split[f]])
+    for o in (0, 1):
+        next_outer.append(np.stack([child_base[f] + below * low + o * other, leaf, axis, below],
+                                   axis=1)[split[f]])
+
+    # Die vier Kinder einer geteilten Zelle sind untereinander benachbart
+    base = child_base[split]
+    for c1, c2, ax in ((0, 1, 0), (2, 3, 0), (0, 2, 1), (1, 3, 1)):
+        next_inner.append(np.stack([base + c1, base + c2, np.full(len(base), ax)], axis=1))
+    return np.concatenate(done), np.concatenate(next_inner), np.concatenate(next_outer)
+
+
+def morton_encode(ix, iy):
+    """Morton-/Z-Code aus Zellindizes; x liegt auf den geraden, y auf den ungeraden Bits."""
+    return _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+
+
+def morton_decode(codes):
+    """Zellindizes (ix, iy) aus Morton-Codes."""
+    codes = np.asarray(codes, dtype=np.uint64)
+    return _compact_bits(codes).astype(np.int64), _compact_bits(codes >> np.uint64(1)).astype(np.int64)
+
+
+class LinearQuadtree:
+    """
+    Quadtree als lineare Liste seiner Blätter in NumPy-Arrays: Morton-Code (Position auf der
+    eigenen Ebene), Tiefe und Hindernis-Flag, in Z-Reihenfolge. Das entspricht einer
+    Tiefensuche über einen Zellbaum mit Kindern [x klein/y klein, x groß/y klein,
+    x klein/y groß, x groß/y groß], kostet aber nur 10 Bytes pro Blatt statt eines Objekts.
+
+    Aufgebaut wird Ebene für Ebene: alle Zellen einer Tiefe werden in einem Aufruf gegen
+    die Hindernisse klassifiziert (frei / voll bedeckt / gemischt). Nur gemischte Zellen
+    werden (bis max_depth / min_size) weiter geteilt; voll bedeckte Zellen bleiben als
+    blockierte Blätter stehen.
+
+    max_depth wird auf die Tiefe begrenzt, ab der min_size keine Teilung mehr zulässt; Werte
+    außerhalb von 0 bis MAX_DEPTH lösen ValueError aus.
+    """
+
+    def __init__(self, width, height, max_depth=5, min_size=20):
+        if not 0 <= max_depth <= MAX_DEPTH:
+            raise ValueError(f"max_depth muss zwischen 0 und {MAX_DEPTH} liegen, nicht {max_depth}")
+        self.width = width
+        self.height = height
+        if min_size > 0 and max(width, height) > 0:
+            max_depth = min(max_depth, max(0, math.ceil(math.log2(max(width, height) / min_size))))
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.codes = np.zeros(0, dtype=np.uint64)
+        self.depths = np.zeros(0, dtype=np.uint8)
+        self.obstructed = np.zeros(0, dtype=bool)
+        # Nachbarpaare (i, j, Achse) mit i < j in Z-Reihenfolge, beim Aufbau mit erzeugt
+        self.pairs = None
+        # Z-Codes der Blätter auf der feinsten Ebene, für locate bei Bedarf berechnet
+        self._starts = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def cell_bounds(self, codes, depths):
+        """Bounds (x1, y1, x2, y2) als Arrays für Zellen mit gegebenem Code und Tiefe."""
+        ix, iy = morton_decode(codes)
+        cell_w = self.width / np.exp2(depths)
+        cell_h = self.height / np.exp2(depths)
+        return ix * cell_w, iy * cell_h, (ix + 1) * cell_w, (iy + 1) * cell_h
+
+    def _grow(self, kernel, level, depth, stop_depth=None):
+        """
+        Baut ab den Zellen level (alle auf Tiefe depth, untereinander zunächst ohne bekannte
+        Nachbarn) Ebene für Ebene weiter bis max_depth bzw. stop_depth. Die Nachbarschaft der
+        Blätter entsteht dabei mit, linear in der Zahl der Blätter (siehe _inherit_pairs).
+        Liefert die Blätter (Codes, Tiefen, Flags) in Entstehungsreihenfolge, ihre Nachbarpaare
+        (i, j, Achse) als Indizes in diese Reihenfolge und die noch zu teilenden Zellen auf
+        stop_depth. Ohne stop_depth werden alle Zellen zu Blättern, die zurückgegebene Liste ist
+        dann leer; Nachbarschaften zu den noch zu teilenden Zellen gehen verloren.
+        """
+        leaf_codes, leaf_depths, leaf_obstructed, leaf_pairs = [], [], [], []
+        inner = np.zeros((0, 3), dtype=np.int64)
+        outer = np.zeros((0, 4), dtype=np.int64)
+        leaves = 0
+        while len(level) and (stop_depth is None or depth < stop_depth):
+            depths = np.full(len(level), depth, dtype=np.uint8)
+            states = kernel.classify(*self.cell_bounds(level, depths))
+            obstructed = states != FREE
+
+            split = (states == MIXED) & (depth < self.max_depth) & (self.width / 2 ** depth > self.min_size)
+            leaf_codes.append(level[~split])
+            leaf_depths.append(depths[~split])
+            leaf_obstructed.append(obstructed[~split])
+
+            # Neue Blätter werden fortlaufend nummeriert, geteilte Zellen bekommen vier Kinder
+            leaf_idx = np.full(len(level), -1, dtype=np.int64)
+            leaf_idx[~split] = leaves + np.arange(np.count_nonzero(~split))
+            leaves += np.count_nonzero(~split)
+            child_base = np.full(len(level), -1, dtype=np.int64)
+            child_base[split] = 4 * np.arange(np.count_nonzero(split))
+            done, inner, outer = _inherit_pairs(split, leaf_idx, child_base, inner, outer)
+            leaf_pairs.append(done)
+
+            # Kinder-Codes: zwei Bits an den Code des Elternknotens anhängen
+            parents = level[split] << np.uint64(2)
+            level = (parents[:, None] | np.arange(4, dtype=np.uint64)[None, :]).ravel()
+            depth += 1
+        pairs = np.concatenate(leaf_pairs) if leaf_pairs else np.zeros((0, 3), dtype=np.int64)
+        return (leaf_codes, leaf_depths, leaf_obstructed), pairs, level
+
+    def build(self, obstacles, workers=1, split_depth=1, executor=None):
+        """
+        Baut den Baum für die gegebenen Hindernisse. Mit workers > 1 (oder einem übergebenen
+        Executor) werden die Ebenen bis split_depth lokal aufgebaut und die Teilbäume darunter
+        (4 bei split_depth=1, 16 bei 2) auf Worker-Prozesse verteilt; jeder erhält nur die
+        Hindernisse, die seinen Quadranten berühren. Die Nachbarschaft innerhalb der Teilbäume
+        liefern die Worker mit; nur die Nähte zwischen ihnen werden danach per Sonde ergänzt.
+        """
+        kernel = ObstructionKernel(obstacles)
+        parallel = (executor is not None or workers > 1) and split_depth <= self.max_depth
+        (leaf_codes, leaf_depths, leaf_obstructed), pairs, level = self._grow(
+            kernel, np.zeros(1, dtype=np.uint64), 0, stop_depth=split_depth if parallel else None)
+        pair_lists = [pairs]
+
+        seams = parallel and len(level)
+        if seams:
+            tasks = []
+            for code in level.tolist():
+                bounds = [float(b[0]) for b in self.cell_bounds(np.array([code], dtype=np.uint64),
+                                                                 np.array([split_depth], dtype=np.uint8))]
+                subset = [obstacles[k] for k in kernel.candidates(*bounds)]
+                tasks.append((self.width, self.height, self.max_depth, self.min_size, code, split_depth, subset))
+            if executor is not None:
+                results = list(executor.map(_build_subtree, tasks))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_build_subtree, tasks))
+            # Paare zwischen den lokal entstandenen Blättern kommen mit den Nähten neu hinzu
+            pair_lists = []
+            offset = sum(len(c) for c in leaf_codes)
+            for codes, depths, obstructed, sub_pairs in results:
+                leaf_codes.append(codes)
+                leaf_depths.append(depths)
+                leaf_obstructed.append(obstructed)
+                sub_pairs[:, :2] += offset
+                pair_lists.append(sub_pairs)
+                offset += len(codes)
+
+        codes = np.concatenate(leaf_codes)
+        depths = np.concatenate(leaf_depths)
+        # Z-Reihenfolge über die Codes auf der feinsten Ebene
+        order = np.argsort(self._fine_codes(codes, depths), kind="stable")
+        self.codes = codes[order]
+        self.depths = depths[order]
+        self.obstructed = np.concatenate(leaf_obstructed)[order]
+        self._starts = None
+
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        pairs = np.concatenate(pair_lists)
+        pairs[:, :2] = rank[pairs[:, :2]]
+        if seams:
+            pairs = np.concatenate([pairs, self._probe_pairs(split_depth)])
+        self.pairs = _sort_pairs(pairs)
+        return self
+
+    def _fine_codes(self, codes, depths):
+        shift = (2 * (self.max_depth - depths.astype(np.int64))).astype(np.uint64)
+        return codes << shift
+
+    def locate(self, point):
+        """
+        Index des Blatts, das point enthält (None außerhalb des Arbeitsbereichs): die Zelle auf
+        der feinsten Ebene liefert per binärer Suche über die Z-Codes das umschließende Blatt.
+        """
+        x, y = point
+        if not len(self.codes) or not (0 <= x <= self.width and 0 <= y <= self.height):
+            return None
+        n_fine = 1 << self.max_depth
+        ix = min(int(x / self.width * n_fine), n_fine - 1)
+        iy = min(int(y / self.height * n_fine), n_fine - 1)
+        if self._starts is None:
+            self._starts = self._fine_codes(self.codes, self.depths)
+        code = morton_encode(np.array([ix]), np.array([iy]))
+        return int(np.searchsorted(self._starts, code, side="right")[0] - 1)
+
+    def _neighbor_pairs(self):
+        """Nachbarpaare aus dem Aufbau; für Bäume, die nur aus ihren Arrays geladen wurden, per Sonde."""
+        if self.pairs is None:
+            self.pairs = self._probe_pairs()
+        return self.pairs
+
+    def _probe_pairs(self, split_depth=None):
+        """
+        Benachbarte Blattpaare (i, j, Achse) über eine Sonde direkt neben jeder Zelle: das Blatt,
+        das die Sonde enthält, liefert die sortierte Liste der Z-Codes per searchsorted. Paare
+        werden nur gezählt, wenn der Nachbar gleich groß oder größer ist (bei gleicher Größe nur
+        in positiver Richtung), damit jede Nachbarschaft genau einmal vorkommt.
+
+        Mit split_depth nur die Nähte des parallelen Aufbaus: Paare zwischen verschiedenen
+        Teilbäumen unter split_depth bzw. mit Blättern oberhalb davon, gesucht nur von Blättern
+        am Rand ihres Teilbaums aus.
+        """
+        n_fine = 1 << self.max_depth
+        depth = self.depths.astype(np.int64)
+        shift = self.max_depth - depth
+        ix, iy = morton_decode(self.codes)
+        fx, fy = ix << shift, iy << shift
+        size = np.left_shift(1, shift)
+        starts = self._fine_codes(self.codes, self.depths)
+
+        probe = np.ones(len(depth), dtype=bool)
+        if split_depth is not None:
+            # Teilbaum je Blatt (Code auf split_depth), Blätter darüber bilden je eine eigene Gruppe
+            top = depth < split_depth
+            group = (starts >> np.uint64(2 * (self.max_depth - split_depth))).astype(np.int64)
+            group[top] = -1 - np.nonzero(top)[0]
+            span = 1 << (self.max_depth - split_depth)
+            probe = top | (fx % span == 0) | ((fx + size) % span == 0) | (fy % span == 0) | ((fy + size) % span == 0)
+
+        pairs = []
+        for axis, positive, px, py in ((0, True, fx + size, fy), (0, False, fx - 1, fy),
+                                       (1, True, fx, fy + size), (1, False, fx, fy - 1)):
+            inside = probe & (px >= 0) & (px < n_fine) & (py >= 0) & (py < n_fine)
+            i = np.nonzero(inside)[0]
+            j = np.searchsorted(starts, morton_encode(px[i], py[i]), side="right") - 1
+            keep = depth[j] < depth[i] if not positive else depth[j] <= depth[i]
+            if split_depth is not None:
+                keep &= group[i] != group[j]
+            i, j = i[keep], j[keep]
+            pairs.append(np.stack([i, j, np.full(len(i), axis)], axis=1))
+        return _sort_pairs(np.concatenate(pairs))
+
+    def cells_and_graph(self):
+        """
+        Blattzellen und Graph der freien Zellen für die Antwort der Route:
+        Zellen mit Nummer in Z-Reihenfolge, Knoten mit Schwerpunkt, Kanten nach Zellnummern
+        sortiert (horizontale vor vertikalen).
+        """
+        x1, y1, x2, y2 = (a.tolist() for a in self.cell_bounds(self.codes, self.depths))
+        obstructed = self.obstructed.tolist()
+
+        cells = []
+        nodes = []
+        for k in range(len(x1)):
+            bounds = (x1[k], y1[k], x2[k], y2[k])
+            cells.append({
+                "number": k,
+                "polygon": [[x1[k], y1[k]], [x2[k], y1[k]], [x2[k], y2[k]], [x1[k], y2[k]]],
+                "bounds": bounds,
+                "obstructed": obstructed[k]
+            })
+            if not obstructed[k]:
+                nodes.append({"id": k, "centroid": ((x1[k] + x2[k]) / 2, (y1[k] + y2[k]) / 2)})
+
+        links = []
+        for i, j, _ in self._neighbor_pairs().tolist():
+            if obstructed[i] or obstructed[j]:
+                continue
+            links.append({
+                "source": i,
+                "target": j,
+                "weight": math.hypot((x1[j] + x2[j]) / 2 - (x1[i] + x2[i]) / 2,
+                                     (y1[j] + y2[j]) / 2 - (y1[i] + y2[i]) / 2)
+            })
+        return cells, nodes, links
+
+    def free_graph(self):
+        """
+        Graph der freien Blattzellen direkt als CSRGraph (Schlüssel = Zellnummer in Z-Reihenfolge,
+        Koordinaten = Zellmittelpunkte), ohne die Zell- und Kantenlisten von cells_and_graph.
+        """
+        x1, y1, x2, y2 = self.cell_bounds(self.codes, self.depths)
+        cx, cy = ((x1 + x2) / 2).tolist(), ((y1 + y2) / 2).tolist()
+        pairs = self._neighbor_pairs()
+        pairs = pairs[~(self.obstructed[pairs[:, 0]] | self.obstructed[pairs[:, 1]])]
+        edges = ((i, j, math.hypot(cx[j] - cx[i], cy[j] - cy[i])) for i, j, _ in pairs.tolist())
+        return CSRGraph.from_edges(np.nonzero(~self.obstructed)[0].tolist(), edges, lambda k: (cx[k], cy[k]))
+
+
+def _sort_pairs(pairs):
+    """Paare (i, j, Achse) mit i < j, sortiert nach i, j und Achse."""
+    pairs = np.stack([np.minimum(pairs[:, 0], pairs[:, 1]), np.maximum(pairs[:, 0], pairs[:, 1]), pairs[:, 2]],
+                     axis=1)
+    return pairs[np.lexsort((pairs[:, 2], pairs[:, 1], pairs[:, 0]))]
+
+
+def _build_subtree(task):
+    """
+    Worker: baut den Teilbaum unter einer Zelle und gibt dessen Blätter als Arrays zurück, dazu
+    die Nachbarpaare innerhalb des Teilbaums (Indizes in die zurückgegebenen Blätter).
+    """
+    width, height, max_depth, min_size, code, depth, obstacles = task
+    tree = LinearQuadtree(width, height, max_depth=max_depth, min_size=min_size)
+    (codes, depths, obstructed), pairs, _ = tree._grow(ObstructionKernel(obstacles),
+                                                        np.array([code], dtype=np.uint64), depth)
+    return np.concatenate(codes), np.concatenate(depths), np.concatenate(obstructed), pairs
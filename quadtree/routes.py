@@ -1,14 +1,107 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, current_app
 import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from shapely.geometry import Polygon, Point
+from common import store
+from common.batch import parse_batch_request
+from common.cache import map_cache
+from common.fields import select_fields
+from common.mapio import map_source, cached_map, obstacle_rings
+from common.search import check_method
+from common.spatial import KDTree
 from . import quad_tree_bp
-from .utils import generate_map, QuadtreeCell, build_graph_from_grid, find_nearest_node
-import networkx as nx
+from .linear import LinearQuadtree, MAX_DEPTH
+from .utils import snap_to_free_cell
 
 @quad_tree_bp.route('/')
 def index():
     return render_template('quadtree.html')
 
+def _cached_map(source):
+    return cached_map("quadtree", source)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _quadtree_executor():
+    """Gemeinsamer Prozess-Pool für den parallelen Aufbau, falls QUADTREE_WORKERS > 1 gesetzt ist."""
+    global _executor
+    workers = int(current_app.config.get("QUADTREE_WORKERS", 1))
+    if workers <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _cached_quadtree(source, max_depth, min_size):
+    """Quadtree und freier Zellgraph je (Kartenquelle, Tiefe, Mindestgröße); source siehe common.mapio.map_source."""
+    executor = _quadtree_executor()
+    width, height = source[1], source[2]
+
+    def build():
+        boundary, obstacles = _cached_map(source)
+
+        # Linearer Quadtree (Z-Codes in NumPy-Arrays), Ebene für Ebene aufgebaut
+        # Teilbäume unter den 16 Zellen der zweiten Ebene ggf. parallel auf dem Prozess-Pool
+        tree = LinearQuadtree(width, height, max_depth=max_depth, min_size=min_size).build(
+            obstacles, split_depth=2, executor=executor)
+        # Zellmittelpunkt = Bounding-Box-Mitte, die Kantengewichte sind deren Abstände
+        graph = tree.free_graph()
+        return {
+            "tree": tree,
+            "obstacles": obstacles,
+            "graph": graph,
+            # KD-Baum über die freien Zellmittelpunkte zum Einrasten von Start und Ziel
+            "index": KDTree(graph.coords),
+        }
+
+    def encode(entry):
+        tree = entry["tree"]
+        arrays = {"codes": tree.codes, "depths": tree.depths, "obstructed": tree.obstructed,
+                  "pairs": tree._neighbor_pairs()}
+        arrays.update(store.pack_csr(entry["graph"], "graph_"))
+        return arrays, {}
+
+    def decode(arrays, meta):
+        # Hindernisse kommen aus dem Karten-Cache, KD-Baum wird neu aufgebaut
+        boundary, obstacles = _cached_map(source)
+        tree = LinearQuadtree(width, height, max_depth=max_depth, min_size=min_size)
+        tree.codes, tree.depths, tree.obstructed = arrays["codes"], arrays["depths"], arrays["obstructed"]
+        # Ältere Einträge ohne Nachbarpaare: werden bei Bedarf per Sonde bestimmt
+        tree.pairs = arrays.get("pairs")
+        graph = store.unpack_csr(arrays, "graph_")
+        return {"tree": tree, "obstacles": obstacles, "graph": graph, "index": KDTree(graph.coords)}
+
+    key = ("quadtree", "cells") + source + (max_depth, min_size)
+    return store.get_or_create(key, build, encode, decode)
+
+
+def _cached_quadtree_data(source, max_depth, min_size):
+    """Zell-, Knoten- und Kantenlisten für die Ausgabe; nur aufgebaut, wenn eine Anfrage sie braucht."""
+    def build():
+        tree = _cached_quadtree(source, max_depth, min_size)["tree"]
+        quadtree_cells, nodes, links = tree.cells_and_graph()
+        return {"cells": quadtree_cells, "nodes": nodes, "links": links}
+
+    key = ("quadtree", "cell_data") + source + (max_depth, min_size)
+    return map_cache.get_or_create(key, build)
+
+
+def _check_max_depth(max_depth):
+    if not 0 <= max_depth <= MAX_DEPTH:
+        raise ValueError(f"max_depth muss zwischen 0 und {MAX_DEPTH} liegen, nicht {max_depth}")
+
+
+# Abschnitte der Antwort von graph_data_quadtree, wählbar über fields= bzw. mode=path
+RESPONSE_SECTIONS = ("obstacles", "cells", "graph", "path")
+PATH_SECTIONS = ("path",)
+
+
 @quad_tree_bp.route('/graph_data_quadtree')
 def graph_data_quadtree():
     width = int(request.args.get("width", 600))
@@ -19,56 +112,54 @@ def graph_data_quadtree():
     max_depth = int(request.args.get("max_depth", 5))
     min_size = float(request.args.get("min_size", 20))
     seed = request.args.get("seed", str(random.randint(0, 1000000)))
-    random.seed(int(seed))
-
-    boundary, obstacles = generate_map(width, height, num_obstacles, obstacle_size, max_vertices)
-    obstacles_coords = [list(obs.exterior.coords)[:-1] for obs in obstacles]
-
-    root = QuadtreeCell((0, 0, width, height), max_depth=max_depth, min_size=min_size)
-    root.check_obstruction(obstacles)
-    root.subdivide(obstacles)
-
-    quadtree_cells = []
-    def collect_cells(cell):
-        if not cell.children:
-            quadtree_cells.append({
-                "number": len(quadtree_cells),
-                "polygon": [
-                    [cell.bounds[0], cell.bounds[1]],
-                    [cell.bounds[2], cell.bounds[1]],
-                    [cell.bounds[2], cell.bounds[3]],
-                    [cell.bounds[0], cell.bounds[3]]
-                ],
-                "bounds": cell.bounds,
-                "obstructed": cell.is_obstructed
-            })
-        else:
-            for child in cell.children:
-                collect_cells(child)
-    collect_cells(root)
-
-    nodes, links = build_graph_from_grid([c for c in quadtree_cells if not c['obstructed']])
-    G = nx.Graph()
-    G.add_nodes_from([(n['id'], n) for n in nodes])
-    G.add_edges_from([(l['source'], l['target'], {'weight': l['weight']}) for l in links])
-    path = []
+    # Pfadsuche: "astar" (euklidische Heuristik über die Zellmittelpunkte), "dijkstra" oder "bidirectional"
+    search = request.args.get("search", "astar")
+
     try:
+        fields = select_fields(request.args, RESPONSE_SECTIONS, PATH_SECTIONS)
+        _check_max_depth(max_depth)
+        check_method(search)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # map_id=...: hochgeladene Karte (POST /maps) statt Zufallskarte
+        source = map_source(request.args, width, height, num_obstacles, max_vertices, obstacle_size, int(seed))
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+    args = (source, max_depth, min_size)
+    response = {}
+
+    if "obstacles" in fields:
+        boundary, obstacles = _cached_map(source)
+        response["obstacles"], response["obstacle_holes"] = obstacle_rings(obstacles)
+    if fields & {"cells", "graph"}:
+        cell_data = _cached_quadtree_data(*args)
+        if "cells" in fields:
+            response["cells"] = cell_data["cells"]
+        if "graph" in fields:
+            response["graph"] = {
+                "nodes": cell_data["nodes"],
+                "edges": cell_data["links"]
+            }
+
+    expanded = {}
+    if "path" in fields:
+        quadtree = _cached_quadtree(*args)
+        G = quadtree["graph"]
+        path = []
+        expanded["cell_graph"] = 0
         start = (float(request.args.get("start_x", 50)), float(request.args.get("start_y", 300)))
         goal = (float(request.args.get("goal_x", 550)), float(request.args.get("goal_y", 300)))
-        start_node = find_nearest_node(start, G)
-        goal_node = find_nearest_node(goal, G)
-        path = nx.shortest_path(G, start_node, goal_node, weight='weight')
-    except nx.NetworkXNoPath:
-        pass
-
-    return jsonify({
-        "obstacles": obstacles_coords,
-        "cells": quadtree_cells,
-        "graph": {
-            "nodes": nodes,
-            "edges": links
-        },
-        "path": path,
+        tree, index = quadtree["tree"], quadtree["index"]
+        start_node = snap_to_free_cell(start, tree, index, G.keys, quadtree["obstacles"])
+        goal_node = snap_to_free_cell(goal, tree, index, G.keys, quadtree["obstacles"])
+        if start_node is not None and goal_node is not None:
+            found, expanded["cell_graph"] = G.shortest_path(start_node, goal_node, method=search)
+            path = found or []
+        response["path"] = path
+
+    response.update({
+        "search": {"method": search, "expanded": expanded},
         "start": {"x": float(request.args.get("start_x", 50)), "y": float(request.args.get("start_y", 300))},
         "goal": {"x": float(request.args.get("goal_x", 550)), "y": float(request.args.get("goal_y", 300))},
         "params": {
@@ -77,3 +168,52 @@ def graph_data_quadtree():
             "seed": seed
         }
     })
+    if source[0] == "upload":
+        response["params"]["map_id"] = source[3]
+    return jsonify(response)
+
+
+@quad_tree_bp.route('/batch_paths', methods=['POST'])
+def batch_paths_quadtree():
+    """
+    Viele Start/Ziel-Paare auf einer Karte: Quadtree und Zellgraph werden einmal (gecacht)
+    aufgebaut, die Antwort enthält je Anfrage nur den Zellpfad und seine Länge.
+    """
+    data = request.get_json(silent=True)
+    try:
+        queries, search, share = parse_batch_request(data, int(current_app.config.get("BATCH_MAX_QUERIES", 1000)))
+        width = int(data.get("width", 600))
+        height = int(data.get("height", 600))
+        num_obstacles = int(data.get("num_obstacles", 3))
+        max_vertices = int(data.get("max_vertices", 6))
+        obstacle_size = float(data.get("obstacle_size", 100))
+        max_depth = int(data.get("max_depth", 5))
+        _check_max_depth(max_depth)
+        min_size = float(data.get("min_size", 20))
+        seed = int(data.get("seed", random.randint(0, 1000000)))
+        source = map_source(data, width, height, num_obstacles, max_vertices, obstacle_size, seed)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+
+    quadtree = _cached_quadtree(source, max_depth, min_size)
+    G = quadtree["graph"]
+    tree, index, obstacles = quadtree["tree"], quadtree["index"], quadtree["obstacles"]
+
+    pairs = [(snap_to_free_cell(start, tree, index, G.keys, obstacles),
+              snap_to_free_cell(goal, tree, index, G.keys, obstacles)) for start, goal in queries]
+    results = G.shortest_paths(pairs, method=search, share=share)
+
+    response = {
+        "results": [{"path": path, "cost": cost} for path, cost in results],
+        "search": {"method": search, "share": share},
+        "params": {
+            "max_depth": max_depth,
+            "min_size": min_size,
+            "seed": seed
+        }
+    }
+    if source[0] == "upload":
+        response["params"]["map_id"] = source[3]
+    return jsonify(response)
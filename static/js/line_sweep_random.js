@@ -77,9 +77,10 @@ function drawObstacles(data) {
     const svg = d3.select("#map_view");
     svg.selectAll("*").remove();
     drawCoordinateGrid(svg, 600, 600);
-    data.obstacles.forEach(obs => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+    data.obstacles.forEach((obs, i) => {
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "darkgrey")
            .attr("stroke", "black");
     });
@@ -133,9 +134,10 @@ function drawDecomposition(data) {
            .attr("text-anchor", "middle")
            .attr("dominant-baseline", "central");
     });
-    data.obstacles.forEach(obs => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+    data.obstacles.forEach((obs, i) => {
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "none")
            .attr("stroke", "black")
            .attr("stroke-width", 2);
@@ -335,8 +337,8 @@ function dragended(event, d) {
     let markerType = circle.classed("start-marker") ? "start" : "goal";
     let newX = +circle.attr("cx"), newY = +circle.attr("cy");
     let insideObstacle = false;
-    currentData.obstacles.forEach(obs => {
-        if (isPointInPolygon({x: newX, y: newY}, obs)) {
+    currentData.obstacles.forEach((obs, i) => {
+        if (isPointInObstacle({x: newX, y: newY}, currentData, i)) {
             insideObstacle = true;
         }
     });
@@ -354,19 +356,6 @@ function dragended(event, d) {
     updateLineSweepRandom(false);
 }
 
-function isPointInPolygon(point, polygon) {
-    let x = point.x, y = point.y;
-    let inside = false;
-    for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
-        let xi = polygon[i][0], yi = polygon[i][1];
-        let xj = polygon[j][0], yj = polygon[j][1];
-        let intersect = ((yi > y) !== (yj > y)) &&
-                        (x < (xj - xi) * (y - yi) / ((yj - yi) || 0.0000001) + xi);
-        if (intersect) inside = !inside;
-    }
-    return inside;
-}
-
 function addDraggableMarkers(data) {
     const markerParams = [
         {view: "#map_view", type: "start", color: "green", label: "S"},
@@ -1,2 +1,25 @@
 // Globale Hilfsfunktionen (falls benötigt)
 console.log("Main JS loaded");
+
+// Hindernis i als SVG-Pfad aus Außenring und Löchern (data.obstacle_holes, z.B. bei hochgeladenen
+// Karten); mit fill-rule "evenodd" zeichnen, damit die Löcher frei bleiben
+function obstaclePath(data, i) {
+    const rings = [data.obstacles[i]].concat((data.obstacle_holes || [])[i] || []);
+    return rings.map(ring => "M" + ring.map(p => p.join(",")).join("L") + "Z").join(" ");
+}
+
+// Liegt point ({x, y}) im Hindernis i, d.h. in einer ungeraden Zahl seiner Ringe (Even-Odd)?
+function isPointInObstacle(point, data, i) {
+    const rings = [data.obstacles[i]].concat((data.obstacle_holes || [])[i] || []);
+    let inside = false;
+    rings.forEach(ring => {
+        for (let k = 0, j = ring.length - 1; k < ring.length; j = k++) {
+            const xk = ring[k][0], yk = ring[k][1], xj = ring[j][0], yj = ring[j][1];
+            if (((yk > point.y) !== (yj > point.y)) &&
+                (point.x < (xj - xk) * (point.y - yk) / ((yj - yk) || 0.0000001) + xk)) {
+                inside = !inside;
+            }
+        }
+    });
+    return inside;
+}
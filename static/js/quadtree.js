@@ -41,21 +41,6 @@ function updateQuadTree(full = true) {
     });
 }
 
-// Hilfsfunktion: Ray Casting für Point in Polygon
-function isPointInPolygon(point, polygon) {
-    // polygon: Array von [x,y]-Punkten (geschlossener Ring, d.h. erster Punkt = letzter Punkt optional)
-    let x = point.x, y = point.y;
-    let inside = false;
-    for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
-        let xi = polygon[i][0], yi = polygon[i][1];
-        let xj = polygon[j][0], yj = polygon[j][1];
-        let intersect = ((yi > y) !== (yj > y)) &&
-                        (x < (xj - xi) * (y - yi) / (yj - yi + 0.0000001) + xi);
-        if (intersect) inside = !inside;
-    }
-    return inside;
-}
-
 function drawCoordinateGrid(svg, width, height, spacing = 50) {
     for (let x = 0; x <= width; x += spacing) {
         svg.append("line")
@@ -93,9 +78,10 @@ function drawMap(data) {
     const svg = d3.select("#map_view");
     svg.selectAll("*").remove();
     drawCoordinateGrid(svg, 600, 600);
-    data.obstacles.forEach(obs => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+    data.obstacles.forEach((obs, i) => {
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "darkgrey")
            .attr("stroke", "black");
     });
@@ -112,9 +98,10 @@ function drawQuadtree(data) {
            .attr("stroke", cell.obstructed ? "#ffcdd2" : "#c8e6c9")
            .attr("stroke-width", 1);
     });
-    data.obstacles.forEach(obs => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+    data.obstacles.forEach((obs, i) => {
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "darkgrey")
            .attr("stroke", "black");
     });
@@ -275,8 +262,8 @@ function dragended(event, d) {
     let newX = +circle.attr("cx"), newY = +circle.attr("cy");
     let insideObstacle = false;
     // Prüfe für alle Hindernisse in currentData.obstacles (dieses Array enthält Polygonkoordinaten)
-    currentData.obstacles.forEach(obs => {
-        if (isPointInPolygon({x: newX, y: newY}, obs)) {
+    currentData.obstacles.forEach((obs, i) => {
+        if (isPointInObstacle({x: newX, y: newY}, currentData, i)) {
             insideObstacle = true;
         }
     });
@@ -296,20 +283,6 @@ function dragended(event, d) {
     updateQuadTree(false);
 }
 
-// Punkt-in-Polygon Funktion (Ray-Casting)
-function isPointInPolygon(point, polygon) {
-    let x = point.x, y = point.y;
-    let inside = false;
-    for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
-        let xi = polygon[i][0], yi = polygon[i][1];
-        let xj = polygon[j][0], yj = polygon[j][1];
-        let intersect = ((yi > y) !== (yj > y)) &&
-                        (x < (xj - xi) * (y - yi) / ((yj - yi) || 0.0000001) + xi);
-        if (intersect) inside = !inside;
-    }
-    return inside;
-}
-
 // Partial update: nur Graph, Pfad und Marker aktualisieren (obstacles und quadtree bleiben unverändert)
 function updateQuadTree(full = true) {
     const width = 600, height = 600;
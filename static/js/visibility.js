@@ -77,8 +77,9 @@ function drawObstacles(data) {
     drawCoordinateGrid(svg, 600, 600);
     // Hier: Weniger Hindernisse und größere Darstellung – Fill als Grau
     data.obstacles.forEach((obs, i) => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "grey")
            .attr("stroke", "black")
            .attr("stroke-width", 2);
@@ -97,8 +98,9 @@ function drawGraphElements(data) {
     drawCoordinateGrid(svg, 600, 600);
     // Zeichne Kanten
     data.obstacles.forEach((obs, i) => {
-        svg.append("polygon")
-           .attr("points", obs.map(p => p.join(",")).join(" "))
+        svg.append("path")
+           .attr("d", obstaclePath(data, i))
+           .attr("fill-rule", "evenodd")
            .attr("fill", "grey")
            .attr("stroke", "black")
            .attr("stroke-width", 2);
@@ -244,8 +246,8 @@ function dragended(event, d) {
     let markerType = circle.classed("start-marker") ? "start" : "goal";
     let newX = +circle.attr("cx"), newY = +circle.attr("cy");
     let insideObstacle = false;
-    currentData.obstacles.forEach(obs => {
-        if (isPointInPolygon({x: newX, y: newY}, obs)) {
+    currentData.obstacles.forEach((obs, i) => {
+        if (isPointInObstacle({x: newX, y: newY}, currentData, i)) {
             insideObstacle = true;
         }
     });
@@ -263,19 +265,6 @@ function dragended(event, d) {
     updateGraph(false);
 }
 
-function isPointInPolygon(point, polygon) {
-    let x = point.x, y = point.y;
-    let inside = false;
-    for (let i = 0, j = polygon.length - 1; i < polygon.length; j = i++) {
-        let xi = polygon[i][0], yi = polygon[i][1];
-        let xj = polygon[j][0], yj = polygon[j][1];
-        let intersect = ((yi > y) !== (yj > y)) &&
-                        (x < (xj - xi) * (y - yi) / ((yj - yi) || 0.0000001) + xi);
-        if (intersect) inside = !inside;
-    }
-    return inside;
-}
-
 document.addEventListener("DOMContentLoaded", function() {
     updateGraph(true);
 });
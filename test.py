@@ -1,50 +1,13 @@
-import random, math
+import math
 import networkx as nx
 from shapely.geometry import Polygon, Point, LineString
 from shapely.ops import unary_union
 
+from common.mapgen import generate_map
 
-# === 1. Grundfunktionen zum Erzeugen der Karte ===
-
-def generate_random_polygon(width, height, max_radius, max_vertices):
-    """
-    Generiert ein zufälliges konvexes Polygon (als Hindernis) innerhalb des Arbeitsbereichs.
-    """
-    cx = random.uniform(max_radius, width - max_radius)
-    cy = random.uniform(max_radius, height - max_radius)
-    n = random.randint(3, max_vertices)
-    angles = sorted([random.uniform(0, 2 * math.pi) for _ in range(n)])
-    base_radius = random.uniform(max_radius / 2, max_radius)
-    vertices = []
-    for angle in angles:
-        r = base_radius * random.uniform(0.8, 1.2)
-        x = cx + r * math.cos(angle)
-        y = cy + r * math.sin(angle)
-        vertices.append((x, y))
-    convex_vertices = Polygon(vertices).convex_hull.exterior.coords[:-1]
-    return Polygon(convex_vertices)
-
-
-def generate_map(width, height, num_obstacles, max_radius, max_vertices, max_attempts=1000):
-    """
-    Generiert 'num_obstacles' zufällige Hindernisse innerhalb eines Rechtecks (width x height),
-    sodass sich diese nicht überlappen. Gibt außerdem die Arbeitsflächenumrandung zurück.
-    """
-    obstacles = []
-    attempts = 0
-    while len(obstacles) < num_obstacles and attempts < max_attempts:
-        poly = generate_random_polygon(width, height, max_radius, max_vertices)
-        overlap = False
-        for obs in obstacles:
-            if poly.intersects(obs):
-                overlap = True
-                break
-        if not overlap:
-            obstacles.append(poly)
-        attempts += 1
-    boundary = Polygon([(0, 0), (width, 0), (width, height), (0, height)])
-    return boundary, obstacles
 
+# === 1. Grundfunktionen zum Erzeugen der Karte ===
+# Siehe common.mapgen.generate_map (gemeinsamer, vektorisierter Generator mit seed)
 
 # === 2. Vertikale Linien berechnen (Grundfunktion) ===
 
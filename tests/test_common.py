@@ -0,0 +1,289 @@
+import math
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon
+
+from common import mapgen, store
+from common.adjacency import build_graph_from_grid
+from common.cache import LRUCache, estimate_size, map_cache
+from common.csr import CSRGraph
+from common.point_location import PointLocator
+from common.search import METHODS, shortest_path
+from line_sweep.utils import build_map_graph, compute_custom_faces_from_graph, compute_vertical_lines
+from quadtree.linear import LinearQuadtree
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, sizeof=lambda value: 1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    # "b" ist jetzt der älteste Eintrag
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_byte_limit_and_size_accounting():
+    cache = LRUCache(max_entries=10, max_bytes=100, sizeof=lambda value: value)
+    cache.put("a", 40)
+    cache.put("b", 40)
+    assert cache.stats()["bytes"] == 80
+    # Ersetzen zählt den alten Eintrag nicht doppelt
+    cache.put("a", 50)
+    assert cache.stats()["bytes"] == 90 and len(cache) == 2
+    cache.put("c", 30)
+    assert "b" not in cache and cache.stats()["bytes"] == 80
+    # Zu große Werte werden zurückgegeben, aber nicht gespeichert
+    assert cache.put("d", 500) == 500
+    assert "d" not in cache and cache.stats()["bytes"] == 80
+    cache.configure(max_bytes=40)
+    assert list(cache._data) == ["c"] and cache.stats()["bytes"] == 30
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_get_or_create_builds_once():
+    cache = LRUCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_create("key", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_estimate_size_counts_arrays():
+    a = np.zeros(1000)
+    assert estimate_size(a) >= a.nbytes
+    # Gemeinsam referenzierte Objekte zählen nur einmal
+    assert estimate_size([a, a]) < 2 * a.nbytes
+
+
+def test_point_locator_matches_polygon_containment():
+    boundary, obstacles = mapgen.generate_map(600, 600, 10, 60, 6, seed=2)
+    G = build_map_graph(600, 600, obstacles, compute_vertical_lines(600, 600, obstacles))
+    faces = compute_custom_faces_from_graph(G)
+    locator = PointLocator(faces)
+    polygons = [Polygon(face) for face in faces]
+    union = shapely.union_all(obstacles)
+    points = np.random.default_rng(0).uniform(0, 600, size=(500, 2))
+    for x, y in points.tolist():
+        face_id = locator.locate((x, y))
+        if union.contains(shapely.Point(x, y)):
+            assert face_id is None
+        else:
+            assert face_id is not None and polygons[face_id].covers(shapely.Point(x, y))
+
+
+def test_point_locator_outside_and_ids():
+    squares = [[(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)], [(1, 0), (2, 0), (2, 1), (1, 1)]]
+    locator = PointLocator(squares, ids=["a", "b"])
+    assert locator.locate((0.5, 0.5)) == "a"
+    assert locator.locate((1.5, 0.5)) == "b"
+    assert locator.locate((2.0, 0.5)) == "b"
+    assert locator.locate((0.5, 1.5)) is None
+    assert locator.locate((-1, 0.5)) is None
+
+
+def _brute_force_adjacency(cells, tol=1e-2):
+    """Alle Zellpaare, deren Ränder sich auf einer Strecke echter Länge berühren."""
+    pairs = set()
+    for i, a in enumerate(cells):
+        for j, b in enumerate(cells[i + 1:], i + 1):
+            (ax1, ay1, ax2, ay2), (bx1, by1, bx2, by2) = a["bounds"], b["bounds"]
+            if (abs(ax2 - bx1) < tol or abs(bx2 - ax1) < tol) and min(ay2, by2) > max(ay1, by1):
+                pairs.add((a["number"], b["number"]))
+            if (abs(ay2 - by1) < tol or abs(by2 - ay1) < tol) and min(ax2, bx2) > max(ax1, bx1):
+                pairs.add((a["number"], b["number"]))
+    return pairs
+
+
+def test_adjacency_sweep_matches_brute_force():
+    for seed in range(3):
+        boundary, obstacles = mapgen.generate_map(600, 600, 8, 80, 6, seed=seed)
+        tree = LinearQuadtree(600, 600, max_depth=5, min_size=10).build(obstacles)
+        cells, _, _ = tree.cells_and_graph()
+        nodes, links = build_graph_from_grid(cells)
+        assert {(l["source"], l["target"]) for l in links} == _brute_force_adjacency(cells)
+        assert [n["id"] for n in nodes] == list(range(len(cells)))
+        graph = build_graph_from_grid(cells, output="csr")
+        assert {(u, v) for u, v, _ in graph.edges()} == _brute_force_adjacency(cells)
+
+
+def _geometric_graph(seed, n=120, radius=0.18):
+    """Zufälliger geometrischer Graph mit euklidischen Kantengewichten, nicht unbedingt zusammenhängend."""
+    points = np.random.default_rng(seed).uniform(0, 1, size=(n, 2)).tolist()
+    G = nx.Graph()
+    G.add_nodes_from(range(n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            d = math.dist(points[i], points[j])
+            if d < radius:
+                G.add_edge(i, j, weight=d)
+    return G, points
+
+
+def _cost(G, path):
+    return sum(G[u][v]["weight"] for u, v in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_csr_shortest_path_matches_networkx(method):
+    G, points = _geometric_graph(0)
+    graph = CSRGraph.from_networkx(G, position=points.__getitem__)
+    assert sorted((u, v) for u, v, _ in graph.edges()) == sorted(tuple(sorted(e)) for e in G.edges())
+    lengths = dict(nx.all_pairs_dijkstra_path_length(G))
+    neighbors = lambda u: [(v, d["weight"]) for v, d in G[u].items()]
+    for source, target in [(0, 1), (3, 77), (10, 110), (5, 5), (40, 90)]:
+        path, _ = graph.shortest_path(source, target, method=method)
+        plain, _ = shortest_path(neighbors, source, target, points.__getitem__, method=method)
+        if target not in lengths[source]:
+            assert path is None and plain is None
+            continue
+        for found in (path, plain):
+            assert found[0] == source and found[-1] == target
+            assert all(G.has_edge(u, v) for u, v in zip(found, found[1:]))
+            assert _cost(G, found) == pytest.approx(lengths[source][target])
+        assert graph.path_cost(path) == pytest.approx(lengths[source][target])
+
+
+def test_csr_shared_queries_match_single():
+    G, points = _geometric_graph(1)
+    graph = CSRGraph.from_networkx(G, position=points.__getitem__)
+    lengths = dict(nx.all_pairs_dijkstra_path_length(G))
+    pairs = [(0, t) for t in range(0, 120, 7)] + [(3, 50), (3, 60), ("missing", 1)]
+    shared = graph.shortest_paths(pairs, share=True)
+    single = graph.shortest_paths(pairs, share=False, method="bidirectional")
+    for (source, target), (path, cost), (_, single_cost) in zip(pairs, shared, single):
+        expected = lengths.get(source, {}).get(target)
+        if expected is None:
+            assert path is None and cost is None and single_cost is None
+        else:
+            assert cost == pytest.approx(expected) and single_cost == pytest.approx(expected)
+            assert graph.path_cost(path) == pytest.approx(expected)
+
+
+def test_csr_lookup_and_unknown_method():
+    graph = CSRGraph.from_edges(["a", "b"], [("a", "b", 1.0), ("b", "c", 2.0)],
+                                {"a": (0, 0), "b": (1, 0), "c": (3, 0)}.__getitem__)
+    assert graph.keys == ["a", "b", "c"] and len(graph) == 3
+    assert graph.has_edge("c", "b") and not graph.has_edge("a", "c") and not graph.has_edge("a", "x")
+    assert sorted(graph.adjacent("b")) == [("a", 1.0), ("c", 2.0)]
+    assert graph.shortest_path("a", "x") == (None, 0)
+    with pytest.raises(ValueError):
+        graph.shortest_path("a", "c", method="bfs")
+    with pytest.raises(ValueError):
+        shortest_path(lambda u: [], "a", "c", method="bfs")
+
+
+def test_mapgen_seed_is_reproducible():
+    def wkb(seed=None, rng=None):
+        boundary, obstacles = mapgen.generate_map(600, 600, 20, 50, 6, seed=seed, rng=rng)
+        return [o.wkb for o in obstacles]
+
+    first = wkb(seed=7)
+    # Unabhängig vom globalen Zufallszustand
+    random.seed(1)
+    np.random.seed(1)
+    assert wkb(seed=7) == first
+    assert wkb(rng=np.random.default_rng(7)) == first
+    assert wkb(seed=8) != first
+
+
+def test_mapgen_obstacles_are_disjoint_and_convex():
+    boundary, obstacles = mapgen.generate_map(600, 600, 40, 50, 6, seed=3)
+    assert boundary.bounds == (0, 0, 600, 600)
+    assert len(obstacles) == 40
+    assert all(o.is_valid and o.convex_hull.area == pytest.approx(o.area) for o in obstacles)
+    tree = shapely.STRtree(obstacles)
+    i, j = tree.query(obstacles, predicate="intersects")
+    assert (i == j).all()
+    # Ohne Verwerfen dürfen sich Hindernisse überlappen, die Anzahl stimmt trotzdem
+    boundary, overlapping = mapgen.generate_map(600, 600, 40, 50, 6, seed=3, reject_overlaps=False)
+    assert len(overlapping) == 40
+
+
+def test_store_arrays_round_trip(tmp_path):
+    arrays = {"a": np.arange(10, dtype=np.int32), "b": np.eye(3), "empty": np.zeros((0, 2)),
+              "flags": np.array([True, False])}
+    path = str(tmp_path / "entry.plst")
+    store.write_arrays(path, arrays, {"note": "x"})
+    loaded, meta = store.read_arrays(path)
+    assert meta == {"note": "x"}
+    assert set(loaded) == set(arrays)
+    for name, a in arrays.items():
+        assert loaded[name].dtype == a.dtype and loaded[name].shape == a.shape
+        assert (loaded[name] == a).all()
+    with pytest.raises(ValueError):
+        store.write_arrays(path, {"objects": np.array([None, 1], dtype=object)})
+
+
+@pytest.mark.parametrize("keys", ["numbers", "tuples"])
+def test_pack_csr_round_trip(keys):
+    G, points = _geometric_graph(2, n=40, radius=0.3)
+    if keys == "tuples":
+        G = nx.relabel_nodes(G, lambda i: tuple(points[i]))
+        graph = CSRGraph.from_networkx(G, position=lambda p: p)
+    else:
+        graph = CSRGraph.from_networkx(G, position=points.__getitem__)
+    restored = store.unpack_csr(store.pack_csr(graph, "g_"), "g_")
+    assert restored.keys == graph.keys
+    assert sorted(restored.edges()) == sorted(graph.edges())
+    assert (restored.coords == graph.coords).all()
+
+
+def test_pack_ragged_and_geometries_round_trip():
+    rows = [[(0.0, 1.0), (2.0, 3.0)], [], [(4.5, 5.5)]]
+    assert store.unpack_ragged(store.pack_ragged(rows, "r_"), "r_") == rows
+    assert store.unpack_ragged(store.pack_ragged([], "r_"), "r_") == []
+    boundary, obstacles = mapgen.generate_map(300, 300, 5, 40, 6, seed=1)
+    geoms = obstacles + [Polygon([(0, 0), (9, 0), (9, 9), (0, 9)], [[(3, 3), (3, 6), (6, 6), (6, 3)]])]
+    restored = store.unpack_geometries(store.pack_geometries(geoms, "o_"), "o_")
+    assert [g.wkb for g in restored] == [g.wkb for g in geoms]
+    assert store.unpack_geometries(store.pack_geometries([], "o_"), "o_") == []
+
+
+@pytest.fixture
+def decomposition_store(tmp_path):
+    store.decomposition_store.configure(str(tmp_path))
+    map_cache.clear()
+    yield store.decomposition_store
+    store.decomposition_store.configure(None)
+    map_cache.clear()
+
+
+def test_store_get_or_create_loads_after_cache_clear(decomposition_store):
+    calls = []
+
+    def build():
+        calls.append("build")
+        return {"values": np.arange(1000.0)}
+
+    def encode(entry):
+        return {"values": entry["values"]}, {"count": len(entry["values"])}
+
+    def decode(arrays, meta):
+        calls.append(("decode", meta["count"]))
+        return {"values": arrays["values"]}
+
+    key = ("test", "values", 1)
+    first = store.get_or_create(key, build, encode, decode)
+    map_cache.clear()
+    second = store.get_or_create(key, build, encode, decode)
+    assert calls == ["build", ("decode", 1000)]
+    assert (second["values"] == first["values"]).all()
+    # Per memmap geladene Arrays zählen im Cache nicht zum Heap
+    assert estimate_size(second["values"]) < second["values"].nbytes
+    assert decomposition_store.stats()["saves"] == 1 and decomposition_store.stats()["loads"] == 1
+
+
+def test_store_skips_unreadable_files(decomposition_store):
+    key = ("test", "broken")
+    with open(decomposition_store.path(key), "wb") as f:
+        f.write(b"not a store file")
+    assert decomposition_store.load(key) is None
+    assert decomposition_store.stats()["errors"] == 1
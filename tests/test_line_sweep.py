@@ -0,0 +1,71 @@
+import math
+
+import networkx as nx
+import pytest
+import shapely
+from shapely.geometry import LineString, Polygon, box
+
+from common import mapgen
+from common.csr import CSRGraph
+from common.spatial import KDTree
+from line_sweep.dcel import DCEL
+from line_sweep.utils import (
+    build_map_graph, compute_custom_faces_from_graph, compute_vertical_lines, snap_to_map_node,
+)
+
+
+def _map_graph(seed, num_obstacles=12, max_radius=60):
+    boundary, obstacles = mapgen.generate_map(600, 600, num_obstacles, max_radius, 6, seed=seed)
+    G = build_map_graph(600, 600, obstacles, compute_vertical_lines(600, 600, obstacles))
+    return obstacles, G
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_faces_tile_free_space(seed):
+    # Seeds 30 und 34 enthielten Fast-Duplikat-Knoten, die zwei Faces zu einem verbanden
+    obstacles, G = _map_graph(seed)
+    faces = [Polygon(face) for face in compute_custom_faces_from_graph(G)]
+    assert all(face.is_valid for face in faces)
+    free = box(0, 0, 600, 600).difference(shapely.union_all(obstacles))
+    # Die Koordinaten sind auf 5 Nachkommastellen gerundet
+    assert sum(face.area for face in faces) == pytest.approx(free.area, abs=1e-2)
+
+
+def test_dcel_square_with_diagonal():
+    G = nx.Graph([((0, 0), (2, 0)), ((2, 0), (2, 2)), ((2, 2), (0, 2)), ((0, 2), (0, 0)), ((0, 0), (2, 2))])
+    dcel = DCEL(G)
+    areas = sorted(dcel.signed_area(f) for f in range(len(dcel.cycles)))
+    # Zwei Dreiecke und das äußere Face mit negativer Fläche
+    assert areas == [-4, 2, 2]
+    lower, upper = dcel.face_of((0, 0), (2, 0)), dcel.face_of((2, 2), (0, 2))
+    assert lower != upper
+    # Die Diagonale trennt beide Dreiecke, je nach Richtung
+    assert {dcel.face_of((0, 0), (2, 2)), dcel.face_of((2, 2), (0, 0))} == {lower, upper}
+    assert dcel.face_vertices(lower, start=((0, 0), (2, 0))) == [(0, 0), (2, 0), (2, 2), (0, 0)]
+    outer = dcel.face_of((2, 0), (0, 0))
+    assert dcel.signed_area(outer) == -4
+
+
+def test_map_graph_has_no_near_duplicate_nodes():
+    obstacles, G = _map_graph(30)
+    nodes = sorted(G.nodes())
+    assert not [(a, b) for a, b in zip(nodes, nodes[1:]) if math.dist(a, b) < 1e-4]
+
+
+def test_snap_to_map_node_never_crosses_obstacles():
+    obstacles, G = _map_graph(5)
+    graph = CSRGraph.from_networkx(G, position=lambda p: p)
+    index = KDTree(graph.coords)
+    union = shapely.union_all(obstacles)
+    detours = 0
+    for x in range(15, 600, 30):
+        for y in range(15, 600, 30):
+            node = snap_to_map_node((x, y), index, graph.keys, obstacles)
+            if union.contains(shapely.Point(x, y)):
+                assert node is None
+                continue
+            assert node is not None
+            assert not shapely.relate_pattern(LineString([(x, y), node]), union, "T********")
+            detours += node != graph.keys[index.nearest((x, y))]
+    # Auf dieser Karte liegt für einige Punkte der nächste Knoten hinter einem Hindernis
+    assert detours
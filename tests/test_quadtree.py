@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+from shapely.geometry import Polygon, box
+
+from common import mapgen
+from common.adjacency import build_graph_from_grid
+from common.spatial import KDTree
+from quadtree.kernels import FREE, FULL, MIXED, ObstructionKernel
+from quadtree.linear import LinearQuadtree
+from quadtree.utils import snap_to_free_cell
+
+
+def _wall_tree():
+    # 4 x 4 Zellen à 100; die Wand blockiert die zweite Spalte (x 100 bis 200)
+    obstacles = [box(112, 0, 120, 400)]
+    tree = LinearQuadtree(400, 400, max_depth=2, min_size=20).build(obstacles)
+    graph = tree.free_graph()
+    return tree, KDTree(graph.coords), graph, obstacles
+
+
+def test_snap_widens_past_hidden_candidates():
+    tree, index, graph, obstacles = _wall_tree()
+    # Die beiden nächsten freien Mittelpunkte liegen hinter der Wand, erst (300, 100) ist sichtbar
+    node = snap_to_free_cell((130, 50), tree, index, graph.keys, obstacles, k=1)
+    assert node is not None
+    assert tuple(index.points[graph.keys.index(node)]) == (300, 100)
+
+
+def test_snap_inside_obstacle():
+    tree, index, graph, obstacles = _wall_tree()
+    assert snap_to_free_cell((115, 50), tree, index, graph.keys, obstacles) is None
+
+
+def _random_tree(seed):
+    boundary, obstacles = mapgen.generate_map(600, 600, 8, 80, 6, seed=seed)
+    return LinearQuadtree(600, 600, max_depth=6, min_size=5).build(obstacles), obstacles
+
+
+def test_leaves_tile_workspace_and_locate():
+    tree, obstacles = _random_tree(1)
+    x1, y1, x2, y2 = tree.cell_bounds(tree.codes, tree.depths)
+    assert ((x2 - x1) * (y2 - y1)).sum() == pytest.approx(600 * 600)
+    for x, y in np.random.default_rng(0).uniform(0, 600, size=(300, 2)).tolist():
+        k = tree.locate((x, y))
+        assert x1[k] <= x < x2[k] and y1[k] <= y < y2[k]
+    assert tree.locate((600, 600)) == len(tree) - 1
+    assert tree.locate((-1, 10)) is None and tree.locate((10, 601)) is None
+
+
+def test_neighbor_pairs_match_cell_adjacency():
+    for seed in range(3):
+        tree, obstacles = _random_tree(seed)
+        cells, nodes, links = tree.cells_and_graph()
+        expected = {(i, j) for i, j, _ in build_graph_from_grid(cells, output="csr").edges()}
+        pairs = tree._neighbor_pairs()
+        assert {(i, j) for i, j, _ in pairs.tolist()} == expected
+        # Jede Nachbarschaft genau einmal, Achse 0 für eine gemeinsame senkrechte Kante
+        assert len(pairs) == len(expected)
+        for i, j, axis in pairs.tolist():
+            a, b = cells[i]["bounds"], cells[j]["bounds"]
+            assert a[2 + axis] == b[axis] or b[2 + axis] == a[axis]
+        free = {(l["source"], l["target"]) for l in links}
+        assert free == {(i, j) for i, j in expected if not tree.obstructed[i] and not tree.obstructed[j]}
+
+
+def test_high_max_depth_is_capped_by_min_size():
+    obstacles = [box(250, 250, 350, 350)]
+    tree = LinearQuadtree(600, 600, max_depth=31, min_size=20).build(obstacles)
+    assert tree.max_depth == 5
+    start, goal = tree.locate((50, 300)), tree.locate((550, 300))
+    assert start != goal
+    assert not tree.obstructed[start] and not tree.obstructed[goal]
+
+
+def test_negative_max_depth_rejected():
+    with pytest.raises(ValueError):
+        LinearQuadtree(600, 600, max_depth=-1)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_depth_zero_is_single_cell(workers):
+    tree = LinearQuadtree(600, 600, max_depth=0).build([box(250, 250, 350, 350)], workers=workers)
+    assert len(tree) == 1
+    assert tree.obstructed.tolist() == [True]
+
+
+@pytest.mark.parametrize("workers, split_depth", [(1, 2), (2, 1), (2, 2), (2, 3)])
+def test_emitted_pairs_match_probe(workers, split_depth):
+    for seed in range(5):
+        boundary, obstacles = mapgen.generate_map(600, 600, 8, 80, 6, seed=seed)
+        tree = LinearQuadtree(600, 600, max_depth=6, min_size=5).build(
+            obstacles, workers=workers, split_depth=split_depth)
+        assert tree.pairs.tolist() == tree._probe_pairs().tolist()
+
+
+def _reference_state(cell, obstacles):
+    if any(o.covers(cell) for o in obstacles):
+        return FULL
+    if any(o.intersects(cell) for o in obstacles):
+        return MIXED
+    return FREE
+
+
+def test_obstruction_kernel_matches_shapely():
+    boundary, obstacles = mapgen.generate_map(600, 600, 8, 80, 6, seed=4)
+    # Ein nicht-konvexes Hindernis für den Shapely-Pfad
+    obstacles.append(Polygon([(20, 20), (200, 20), (200, 60), (60, 60), (60, 200), (20, 200)]))
+    rng = np.random.default_rng(1)
+    x1, y1 = rng.uniform(0, 560, size=(2, 2000))
+    size = rng.uniform(1, 40, size=2000)
+    states = ObstructionKernel(obstacles, max_elements=64).classify(x1, y1, x1 + size, y1 + size)
+    expected = [_reference_state(box(a, b, a + d, b + d), obstacles)
+                for a, b, d in zip(x1.tolist(), y1.tolist(), size.tolist())]
+    assert states.tolist() == expected
+    assert {FREE, MIXED, FULL} <= set(expected)
+
+
+def test_obstruction_kernel_edge_cases():
+    square = box(100, 100, 200, 200)
+    kernel = ObstructionKernel([square])
+    x1, y1, x2, y2 = (np.array(v, dtype=float) for v in zip(
+        (0, 0, 50, 50),        # frei
+        (100, 100, 200, 200),  # deckungsgleich: voll
+        (200, 120, 250, 180),  # berührt nur den Rand: gemischt wie bei intersects
+        (150, 150, 250, 250),  # teilweise
+    ))
+    assert kernel.classify(x1, y1, x2, y2).tolist() == [FREE, FULL, MIXED, MIXED]
+    assert ObstructionKernel([]).classify(x1, y1, x2, y2).tolist() == [FREE] * 4
+    assert kernel.candidates(0, 0, 50, 50) == [] and kernel.candidates(0, 0, 150, 150) == [0]
@@ -0,0 +1,243 @@
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import app
+from common import store
+from common.cache import map_cache
+from common.fields import select_fields
+from common.jobs import JobManager
+from line_sweep.routes import JOB_PHASES
+from visibility.utils import generate_map
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_visibility_unknown_method(client):
+    response = client.get("/visibility/graph_data_visibility?seed=1&method=bogus")
+    assert response.status_code == 400
+    assert "bogus" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("url", [
+    "/visibility/graph_data_visibility?seed=1&search=bogus",
+    "/visibility/graph_data_visibility?seed=1&search=bogus&method=naive",
+    "/quadtree/graph_data_quadtree?seed=1&search=bogus",
+    "/line_sweep/graph_data_line_sweep_random?seed=1&search=bogus",
+])
+def test_unknown_search_method(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert "bogus" in response.get_json()["error"]
+
+
+def test_line_sweep_job_rejects_unknown_search(client):
+    response = client.post("/line_sweep/jobs", json={"seed": 1, "search": "bogus"})
+    assert response.status_code == 400
+    assert "bogus" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("url, body", [
+    ("/visibility/batch_paths", {"reduced": "false"}),
+    ("/visibility/batch_paths", {"share": "false"}),
+    ("/quadtree/batch_paths", {"share": 0}),
+])
+def test_batch_flags_require_json_booleans(client, url, body):
+    body = dict(body, seed=1, queries=[[10, 10, 590, 590]])
+    response = client.post(url, json=body)
+    assert response.status_code == 400
+    assert "true oder false" in response.get_json()["error"]
+
+
+def _get(url):
+    response = app.test_client().get(url)
+    return response.status_code, response.get_data()
+
+
+def test_parallel_requests_match_serial():
+    # Start im Inneren eines Hindernisses: wird aus dem Zufallsstrom der Anfrage verschoben
+    boundary, obstacles = generate_map(600, 600, 15, 60, 6, seed=3)
+    inside = obstacles[0].centroid
+    urls = [f"/visibility/graph_data_visibility?seed=3&num_obstacles=15&obstacle_size=60"
+            f"&start_x={inside.x}&start_y={inside.y}&method={method}"
+            for method in ("sweep", "vectorized", "naive")]
+    for seed in range(4):
+        urls += [
+            f"/visibility/graph_data_visibility?seed={seed}&num_obstacles=15&obstacle_size=60&start_x=300&start_y=300",
+            f"/line_sweep/graph_data_line_sweep_random?seed={seed}&num_obstacles=8",
+            f"/quadtree/graph_data_quadtree?seed={seed}&num_obstacles=8",
+        ]
+    serial = [_get(url) for url in urls]
+    assert all(status == 200 for status, _ in serial)
+    start = json.loads(serial[0][1])["start"]
+    assert (start["x"], start["y"]) != (inside.x, inside.y)
+
+    for round_ in range(2):
+        map_cache.clear()
+        order = random.Random(round_).sample(range(len(urls)), len(urls))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            parallel = dict(zip(order, pool.map(lambda i: _get(urls[i]), order)))
+        assert [parallel[i] for i in range(len(urls))] == serial
+
+
+def test_uploaded_holes_in_obstacles_section(client):
+    ring = [[100, 100], [300, 100], [300, 300], [100, 300], [100, 100]]
+    hole = [[150, 150], [150, 250], [250, 250], [250, 150], [150, 150]]
+    upload = client.post("/maps?format=geojson&width=400&height=400",
+                         json={"type": "Polygon", "coordinates": [ring, hole]})
+    assert upload.status_code == 201
+    map_id = upload.get_json()["map_id"]
+    for url in (f"/visibility/graph_data_visibility?map_id={map_id}&fields=obstacles",
+                f"/visibility/graph_data_visibility?map_id={map_id}&fields=obstacles&method=naive",
+                f"/line_sweep/graph_data_line_sweep_random?map_id={map_id}&fields=obstacles",
+                f"/quadtree/graph_data_quadtree?map_id={map_id}&fields=obstacles"):
+        data = client.get(url).get_json()
+        assert len(data["obstacles"]) == 1
+        holes = data["obstacle_holes"]
+        assert len(holes) == 1 and len(holes[0]) == 1
+        assert sorted(map(tuple, holes[0][0])) == [(150, 150), (150, 250), (250, 150), (250, 250)]
+
+
+def test_line_sweep_map_path_from_inside_obstacle(client):
+    upload = client.post("/maps?format=geojson&width=400&height=400",
+                         json={"type": "Polygon", "coordinates": [[[100, 100], [300, 100], [300, 300],
+                                                                   [100, 300], [100, 100]]]})
+    map_id = upload.get_json()["map_id"]
+    url = f"/line_sweep/graph_data_line_sweep_random?map_id={map_id}&mode=path&start_y=200&goal_x=350&goal_y=200"
+    assert client.get(url + "&start_x=200").get_json()["map_path"] == []
+    assert client.get(url + "&start_x=50").get_json()["map_path"]
+    batch = client.post("/line_sweep/batch_paths", json={"map_id": map_id, "queries": [[200, 200, 350, 200]]})
+    assert batch.get_json()["results"][0]["map_path"] is None
+
+
+@pytest.mark.parametrize("max_depth", [-1, 32, 40])
+def test_quadtree_rejects_max_depth_out_of_range(client, max_depth):
+    response = client.get(f"/quadtree/graph_data_quadtree?seed=1&max_depth={max_depth}")
+    assert response.status_code == 400
+    response = client.post("/quadtree/batch_paths", json={"seed": 1, "max_depth": max_depth,
+                                                          "queries": [[50, 300, 550, 300]]})
+    assert response.status_code == 400
+
+
+def test_quadtree_high_max_depth_matches_capped(client):
+    paths = [client.get(f"/quadtree/graph_data_quadtree?seed=1&mode=path&max_depth={d}").get_json()["path"]
+             for d in (5, 31)]
+    assert len(paths[0]) > 1
+    assert paths[0] == paths[1]
+
+
+# Abschnitte je Route, die fields= bzw. mode=path ein- und ausschalten
+SECTIONS = {
+    "/visibility/graph_data_visibility": {"nodes", "links", "path", "obstacles", "obstacle_holes"},
+    "/line_sweep/graph_data_line_sweep_random": {"obstacles", "obstacle_holes", "map_graph", "faces",
+                                                 "face_graph", "face_path", "map_path"},
+    "/quadtree/graph_data_quadtree": {"obstacles", "obstacle_holes", "cells", "graph", "path"},
+}
+
+
+@pytest.mark.parametrize("route", sorted(SECTIONS))
+def test_fields_and_path_mode(client, route):
+    full = client.get(f"{route}?seed=2").get_json()
+    assert SECTIONS[route] <= set(full)
+    metadata = set(full) - SECTIONS[route]
+
+    path = client.get(f"{route}?seed=2&mode=path").get_json()
+    path_sections = {key for key in SECTIONS[route] if key.endswith("path")}
+    assert set(path) == metadata | path_sections
+    # Gleicher Pfad wie in der vollen Antwort
+    assert {key: path[key] for key in path_sections} == {key: full[key] for key in path_sections}
+
+    obstacles = client.get(f"{route}?seed=2&fields=obstacles").get_json()
+    assert set(obstacles) == metadata | {"obstacles", "obstacle_holes"}
+    assert obstacles["obstacles"] == full["obstacles"]
+
+    for query in ("fields=bogus", "fields=obstacles,bogus", "mode=bogus"):
+        response = client.get(f"{route}?seed=2&{query}")
+        assert response.status_code == 400
+        assert "bogus" in response.get_json()["error"]
+
+
+def test_select_fields():
+    sections, path_sections = ("a", "b", "path"), ("path",)
+    assert select_fields({}, sections, path_sections) == {"a", "b", "path"}
+    assert select_fields({"mode": "path"}, sections, path_sections) == {"path"}
+    # fields= hat Vorrang vor mode=, Leerzeichen und leere Einträge werden ignoriert
+    assert select_fields({"fields": " a, ,b", "mode": "path"}, sections, path_sections) == {"a", "b"}
+    with pytest.raises(ValueError):
+        select_fields({"fields": "c"}, sections, path_sections)
+
+
+@pytest.mark.parametrize("url", [
+    "/visibility/graph_data_visibility?seed=4&start_x=300&start_y=300",
+    "/line_sweep/graph_data_line_sweep_random?seed=4",
+    "/quadtree/graph_data_quadtree?seed=4&num_obstacles=8",
+])
+def test_store_round_trip_gives_same_response(client, tmp_path, url):
+    store.decomposition_store.configure(str(tmp_path))
+    try:
+        map_cache.clear()
+        built = client.get(url).get_data()
+        assert store.decomposition_store.stats()["saves"] >= 1
+        # Ohne Cache-Eintrag kommt die Zerlegung aus dem Store
+        map_cache.clear()
+        loads = store.decomposition_store.stats()["loads"]
+        assert client.get(url).get_data() == built
+        assert store.decomposition_store.stats()["loads"] > loads
+    finally:
+        store.decomposition_store.configure(None)
+        map_cache.clear()
+
+
+def _wait_for_job(client, status_url, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        status = client.get(status_url).get_json()
+        if status["status"] in ("done", "failed") or time.time() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+def test_line_sweep_job_lifecycle(client):
+    query = "seed=6&num_obstacles=8&start_x=10&start_y=10&goal_x=590&goal_y=590"
+    response = client.post(f"/line_sweep/jobs?{query}")
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job["status"] in ("queued", "running") and response.headers["Location"] == job["status_url"]
+    assert job["phases"] == list(JOB_PHASES) and 0 <= job["progress"] < 1
+
+    status = _wait_for_job(client, job["status_url"])
+    assert status["status"] == "done" and status["error"] is None
+    assert status["progress"] == 1.0 and status["running_seconds"] >= 0
+    result = client.get(job["result_url"])
+    assert result.status_code == 200
+    assert result.get_json() == client.get(f"/line_sweep/graph_data_line_sweep_random?{query}").get_json()
+
+
+def test_line_sweep_job_unknown_and_invalid(client):
+    assert client.get("/line_sweep/jobs/nope").status_code == 404
+    assert client.get("/line_sweep/jobs/nope/result").status_code == 404
+    assert client.post("/line_sweep/jobs", json=[1, 2]).status_code == 400
+    assert client.post("/line_sweep/jobs", json={"map_id": "missing"}).status_code == 404
+
+
+def test_job_manager_reports_failures():
+    manager = JobManager(workers=1, max_finished=1)
+    # math.sqrt(task, report) scheitert am zweiten Argument
+    failing = manager.submit(math.sqrt, -1)
+    # Der Fehler erscheint im Status, das Ergebnis bleibt None
+    deadline = time.time() + 60
+    while manager.status(failing)["status"] not in ("done", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+    status = manager.status(failing)
+    assert status["status"] == "failed" and "TypeError" in status["error"]
+    assert manager.result(failing) is None and status["progress"] == 0.0
+    assert manager.stats()["failed"] == 1
+    with pytest.raises(KeyError):
+        manager.status("unknown")
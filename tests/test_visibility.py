@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import LineString, Polygon
+from shapely.ops import unary_union
+
+from common import mapgen
+from visibility.kernels import pack_edges, pair_blocks, vectorized_visibility_edges, visibility_matrix
+from visibility.sweep import VisibilitySweep, polygon_rings
+from visibility.utils import generate_map, construct_visibility_graph
+
+
+def _enters_obstacle(edge, union):
+    """Verläuft die Strecke durch das Innere der Hindernisvereinigung?"""
+    return shapely.relate_pattern(LineString(edge), union, "T********")
+
+
+def test_sweep_overlapping_obstacles():
+    # Seeds, auf denen ein anderes Hindernis eine Polygonseite teilweise verdeckt
+    for seed in (46, 57):
+        boundary, obstacles = generate_map(600, 600, 25, 50, 6, seed=seed)
+        union = unary_union(obstacles)
+        edges = VisibilitySweep(obstacles).visibility_edges()
+        assert edges
+        assert not [e for e in edges if _enters_obstacle(e, union)]
+
+
+def test_sweep_vertex_just_below_ray():
+    # Stern, dessen Eckpunkt (236.60…, 199.71…64) um 3e-14 unter dem +x-Strahl von
+    # (208.88…, 199.71…66) liegt; sein Winkel darf nicht auf 0 umgeklappt werden
+    star = Polygon([
+        (262.74401157885075, 205.450481779933), (236.60220456652004, 211.19073326540934),
+        (251.02828282631265, 233.7347530273949), (228.48426306432708, 219.3086747676023),
+        (222.74401157885075, 245.450481779933), (217.0037600933744, 219.3086747676023),
+        (194.45974033138884, 233.7347530273949), (208.88581859118145, 211.19073326540934),
+        (182.74401157885075, 205.450481779933), (208.88581859118145, 199.71023029445666),
+        (194.45974033138884, 177.1662105324711), (217.00376009337438, 191.5922887922637),
+        (222.74401157885075, 165.450481779933), (228.4842630643271, 191.5922887922637),
+        (251.02828282631265, 177.1662105324711), (236.60220456652004, 199.71023029445664),
+    ])
+    edges = VisibilitySweep([star]).visibility_edges()
+    assert edges
+    assert not [e for e in edges if _enters_obstacle(e, star)]
+
+
+def _edge_set(G, sides):
+    return {frozenset(e) for e in G.edges()} - sides
+
+
+def test_vectorized_matches_naive():
+    # Polygonseiten werden ausgenommen: der naive Builder verliert sie, wenn interpolierte
+    # Abtastpunkte numerisch knapp innerhalb des Polygons landen
+    start, goal = (5.0, 5.0), (295.0, 295.0)
+    for generate in (generate_map, mapgen.generate_map):
+        for seed in range(10):
+            boundary, obstacles = generate(300, 300, 8, 40, 6, seed=seed)
+            sides = {frozenset((ring[k - 1], ring[k])) for obs in obstacles
+                     for ring in polygon_rings(obs) for k in range(len(ring))}
+            naive = _edge_set(construct_visibility_graph(obstacles, start, goal, method="naive"), sides)
+            for method in ("vectorized", "sweep"):
+                assert _edge_set(construct_visibility_graph(obstacles, start, goal, method=method), sides) == naive
+
+
+def test_vectorized_segment_through_vertex():
+    # Die Diagonale (20, 20)-(150, 150) berührt die Ecken (100, 100) und (130, 130) und verläuft
+    # dazwischen durch das L – ohne echten Kantenschnitt
+    obstacle = Polygon([(100, 100), (300, 100), (300, 130), (130, 130), (130, 300), (100, 300)])
+    edges = {frozenset(e) for e in vectorized_visibility_edges([obstacle], extra=((20, 20), (150, 150)))}
+    assert frozenset(((20, 20), (150, 150))) not in edges
+    assert frozenset(((100.0, 100.0), (150, 150))) not in edges
+    assert frozenset(((130.0, 130.0), (20, 20))) not in edges
+    assert frozenset(((100.0, 100.0), (20, 20))) in edges
+
+
+@pytest.mark.parametrize("n, max_pairs", [(0, 5), (1, 5), (2, 1), (7, 1), (7, 4), (30, 50), (30, 1000)])
+def test_pair_blocks_cover_upper_triangle(n, max_pairs):
+    blocks = list(pair_blocks(n, max_pairs))
+    # Höchstens max_pairs Paare je Block, außer eine einzelne Zeile ist schon länger
+    assert all(len(i) <= max(max_pairs, n - 1 - i[0]) for i, j in blocks)
+    i = np.concatenate([i for i, j in blocks]) if blocks else np.zeros(0, int)
+    j = np.concatenate([j for i, j in blocks]) if blocks else np.zeros(0, int)
+    expected_i, expected_j = np.triu_indices(n, k=1)
+    assert i.tolist() == expected_i.tolist() and j.tolist() == expected_j.tolist()
+
+
+def test_vectorized_small_blocks_match():
+    boundary, obstacles = generate_map(300, 300, 8, 40, 6, seed=3)
+    full = set(vectorized_visibility_edges(obstacles))
+    assert set(vectorized_visibility_edges(obstacles, max_elements=50)) == full
+    assert set(vectorized_visibility_edges(obstacles, reduced=True, max_elements=50)) <= full
+
+
+def test_visibility_matrix():
+    square = Polygon([(100, 100), (200, 100), (200, 200), (100, 200)])
+    points = [(50, 150), (250, 150), (150, 50), (150, 250)]
+    visible = visibility_matrix(points, pack_edges([square]), max_elements=8)
+    assert visible.dtype == bool and visible.shape == (4, 4)
+    # Links-rechts und unten-oben laufen durch das Quadrat, die übrigen Paare daran vorbei
+    assert not visible[0, 1] and not visible[2, 3]
+    assert visible[0, 2] and visible[2, 0] and visible[1, 3]
+    assert not visible.diagonal().any()
@@ -0,0 +1,204 @@
+import numpy as np
+import shapely
+from shapely.ops import unary_union
+
+from .sweep import polygon_rings
+
+# Toleranz für Orientierungstests (Flächeninhalt des Dreiecks)
+_EPS = 1e-9
+# Toleranz für Streckenparameter (Berührpunkte an den Enden zählen nicht)
+_T_EPS = 1e-9
+
+
+def pack_edges(obstacles):
+    """Alle Hinderniskanten als zusammenhängendes (E, 4)-Array [ax, ay, bx, by]."""
+    rows = []
+    for obs in obstacles:
+        for ring in polygon_rings(obs):
+            for i in range(len(ring)):
+                a, b = ring[i], ring[(i + 1) % len(ring)]
+                if a != b:
+                    rows.append((a[0], a[1], b[0], b[1]))
+    return np.ascontiguousarray(np.array(rows, dtype=float).reshape(-1, 4))
+
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    """Vorzeichen des Orientierungstests (b - a) x (c - a) mit Toleranz, elementweise."""
+    area = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return np.where(area > _EPS, 1, np.where(area < -_EPS, -1, 0)).astype(np.int8)
+
+
+def pair_blocks(n, max_pairs):
+    """
+    Alle Indexpaare (i, j) mit i < j < n, blockweise über aufeinanderfolgende Zeilen i mit je
+    höchstens max_pairs Paaren (mindestens einer Zeile). So liegt nie die ganze obere
+    Dreiecksmatrix als Indexarray im Speicher.
+    """
+    lo = 0
+    while lo < n - 1:
+        hi, count = lo + 1, n - 1 - lo
+        while hi < n - 1 and count + (n - 1 - hi) <= max_pairs:
+            count += n - 1 - hi
+            hi += 1
+        rows = np.arange(lo, hi)
+        lengths = n - 1 - rows
+        i = np.repeat(rows, lengths)
+        j = i + 1 + np.arange(count) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        yield i, j
+        lo = hi
+
+
+def blocked_segments(p, q, edges, union=None, max_elements=1_000_000):
+    """
+    Prüft für jede Strecke p[k]-q[k], ob sie durch ein Hindernis verläuft. Ein echter Schnitt mit
+    einer Hinderniskante blockiert immer. Berührt die Strecke Kanten nur (ein Kanteneckpunkt liegt
+    im Inneren der Strecke, auch bei kollinearem Verlauf), wird sie an diesen Stellen geteilt und
+    blockiert, wenn der Mittelpunkt eines Teilstücks im Inneren von union (Vereinigung aller
+    Hindernisse) liegt; ohne union blockieren Berührungen nicht. Die Paare werden in Blöcken
+    verarbeitet, damit das Zwischenergebnis (Block x E) höchstens max_elements Einträge hat.
+    """
+    n = len(p)
+    blocked = np.zeros(n, dtype=bool)
+    if n == 0 or len(edges) == 0:
+        return blocked
+    ax, ay, bx, by = (edges[:, k][None, :] for k in range(4))
+    chunk = max(1, max_elements // len(edges))
+    for lo in range(0, n, chunk):
+        hi = min(n, lo + chunk)
+        px, py = p[lo:hi, 0:1], p[lo:hi, 1:2]
+        qx, qy = q[lo:hi, 0:1], q[lo:hi, 1:2]
+        d1 = _orientation(px, py, qx, qy, ax, ay)
+        d2 = _orientation(px, py, qx, qy, bx, by)
+        d3 = _orientation(ax, ay, bx, by, px, py)
+        d4 = _orientation(ax, ay, bx, by, qx, qy)
+        proper = (d1 * d2 < 0) & (d3 * d4 < 0)
+        blocked[lo:hi] = proper.any(axis=1)
+        if union is None:
+            continue
+
+        # Berührungen: Kanteneckpunkte auf der Strecke, als Parameter t in (0, 1) entlang p-q
+        # (nur für die wenigen kollinearen Einträge berechnet)
+        dx, dy = (qx - px)[:, 0], (qy - py)[:, 0]
+        length2 = np.maximum(dx * dx + dy * dy, _EPS)
+        rows, ts = [], []
+        for cx, cy, d in ((ax[0], ay[0], d1), (bx[0], by[0], d2)):
+            r, e = np.nonzero(d == 0)
+            t = ((cx[e] - px[r, 0]) * dx[r] + (cy[e] - py[r, 0]) * dy[r]) / length2[r]
+            touch = (t > _T_EPS) & (t < 1 - _T_EPS) & ~blocked[lo + r]
+            rows.append(r[touch])
+            ts.append(t[touch])
+        rows = np.concatenate(rows)
+        if not len(rows):
+            continue
+        # Teilstücke zwischen aufeinanderfolgenden Berührungen (mit 0 und 1) je Strecke
+        touched = np.unique(rows)
+        rows = np.concatenate([rows, touched, touched])
+        ts = np.concatenate(ts + [np.zeros(len(touched)), np.ones(len(touched))])
+        order = np.lexsort((ts, rows))
+        rows, ts = rows[order], ts[order]
+        piece = (rows[1:] == rows[:-1]) & (ts[1:] - ts[:-1] > _T_EPS)
+        r = rows[1:][piece]
+        mid = (ts[1:][piece] + ts[:-1][piece]) / 2
+        mx = p[lo + r, 0] + mid * (q[lo + r, 0] - p[lo + r, 0])
+        my = p[lo + r, 1] + mid * (q[lo + r, 1] - p[lo + r, 1])
+        inside = shapely.contains_xy(union, mx, my)
+        blocked[lo + np.unique(r[inside])] = True
+    return blocked
+
+
+def visibility_matrix(points, edges, union=None, max_elements=1_000_000):
+    """
+    Boolesche (N, N)-Sichtbarkeitsmatrix für alle Punktpaare gegen die gepackten Kanten
+    (Blockierung wie blocked_segments). Diagonalen durch das eigene Polygon werden nicht
+    gesondert ausgeschlossen.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    visible = np.zeros((len(points), len(points)), dtype=bool)
+    for i, j in pair_blocks(len(points), max(1, max_elements // max(1, len(edges)))):
+        ok = ~blocked_segments(points[i], points[j], edges, union=union, max_elements=max_elements)
+        visible[i[ok], j[ok]] = True
+        visible[j[ok], i[ok]] = True
+    return visible
+
+
+def tangent_pairs(coords, prev, nxt, i, j):
+    """
+    Maske der Paare (i, j), deren Verbindungsgerade an beiden Enden tangential ist,
+    d.h. Vorgänger und Nachfolger im Polygonring liegen auf derselben Seite.
+    Punkte ohne Nachbarn (NaN, z.B. Start/Ziel) gelten immer als tangential.
+    """
+    mask = np.ones(len(i), dtype=bool)
+    for a, b in ((i, j), (j, i)):
+        px, py = coords[a, 0], coords[a, 1]
+        qx, qy = coords[b, 0], coords[b, 1]
+        o1 = _orientation(px, py, qx, qy, prev[a, 0], prev[a, 1])
+        o2 = _orientation(px, py, qx, qy, nxt[a, 0], nxt[a, 1])
+        mask &= (o1 * o2) >= 0
+    return mask
+
+
+def vectorized_visibility_edges(obstacles, extra=(), reduced=False, max_elements=1_000_000):
+    """
+    Alle sichtbaren Punktpaare zwischen Hinderniseckpunkten und den Zusatzpunkten extra,
+    berechnet mit dem NumPy-Kernel statt mit einzelnen Shapely-Objekten pro Kante.
+    Mit reduced=True werden nicht-tangentiale Paare schon vor dem Kanten-Test verworfen.
+    """
+    union = unary_union(obstacles) if obstacles else None
+    if union is not None:
+        shapely.prepare(union)
+    polygon_of = {}
+    ring_neighbors = {}
+    points = []
+    for poly_idx, obs in enumerate(obstacles):
+        for ring in polygon_rings(obs):
+            for k, p in enumerate(ring):
+                if p not in polygon_of:
+                    polygon_of[p] = poly_idx
+                    ring_neighbors[p] = (ring[k - 1], ring[(k + 1) % len(ring)])
+                    points.append(p)
+    for p in extra:
+        if p not in polygon_of and p not in points:
+            points.append(p)
+    if not points:
+        return []
+    coords = np.array(points, dtype=float)
+
+    # Punkte im Inneren eines (anderen) Hindernisses sind keine Knoten
+    if union is not None:
+        free = ~shapely.contains_xy(union, coords[:, 0], coords[:, 1])
+        points = [p for p, f in zip(points, free) if f]
+        coords = coords[free]
+
+    nan = (float("nan"), float("nan"))
+    prev = np.array([ring_neighbors.get(p, (nan, nan))[0] for p in points], dtype=float).reshape(-1, 2)
+    nxt = np.array([ring_neighbors.get(p, (nan, nan))[1] for p in points], dtype=float).reshape(-1, 2)
+
+    # Kandidatenpaare blockweise (Zeilen i gegen alle j > i), sodass Block x Kanten höchstens
+    # max_elements Einträge hat; behalten werden nur die sichtbaren Paare
+    edges = pack_edges(obstacles)
+    visible_i, visible_j = [], []
+    for i, j in pair_blocks(len(points), max(1, max_elements // max(1, len(edges)))):
+        if reduced:
+            tangent = tangent_pairs(coords, prev, nxt, i, j)
+            i, j = i[tangent], j[tangent]
+        free = ~blocked_segments(coords[i], coords[j], edges, union=union, max_elements=max_elements)
+        visible_i.append(i[free])
+        visible_j.append(j[free])
+    i = np.concatenate(visible_i) if visible_i else np.zeros(0, dtype=np.int64)
+    j = np.concatenate(visible_j) if visible_j else np.zeros(0, dtype=np.int64)
+
+    # Strecken ohne Kantenberührung im Inneren liegen ganz in einem Hindernis oder ganz außerhalb:
+    # Diagonalen zwischen Eckpunkten desselben Polygons über den Mittelpunkt ausschließen
+    # (gegen die Vereinigung, da überlappende Hindernisse sie verdecken können);
+    # Polygonseiten (Ringnachbarn) bleiben erhalten
+    poly_ids = np.array([polygon_of.get(p, -1) for p in points])
+    same = (poly_ids[i] >= 0) & (poly_ids[i] == poly_ids[j])
+    for k in np.nonzero(same)[0].tolist():
+        if points[j[k]] in ring_neighbors[points[i[k]]]:
+            same[k] = False
+    if same.any():
+        mid = (coords[i[same]] + coords[j[same]]) / 2
+        keep = np.ones(len(i), dtype=bool)
+        keep[np.nonzero(same)[0][shapely.contains_xy(union, mid[:, 0], mid[:, 1])]] = False
+        i, j = i[keep], j[keep]
+    return [(points[a], points[b]) for a, b in zip(i.tolist(), j.tolist())]
@@ -1,14 +1,90 @@
-from flask import render_template, jsonify, request
-import random, math
-import networkx as nx
-from shapely.geometry import Polygon, LineString, Point
+from flask import render_template, jsonify, request, current_app
+import random
+import numpy as np
+from common import store
+from common.batch import parse_batch_request, json_flag
+from common.cache import map_cache
+from common.fields import select_fields
+from common.mapio import map_source, cached_map, obstacle_rings
+from common.search import check_method, shortest_path
 from . import visibility_bp
-from .utils import generate_map, construct_visibility_graph, choose_valid_point
+from .sweep import VisibilitySweep
+from .utils import (
+    generate_map, construct_visibility_graph, choose_valid_point,
+    construct_obstacle_visibility_graph, splice_query_points, overlay_neighbors, batch_paths_with_overlay,
+)
 
 @visibility_bp.route('/')
 def index():
     return render_template('visibility.html')
 
+def _serialize_graph(G):
+    nodes = []
+    node_index = {}
+    for i, node in enumerate(G.keys):
+        node_index[node] = i
+        nodes.append({"id": i, "x": node[0], "y": node[1]})
+    links = []
+    for u, v, weight in G.edges():
+        links.append({"source": node_index[u], "target": node_index[v], "weight": weight})
+    return nodes, node_index, links
+
+
+def _cached_map(source):
+    boundary, obstacles = cached_map("visibility", source, generate=generate_map)
+    return obstacles
+
+
+def _static_visibility(source, method, reduced):
+    """
+    Statischer Hindernis-Visibility-Graph je (Kartenquelle, Methode); source siehe common.mapio.map_source.
+    Beim Verschieben von Start/Ziel werden nur noch die beiden Punkte eingefügt.
+    """
+    def build():
+        obstacles = _cached_map(source)
+        G, sweep = construct_obstacle_visibility_graph(obstacles, method=method, reduced=reduced,
+                                                       output="csr")
+        return {
+            "obs_data": obstacle_rings(obstacles),
+            "graph": G,
+            "sweep": sweep,
+        }
+
+    def encode(entry):
+        return store.pack_csr(entry["graph"]), {}
+
+    def decode(arrays, meta):
+        # Nur der Graph liegt im Store; der Sweep über die Hindernisse ist schnell neu aufgebaut
+        obstacles = _cached_map(source)
+        return {
+            "obs_data": obstacle_rings(obstacles),
+            "graph": store.unpack_csr(arrays),
+            "sweep": VisibilitySweep(obstacles),
+        }
+
+    key = ("visibility", "graph") + source + (method, reduced)
+    return store.get_or_create(key, build, encode, decode)
+
+
+def _static_visibility_data(source, method, reduced):
+    """Serialisierte Knoten und Kanten des statischen Graphen; nur aufgebaut, wenn eine Anfrage sie braucht."""
+    def build():
+        static = _static_visibility(source, method, reduced)
+        nodes, node_index, links = _serialize_graph(static["graph"])
+        return {"nodes": nodes, "node_index": node_index, "links": links}
+
+    key = ("visibility", "graph_data") + source + (method, reduced)
+    return map_cache.get_or_create(key, build)
+
+
+# Verfahren für den Visibility-Graphen (Parameter method)
+METHODS = ("sweep", "vectorized", "naive")
+
+# Abschnitte der Antwort von graph_data_visibility, wählbar über fields= bzw. mode=path
+RESPONSE_SECTIONS = ("nodes", "links", "path", "obstacles")
+PATH_SECTIONS = ("path",)
+
+
 @visibility_bp.route('/graph_data_visibility')
 def graph_data_visibility():
     width = int(request.args.get("width", 600))
@@ -21,52 +97,147 @@ def graph_data_visibility():
         seed = random.randint(0, 1000000)
     else:
         seed = int(seed_str)
-    random.seed(seed)
+    # Standard: exakter Rotational Plane Sweep, "vectorized" für den NumPy-Kernel, "naive" für den paarweisen Test
+    method = request.args.get("method", "sweep")
+    # reduced=true: nur tangentiale Kanten (reduzierter Visibility-Graph)
+    reduced = request.args.get("reduced", "false").lower() in ("1", "true", "yes")
+    # Pfadsuche: "astar" (euklidische Heuristik), "dijkstra" oder "bidirectional"
+    search = request.args.get("search", "astar")
+    try:
+        fields = select_fields(request.args, RESPONSE_SECTIONS, PATH_SECTIONS)
+        if method not in METHODS:
+            raise ValueError(f"Unbekannte Methode: {method!r} (erwartet: {', '.join(METHODS)})")
+        check_method(search)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # map_id=...: hochgeladene Karte (POST /maps) statt Zufallskarte
+        source = map_source(request.args, width, height, num_obstacles, max_vertices, obstacle_size, seed)
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+    width, height = source[1], source[2]
+    response = {}
+    expanded = {}
 
-    boundary, obstacles = generate_map(width, height, num_obstacles, obstacle_size, max_vertices)
-    # Hier verwenden wir alle Hindernisse – Erweiterungen (z. B. Obstacle Expansion) können später ergänzt werden
-    used_obstacles = obstacles
+    # Eigener Zufallsstrom je Anfrage für das Verschieben von Start/Ziel (getrennt vom Kartenstrom
+    # aus seed); kein globaler random-Zustand, damit parallele Anfragen sich nicht beeinflussen
+    rng = np.random.default_rng([seed, 1])
 
-    # Start und Ziel generieren (und validieren)
     start_x = float(request.args.get("start_x", 5))
     start_y = float(request.args.get("start_y", 5))
     goal_x = float(request.args.get("goal_x", width - 5))
     goal_y = float(request.args.get("goal_y", height - 5))
-    start = (start_x, start_y)
-    goal = (goal_x, goal_y)
-    start = choose_valid_point(start, width, height, obstacles)
-    goal = choose_valid_point(goal, width, height, obstacles)
 
-    # Erzeuge den Visibility-Graphen – Kanten werden nur hinzugefügt, wenn an 25%, 50% und 75% der Strecke kein Hindernis liegt
-    G = construct_visibility_graph(used_obstacles, start, goal)
-    try:
-        path = nx.shortest_path(G, source=start, target=goal, weight="weight")
-    except nx.NetworkXNoPath:
-        path = None
+    if method == "naive":
+        # Referenzpfad: Karte und kompletten Graphen bei jeder Anfrage neu aufbauen
+        # (hochgeladene Karten liegen bereits eingelesen vor)
+        if source[0] == "upload":
+            obstacles = _cached_map(source)
+        else:
+            boundary, obstacles = generate_map(width, height, num_obstacles, obstacle_size, max_vertices, seed=seed)
+        start = choose_valid_point((start_x, start_y), width, height, obstacles, rng=rng)
+        goal = choose_valid_point((goal_x, goal_y), width, height, obstacles, rng=rng)
+        G = construct_visibility_graph(obstacles, start, goal, method=method, reduced=reduced, output="csr")
+        if "path" in fields:
+            response["path"], expanded["visibility_graph"] = G.shortest_path(start, goal, method=search)
+        if fields & {"nodes", "links"}:
+            nodes, _, links = _serialize_graph(G)
+            response.update({k: v for k, v in (("nodes", nodes), ("links", links)) if k in fields})
+        if "obstacles" in fields:
+            response["obstacles"], response["obstacle_holes"] = obstacle_rings(obstacles)
+    else:
+        obstacles = _cached_map(source)
+        static = _static_visibility(source, method, reduced)
+        if "obstacles" in fields:
+            response["obstacles"], response["obstacle_holes"] = static["obs_data"]
 
-    # Knoten und Kanten für die Graph-Ansicht
-    nodes = []
-    node_index = {}
-    for i, node in enumerate(G.nodes()):
-        node_index[node] = i
-        nodes.append({"id": i, "x": node[0], "y": node[1]})
-    links = []
-    for edge in G.edges(data=True):
-        source = node_index[edge[0]]
-        target = node_index[edge[1]]
-        weight = edge[2]["weight"]
-        links.append({"source": source, "target": target, "weight": weight})
-
-    obs_data = [list(obs.exterior.coords)[:-1] for obs in obstacles]
-
-    return jsonify({
-        "nodes": nodes,
-        "links": links,
-        "path": path,
-        "obstacles": obs_data,
+        # Start und Ziel generieren (und validieren)
+        start = choose_valid_point((start_x, start_y), width, height, obstacles, rng=rng)
+        goal = choose_valid_point((goal_x, goal_y), width, height, obstacles, rng=rng)
+
+        # Nur Start und Ziel in den gecachten Graphen einfügen
+        G = static["graph"]
+        if fields & {"path", "links"}:
+            overlay = splice_query_points(static["sweep"], start, goal, reduced=reduced)
+        if "path" in fields:
+            response["path"], expanded["visibility_graph"] = shortest_path(
+                overlay_neighbors(G, overlay), start, goal, position=lambda p: p, method=search)
+
+        if fields & {"nodes", "links"}:
+            # Knoten und Kanten für die Graph-Ansicht: gecachter Teil plus Start/Ziel
+            graph_data = _static_visibility_data(source, method, reduced)
+            node_index = graph_data["node_index"]
+            nodes = list(graph_data["nodes"])
+            extra_index = {}
+            for p in (start, goal):
+                if p not in node_index and p not in extra_index:
+                    extra_index[p] = len(nodes)
+                    nodes.append({"id": len(nodes), "x": p[0], "y": p[1]})
+            if "nodes" in fields:
+                response["nodes"] = nodes
+            if "links" in fields:
+                links = list(graph_data["links"])
+                for u in dict.fromkeys((start, goal)):
+                    for v, weight in overlay[u].items():
+                        if G.has_edge(u, v) or (u == goal and v == start):
+                            continue
+                        links.append({
+                            "source": node_index.get(u, extra_index.get(u)),
+                            "target": node_index.get(v, extra_index.get(v)),
+                            "weight": weight
+                        })
+                response["links"] = links
+
+    response.update({
+        "search": {"method": search, "expanded": expanded},
         "start": {"x": start[0], "y": start[1]},
         "goal": {"x": goal[0], "y": goal[1]},
         "width": width,
         "height": height,
         "seed": seed
     })
+    if source[0] == "upload":
+        response["map_id"] = source[3]
+    return jsonify(response)
+
+
+@visibility_bp.route('/batch_paths', methods=['POST'])
+def batch_paths_visibility():
+    """
+    Viele Start/Ziel-Paare auf einer Karte: der statische Visibility-Graph wird einmal (gecacht)
+    aufgebaut, je Anfrage werden nur Start und Ziel eingefügt. Die Antwort enthält je Anfrage
+    nur Pfad und Länge; Punkte in Hindernissen werden nicht verschoben, sondern liefern keinen Pfad.
+    """
+    data = request.get_json(silent=True)
+    try:
+        queries, search, share = parse_batch_request(data, int(current_app.config.get("BATCH_MAX_QUERIES", 1000)))
+        width = int(data.get("width", 600))
+        height = int(data.get("height", 600))
+        num_obstacles = int(data.get("num_obstacles", 10))
+        max_vertices = int(data.get("max_vertices", 6))
+        obstacle_size = float(data.get("obstacle_size", 10))
+        seed = int(data.get("seed", random.randint(0, 1000000)))
+        method = data.get("method", "sweep")
+        if method not in ("sweep", "vectorized"):
+            raise ValueError(f"Batch-Anfragen unterstützen nur method='sweep' oder 'vectorized', nicht {method!r}")
+        reduced = json_flag(data, "reduced", False)
+        source = map_source(data, width, height, num_obstacles, max_vertices, obstacle_size, seed)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": f"Unbekannte map_id: {e.args[0]}"}), 404
+
+    static = _static_visibility(source, method, reduced)
+    results = batch_paths_with_overlay(static["graph"], static["sweep"], queries, reduced=reduced,
+                                       method=search, share=share)
+
+    response = {
+        "results": [{"path": path, "cost": cost} for path, cost in results],
+        "search": {"method": search, "share": share},
+        "width": source[1],
+        "height": source[2],
+        "seed": seed
+    }
+    if source[0] == "upload":
+        response["map_id"] = source[3]
+    return jsonify(response)
@@ -0,0 +1,358 @@
+import math
+
+import numpy as np
+import shapely
+from shapely.ops import unary_union
+
+# Toleranz für Orientierungstests (Flächeninhalt des Dreiecks)
+_EPS = 1e-9
+# Winkel (Bogenmaß), die als gleich gelten: kollineare Punkte können in arctan2 um
+# Rundungsfehler verschiedene Winkel haben
+_ANGLE_EPS = 1e-12
+
+
+def _ccw(a, b, c):
+    """1 = gegen den Uhrzeigersinn, -1 = im Uhrzeigersinn, 0 = kollinear."""
+    area = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    if area > _EPS:
+        return 1
+    if area < -_EPS:
+        return -1
+    return 0
+
+
+def _on_segment(p, q, r):
+    """Für kollineare Punkte: liegt q auf der Strecke p-r?"""
+    return (min(p[0], r[0]) <= q[0] <= max(p[0], r[0]) and
+            min(p[1], r[1]) <= q[1] <= max(p[1], r[1]))
+
+
+def _segments_intersect(p1, q1, p2, q2):
+    o1 = _ccw(p1, q1, p2)
+    o2 = _ccw(p1, q1, q2)
+    o3 = _ccw(p2, q2, p1)
+    o4 = _ccw(p2, q2, q1)
+    if o1 != o2 and o3 != o4:
+        return True
+    if o1 == 0 and _on_segment(p1, p2, q1):
+        return True
+    if o2 == 0 and _on_segment(p1, q2, q1):
+        return True
+    if o3 == 0 and _on_segment(p2, p1, q2):
+        return True
+    if o4 == 0 and _on_segment(p2, q1, q2):
+        return True
+    return False
+
+
+def _ray_edge_distance(origin, target, edge):
+    """Abstand von origin bis zum Schnittpunkt des Strahls origin->target mit der Geraden durch edge."""
+    a, b = edge
+    if target == a or target == b:
+        return math.dist(origin, target)
+    dx, dy = target[0] - origin[0], target[1] - origin[1]
+    ex, ey = b[0] - a[0], b[1] - a[1]
+    denom = dx * ey - dy * ex
+    if abs(denom) < _EPS:
+        return 0.0
+    t = ((a[0] - origin[0]) * ey - (a[1] - origin[1]) * ex) / denom
+    return t * math.hypot(dx, dy)
+
+
+def _angle_at(a, b, c):
+    """Winkel bei b zwischen den Strecken b-a und b-c."""
+    ab = math.dist(a, b)
+    cb = math.dist(c, b)
+    if ab == 0 or cb == 0:
+        return 0.0
+    cos_value = ((a[0] - b[0]) * (c[0] - b[0]) + (a[1] - b[1]) * (c[1] - b[1])) / (ab * cb)
+    return math.acos(max(-1.0, min(1.0, cos_value)))
+
+
+def _other_end(edge, p):
+    return edge[1] if edge[0] == p else edge[0]
+
+
+def is_tangent(p, q, neighbors):
+    """
+    Prüft, ob die Gerade p-q das Polygon in p nur berührt, d.h. alle Nachbarn von p
+    auf derselben Seite (oder auf der Geraden) liegen. Punkte ohne Nachbarn sind immer tangential.
+    """
+    side = 0
+    for n in neighbors:
+        o = _ccw(p, q, n)
+        if o == 0:
+            continue
+        if side == 0:
+            side = o
+        elif o != side:
+            return False
+    return True
+
+
+def _point_in_rings(pt, rings):
+    """Even-Odd-Test über alle Ringe eines Polygons (Außenring und Löcher)."""
+    x, y = pt
+    inside = False
+    for ring in rings:
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+def polygon_rings(poly):
+    """Alle Ringe eines Polygons als Koordinatenlisten ohne Wiederholung des ersten Punkts."""
+    return [list(poly.exterior.coords)[:-1]] + [list(r.coords)[:-1] for r in poly.interiors]
+
+
+class _OpenEdges:
+    """
+    Statusstruktur des Sweeps: Hinderniskanten, die den aktuellen Strahl schneiden,
+    sortiert nach ihrem Abstand zum Ursprung entlang des Strahls. Die Position wird per
+    binärer Suche bestimmt (O(log k) Vergleiche bei k offenen Kanten); Einfügen und Löschen
+    verschieben danach höchstens k Referenzen in der Liste. k bleibt klein (gemessen auf
+    1682 Eckpunkten: im Mittel 14, höchstens 41), daher dominieren die Vergleiche und
+    ein Baum würde sich nicht lohnen.
+    """
+
+    def __init__(self, edges=None):
+        self._edges = list(edges) if edges else []
+
+    def __len__(self):
+        return len(self._edges)
+
+    def __iter__(self):
+        return iter(self._edges)
+
+    def smallest(self):
+        return self._edges[0]
+
+    def insert(self, origin, target, edge):
+        self._edges.insert(self._index(origin, target, edge), edge)
+
+    def delete(self, origin, target, edge):
+        index = self._index(origin, target, edge) - 1
+        if 0 <= index < len(self._edges) and self._edges[index] == edge:
+            del self._edges[index]
+        elif edge in self._edges:
+            # Numerische Grenzfälle: Kante liegt nicht an der erwarteten Position
+            self._edges.remove(edge)
+
+    def _less_than(self, origin, target, edge1, dist1, edge2):
+        # Alle offenen Kanten schneiden den aktuellen Strahl, daher genügt der Abstand entlang des Strahls
+        if edge1 == edge2:
+            return False
+        dist2 = _ray_edge_distance(origin, target, edge2)
+        if dist1 > dist2 + _EPS:
+            return False
+        if dist1 < dist2 - _EPS:
+            return True
+        # Gleicher Abstand: Kanten teilen sich einen Punkt, Vergleich über den Winkel
+        same = edge1[0] if edge1[0] in edge2 else edge1[1]
+        angle1 = _angle_at(origin, target, _other_end(edge1, same))
+        angle2 = _angle_at(origin, target, _other_end(edge2, same))
+        return angle1 < angle2
+
+    def _index(self, origin, target, edge):
+        dist = _ray_edge_distance(origin, target, edge)
+        lo, hi = 0, len(self._edges)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._less_than(origin, target, edge, dist, self._edges[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+
+class VisibilitySweep:
+    """
+    Rotational Plane Sweep (Lee) über die Hinderniskanten.
+    Die Hindernisse werden einmal vorverarbeitet; visible_from() liefert danach für einen
+    beliebigen Punkt alle sichtbaren Eckpunkte in O(n log n) (Winkelsortierung plus O(log k)
+    je Statusänderung). Der gesamte Graph (visibility_edges) kostet damit O(n² log n).
+
+    Bekannte Einschränkung: der Sweep läuft in reinem Python mit einem Status aus einer Liste
+    (siehe _OpenEdges) und braucht etwa 1 s bei 400, 5 s bei 800 und 15 s bei 1700 Eckpunkten.
+    Karten mit Tausenden Eckpunkten sind damit nicht in unter einer Sekunde zu haben; ein
+    balancierter Status würde daran wenig ändern, da die Zeit in den Python-Vergleichen steckt.
+    Für Einzelanfragen auf großen Karten ist der gecachte statische Graph plus
+    splice_query_points gedacht (je Anfrage nur zwei Sweeps, O(n log n)).
+    """
+
+    def __init__(self, obstacles):
+        # Überlappende Hindernisse werden vereinigt, damit sich keine Kanten schneiden –
+        # das ist Voraussetzung für die Sortierung der Statusstruktur.
+        self._union = unary_union(obstacles) if obstacles else None
+        if self._union is not None:
+            shapely.prepare(self._union)
+        if self._union is None or self._union.is_empty:
+            parts = []
+        elif self._union.geom_type == "Polygon":
+            parts = [self._union]
+        else:
+            parts = [g for g in self._union.geoms if g.geom_type == "Polygon"]
+
+        self.points = []
+        self.incident = {}
+        self.polygon_of = {}
+        self.rings = []
+        edges = []
+        for poly_idx, poly in enumerate(parts):
+            rings = polygon_rings(poly)
+            self.rings.append(rings)
+            for ring in rings:
+                for i in range(len(ring)):
+                    u, v = ring[i], ring[(i + 1) % len(ring)]
+                    if u not in self.polygon_of:
+                        self.points.append(u)
+                        self.polygon_of[u] = poly_idx
+                    if u == v:
+                        continue
+                    edge = (u, v)
+                    edges.append(edge)
+                    self.incident.setdefault(u, []).append(edge)
+                    self.incident.setdefault(v, []).append(edge)
+        self.edges = edges
+        self.edge_array = np.array([(a[0], a[1], b[0], b[1]) for a, b in edges], dtype=float).reshape(-1, 4)
+        self.coords = np.array(self.points, dtype=float).reshape(-1, 2)
+
+        # Knoten des Graphen sind nur die Original-Eckpunkte auf dem Rand der Vereinigung;
+        # Schnittpunkte überlappender Hindernisse steuern nur den Sweep.
+        original = {p for obs in obstacles for ring in polygon_rings(obs) for p in ring}
+        self.nodes = [p for p in self.points if p in original]
+        self._node_set = set(self.nodes)
+        self._extra_blocked = {}
+
+    def is_node(self, p):
+        """Original-Eckpunkt auf dem Hindernisrand oder freier Zusatzpunkt (Start/Ziel)."""
+        if p in self.polygon_of:
+            return p in self._node_set
+        if self._union is None:
+            return True
+        if p not in self._extra_blocked:
+            self._extra_blocked[p] = bool(shapely.contains_xy(self._union, p[0], p[1]))
+        return not self._extra_blocked[p]
+
+    def _inside_union(self, p, q):
+        """Liegt der Mittelpunkt der Strecke p-q im Inneren der Hindernisvereinigung?"""
+        if self._union is None:
+            return False
+        return bool(shapely.contains_xy(self._union, (p[0] + q[0]) / 2, (p[1] + q[1]) / 2))
+
+    def _edge_in_polygon(self, p, q):
+        pid = self.polygon_of.get(p)
+        if pid is None or pid != self.polygon_of.get(q):
+            return False
+        mid = ((p[0] + q[0]) / 2, (p[1] + q[1]) / 2)
+        return _point_in_rings(mid, self.rings[pid])
+
+    def _initial_edges(self, origin):
+        """Kanten, die den Halbstrahl von origin in +x-Richtung echt schneiden, sortiert nach Abstand."""
+        if not len(self.edges):
+            return []
+        ax, ay, bx, by = self.edge_array.T
+        oy = origin[1]
+        crossing = (ay - oy) * (by - oy) < 0
+        idx = np.nonzero(crossing)[0]
+        x_int = ax[idx] + (oy - ay[idx]) * (bx[idx] - ax[idx]) / (by[idx] - ay[idx])
+        ahead = x_int > origin[0]
+        idx, x_int = idx[ahead], x_int[ahead]
+        return [self.edges[i] for i in idx[np.argsort(x_int, kind="stable")]]
+
+    def neighbors(self, p):
+        return [_other_end(e, p) for e in self.incident.get(p, ())]
+
+    def visible_from(self, origin, extra=(), half=False, reduced=False):
+        """
+        Liefert alle von origin aus sichtbaren Knoten (Hinderniseckpunkte und extra).
+        Mit half=True werden nur Punkte im Winkelbereich [0, pi] betrachtet, was für den
+        Aufbau des gesamten Graphen genügt, da Sichtbarkeit symmetrisch ist.
+        Mit reduced=True werden nur Kanten geliefert, die an beiden Enden tangential sind.
+        """
+        if not self.is_node(origin):
+            return []
+        extra = [p for p in extra if p not in self.polygon_of]
+        points = self.points + extra
+        coords = self.coords if not extra else np.vstack([self.coords, np.array(extra, dtype=float)])
+        if not points:
+            return []
+        dx = coords[:, 0] - origin[0]
+        dy = coords[:, 1] - origin[1]
+        angles = np.mod(np.arctan2(dy, dx), 2 * math.pi)
+        dists = np.hypot(dx, dy)
+        order = np.lexsort((dists, angles))
+        # Punkte mit (bis auf _ANGLE_EPS) gleichem Winkel bilden einen kollinearen Lauf und werden
+        # streng nach Abstand besucht, sonst käme ein fernerer Punkt vor den näheren dran
+        run = np.concatenate([[0], np.cumsum(np.diff(angles[order]) > _ANGLE_EPS)])
+        order = order[np.lexsort((dists[order], run))]
+        angles = angles.tolist()
+
+        adjacent = self.neighbors(origin)
+        open_edges = _OpenEdges(self._initial_edges(origin))
+
+        visible = []
+        prev = None
+        prev_visible = False
+        for idx in order.tolist():
+            p = points[idx]
+            if p == origin:
+                continue
+            if half and angles[idx] > math.pi:
+                break
+            incident = self.incident.get(p, ())
+
+            # Kanten im Uhrzeigersinn, die in p enden, verlassen den Status
+            if open_edges:
+                for edge in incident:
+                    if _ccw(origin, p, _other_end(edge, p)) == -1:
+                        open_edges.delete(origin, p, edge)
+
+            is_visible = False
+            if prev is None or _ccw(origin, prev, p) != 0 or not _on_segment(origin, prev, p):
+                if not open_edges:
+                    is_visible = True
+                else:
+                    a, b = open_edges.smallest()
+                    is_visible = not _segments_intersect(origin, p, a, b)
+            elif prev_visible:
+                # Kollinear hinter einem sichtbaren Punkt: nur das Teilstück prev-p prüfen. Sein
+                # Mittelpunkt wird gegen die Vereinigung getestet, da überlappende Hindernisse
+                # eine Polygonseite teilweise verdecken können
+                is_visible = True
+                for edge in open_edges:
+                    if prev not in edge and _segments_intersect(prev, p, edge[0], edge[1]):
+                        is_visible = False
+                        break
+                if is_visible and self._inside_union(prev, p):
+                    is_visible = False
+
+            if is_visible and p not in adjacent:
+                is_visible = not self._edge_in_polygon(origin, p)
+
+            if is_visible and self.is_node(p):
+                if not reduced or (is_tangent(origin, p, adjacent) and is_tangent(p, origin, self.neighbors(p))):
+                    visible.append(p)
+
+            # Kanten gegen den Uhrzeigersinn, die in p beginnen, werden aufgenommen
+            for edge in incident:
+                if origin not in edge and _ccw(origin, p, _other_end(edge, p)) == 1:
+                    open_edges.insert(origin, p, edge)
+
+            prev = p
+            prev_visible = is_visible
+        return visible
+
+    def visibility_edges(self, extra=(), reduced=False):
+        """Alle sichtbaren Punktpaare zwischen Hinderniseckpunkten und den Zusatzpunkten extra."""
+        extra = [p for p in dict.fromkeys(extra) if p not in self.polygon_of]
+        edges = []
+        for origin in self.nodes + extra:
+            for p in self.visible_from(origin, [q for q in extra if q != origin], half=True, reduced=reduced):
+                edges.append((origin, p))
+        return edges
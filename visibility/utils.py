@@ -1,40 +1,50 @@
-import random, math
+import math
 
 import networkx as nx
-from shapely.geometry import Polygon, Point, LineString
+import numpy as np
+from shapely.geometry import Point, LineString
 
-
-def generate_random_polygon(width, height, max_radius, max_vertices):
-    cx = random.uniform(max_radius, width - max_radius)
-    cy = random.uniform(max_radius, height - max_radius)
-    n = random.randint(3, max_vertices)
-    angles = sorted([random.uniform(0, 2 * math.pi) for _ in range(n)])
-    vertices = []
-    for angle in angles:
-        r = random.uniform(max_radius / 2, max_radius)
-        x = cx + r * math.cos(angle)
-        y = cy + r * math.sin(angle)
-        vertices.append((x, y))
-    # Zur Garantie der Konvexität: Erzeuge die konvexe Hülle der Punkte.
-    return Polygon(vertices).convex_hull
+from common import mapgen
+from common.csr import CSRGraph
+from common.search import shortest_path, shortest_path_tree, path_to
+from .kernels import vectorized_visibility_edges
+from .sweep import VisibilitySweep, is_tangent, polygon_rings
 
 
-def generate_map(width, height, num_obstacles, max_radius, max_vertices):
-    obstacles = []
-    for _ in range(num_obstacles):
-        poly = generate_random_polygon(width, height, max_radius, max_vertices)
-        obstacles.append(poly)
-    boundary = Polygon([(0, 0), (width, 0), (width, height), (0, height)])
-    return boundary, obstacles
+def generate_map(width, height, num_obstacles, max_radius, max_vertices, seed=None, rng=None):
+    """
+    Karte für den Visibility-Graphen: Hindernisse dürfen sich hier überlappen, die Radien der
+    Eckpunkte variieren unabhängig in [max_radius / 2, max_radius] (siehe common.mapgen).
+    """
+    return mapgen.generate_map(width, height, num_obstacles, max_radius, max_vertices, seed=seed, rng=rng,
+                               reject_overlaps=False, vertex_radius="uniform")
 
 
-def construct_visibility_graph(obstacles, start, goal, sample_count=10):
+def construct_visibility_graph(obstacles, start, goal, sample_count=10, method="sweep", reduced=False,
+                               output="networkx"):
     """
     Erzeugt einen Visibility-Graphen aus den Hindernissen und den Punkten start und goal.
     Eine Kante wird nur aufgenommen, wenn sie nicht durch irgendein Hindernis geht.
-    Zunächst wird mit line.crosses(obs) geprüft – zusätzlich werden sample_count-1 Punkte
-    entlang der Kante getestet, ob sie innerhalb eines Hindernisses liegen.
+
+    method="sweep":       exakter Rotational Plane Sweep (Lee), O(n² log n); in reinem Python etwa
+                          15 s bei 1700 Eckpunkten (bekannte Einschränkung, siehe VisibilitySweep).
+    method="vectorized":  alle Punktpaare gebündelt mit NumPy-Orientierungstests gegen ein (E, 4)-Kantenarray.
+    method="naive":       paarweise Prüfung mit line.crosses(obs) – zusätzlich werden sample_count-1
+                          Punkte entlang der Kante getestet, ob sie innerhalb eines Hindernisses liegen.
+
+    reduced=True liefert den reduzierten Visibility-Graphen: Kanten zwischen Hinderniseckpunkten
+    werden nur aufgenommen, wenn sie an beiden Enden tangential (stützend oder trennend) sind –
+    nur solche Kanten können auf einem kürzesten Pfad liegen.
+
+    output="networkx" liefert einen nx.Graph, output="csr" einen CSRGraph über die Koordinaten-Tupel.
     """
+    if output not in ("networkx", "csr"):
+        raise ValueError(f"Unbekanntes Ausgabeformat für den Visibility-Graphen: {output}")
+    if method in ("sweep", "vectorized"):
+        return _construct_visibility_graph_exact(obstacles, start, goal, method, reduced, output)
+    if method != "naive":
+        raise ValueError(f"Unbekannte Methode für den Visibility-Graphen: {method}")
+
     # Sammle alle Eckpunkte aus allen Hindernissen
     vertices = []
     for obs in obstacles:
@@ -45,12 +55,22 @@ def construct_visibility_graph(obstacles, start, goal, sample_count=10):
     # Entferne Duplikate
     vertices = list(set(vertices))
 
-    G = nx.Graph()
+    ring_neighbors = {}
+    if reduced:
+        for obs in obstacles:
+            for ring in polygon_rings(obs):
+                for k, p in enumerate(ring):
+                    ring_neighbors[p] = (ring[k - 1], ring[(k + 1) % len(ring)])
+
+    edges = []
     n = len(vertices)
     for i in range(n):
         for j in range(i + 1, n):
             p1 = vertices[i]
             p2 = vertices[j]
+            if reduced and not (is_tangent(p1, p2, ring_neighbors.get(p1, ())) and
+                                is_tangent(p2, p1, ring_neighbors.get(p2, ()))):
+                continue
             line = LineString([p1, p2])
             valid = True
 
@@ -74,20 +94,146 @@ def construct_visibility_graph(obstacles, start, goal, sample_count=10):
                     break
 
             if valid:
-                G.add_edge(p1, p2, weight=line.length)
+                edges.append((p1, p2, line.length))
+    # Start und Ziel sind immer Knoten, auch wenn sie nichts sehen
+    return _emit_graph((start, goal), edges, output)
+
+
+def _construct_visibility_graph_exact(obstacles, start, goal, method, reduced, output="networkx"):
+    if method == "vectorized":
+        edges = vectorized_visibility_edges(obstacles, extra=(start, goal), reduced=reduced)
+    else:
+        edges = VisibilitySweep(obstacles).visibility_edges(extra=(start, goal), reduced=reduced)
+    # Start und Ziel sind immer Knoten, auch wenn sie nichts sehen
+    return _emit_graph((start, goal), [(p1, p2, math.dist(p1, p2)) for p1, p2 in edges], output)
+
+
+def _emit_graph(nodes, edges, output):
+    """Graph aus Knoten (Koordinaten-Tupel) und gewichteten Kanten als nx.Graph oder CSRGraph."""
+    if output == "csr":
+        return CSRGraph.from_edges(nodes, edges, position=_node_position)
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    G.add_weighted_edges_from(edges)
     return G
 
 
-def choose_valid_point(default, width, height, obstacles, margin=5, attempts=100):
+def construct_obstacle_visibility_graph(obstacles, method="sweep", reduced=False, output="networkx"):
+    """
+    Statischer Visibility-Graph nur zwischen den Hinderniseckpunkten (ohne Start/Ziel).
+    Liefert zusätzlich die vorverarbeitete Sweep-Struktur, mit der Start und Ziel später
+    in O(n log n) eingefügt werden können (siehe splice_query_points).
+    output wie bei construct_visibility_graph ("networkx" oder "csr").
+    """
+    if output not in ("networkx", "csr"):
+        raise ValueError(f"Unbekanntes Ausgabeformat für den Visibility-Graphen: {output}")
+    sweep = VisibilitySweep(obstacles)
+    if method == "vectorized":
+        edges = vectorized_visibility_edges(obstacles, reduced=reduced)
+    elif method == "sweep":
+        edges = sweep.visibility_edges(reduced=reduced)
+    else:
+        raise ValueError(f"Unbekannte Methode für den statischen Visibility-Graphen: {method}")
+    return _emit_graph(sweep.nodes, [(p1, p2, math.dist(p1, p2)) for p1, p2 in edges], output), sweep
+
+
+def splice_query_points(sweep, start, goal, reduced=False):
+    """
+    Berechnet nur die Sichtbarkeit von start und goal (je ein Rotational Plane Sweep) und
+    liefert sie als Overlay-Adjazenz {knoten: {nachbar: gewicht}}. Der statische Graph
+    bleibt unverändert und kann zwischen Anfragen geteilt werden.
+    """
+    overlay = {start: {}, goal: {}}
+    for p, others in ((start, (goal,)), (goal, ())):
+        for q in sweep.visible_from(p, extra=others, reduced=reduced):
+            w = math.dist(p, q)
+            overlay[p][q] = w
+            overlay.setdefault(q, {})[p] = w
+    return overlay
+
+
+def overlay_neighbors(G, overlay, weight="weight"):
+    """
+    Nachbarschaftsfunktion über G (nx.Graph oder CSRGraph) plus Overlay-Kanten, ohne G zu
+    kopieren oder zu verändern.
+    """
+    if isinstance(G, CSRGraph):
+        def neighbors(u):
+            result = G.adjacent(u)
+            result.extend(overlay.get(u, {}).items())
+            return result
+
+        return neighbors
+
+    adj = G.adj
+
+    def neighbors(u):
+        result = [(v, data[weight]) for v, data in adj[u].items()] if u in adj else []
+        result.extend(overlay.get(u, {}).items())
+        return result
+
+    return neighbors
+
+
+def batch_paths_with_overlay(G, sweep, queries, reduced=False, method="astar", share=True):
+    """
+    Beantwortet viele (start, goal)-Anfragen auf dem statischen Graphen G. Ergebnis je Anfrage:
+    (Pfad oder None, Länge oder None).
+
+    Mit share=True wird für Anfragen mit gleichem Start nur ein Sweep für den Start und ein
+    Dijkstra-Baum über G plus dessen Sichtkanten berechnet; jedes Ziel kostet danach nur noch
+    seinen eigenen Sweep: Länge = min über die vom Ziel sichtbaren Knoten q von dist(q) + |q, goal|.
+    Einzelne Anfragen laufen wie bei der Einzelabfrage über splice_query_points und method.
+    """
+    results = [(None, None)] * len(queries)
+    groups = {}
+    for q, (start, goal) in enumerate(queries):
+        groups.setdefault(start, []).append(q)
+
+    for start, members in groups.items():
+        if not share or len(members) == 1:
+            for q in members:
+                goal = queries[q][1]
+                overlay = splice_query_points(sweep, start, goal, reduced=reduced)
+                path, _ = shortest_path(overlay_neighbors(G, overlay), start, goal,
+                                        position=_node_position, method=method)
+                if path is not None:
+                    results[q] = (path, sum(math.dist(a, b) for a, b in zip(path, path[1:])))
+            continue
+
+        overlay = {start: {p: math.dist(start, p) for p in sweep.visible_from(start, reduced=reduced)}}
+        dist, prev = shortest_path_tree(overlay_neighbors(G, overlay), start)
+        for q in members:
+            goal = queries[q][1]
+            best, last = dist.get(goal, math.inf), goal
+            for p in sweep.visible_from(goal, extra=(start,), reduced=reduced):
+                if p in dist and dist[p] + math.dist(p, goal) < best:
+                    best, last = dist[p] + math.dist(p, goal), p
+            if best == math.inf:
+                continue
+            path = path_to(prev, last)
+            results[q] = (path if last == goal else path + [goal], best)
+    return results
+
+
+def _node_position(node):
+    return node
+
+
+def choose_valid_point(default, width, height, obstacles, rng=None, margin=5, attempts=100):
     """
     Prüft, ob der Standardpunkt außerhalb aller Hindernisse liegt.
-    Falls nicht, wird nach einer zufälligen, gültigen Position gesucht.
+    Falls nicht, wird nach einer zufälligen, gültigen Position gesucht. Der Zufall kommt aus rng
+    (numpy.random.Generator, je Anfrage erzeugt); der globale random-Zustand wird nicht benutzt.
     """
+    if rng is None:
+        rng = np.random.default_rng()
     p = Point(default)
     if not any(obs.contains(p) for obs in obstacles):
         return default
     for _ in range(attempts):
-        candidate = (random.uniform(margin, width - margin), random.uniform(margin, height - margin))
+        x, y = rng.uniform(margin, width - margin), rng.uniform(margin, height - margin)
+        candidate = (float(x), float(y))
         if not any(obs.contains(Point(candidate)) for obs in obstacles):
             return candidate
     return default